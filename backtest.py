@@ -0,0 +1,56 @@
+"""
+Бэктест порогов уведомлений на записанных тиках
+
+Пример:
+    python backtest.py --data data/ticks --spreads 0.1,0.25,0.5,1 --profits 5,10,20
+"""
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+from services.backtest import run_backtest, iter_recorded_quotes, format_report, report_to_dict
+
+
+def parse_floats(raw: str) -> list[float]:
+    return [float(part) for part in raw.split(",") if part.strip()]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Реплей записанных тиков через логику проверки спредов")
+    parser.add_argument("--data", default=os.getenv("TICK_RECORDER_DIR", "data/ticks"), help="Каталог TickRecorder")
+    parser.add_argument("--days", default="", help="Дни через запятую (YYYY-MM-DD), по умолчанию все")
+    parser.add_argument("--spreads", default="0.1,0.25,0.5,1,2", help="Значения min_spread, %%")
+    parser.add_argument("--profits", default="5,10,20", help="Значения min_profit_usd, $")
+    parser.add_argument("--position", type=float, default=100.0, help="Объём позиции, $")
+    parser.add_argument("--leverage", type=float, default=1.0, help="Плечо")
+    parser.add_argument("--min-zscore", type=float, default=0.0, help="Порог аномальности (0 - выключено)")
+    parser.add_argument("--json", dest="json_path", default="", help="Сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    thresholds = [
+        (min_spread, min_profit)
+        for min_spread in parse_floats(args.spreads)
+        for min_profit in parse_floats(args.profits)
+    ]
+    days = [day.strip() for day in args.days.split(",") if day.strip()] or None
+
+    report = run_backtest(
+        iter_recorded_quotes(args.data, days),
+        thresholds,
+        position_size_usd=args.position,
+        leverage=args.leverage,
+        min_zscore=args.min_zscore,
+    )
+    print(format_report(report))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report_to_dict(report), f, ensure_ascii=False, indent=2)
+        print(f"\nОтчёт сохранён: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
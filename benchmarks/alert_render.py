@@ -0,0 +1,125 @@
+"""
+Стоимость рассылки одной возможности N пользователям: рендер на каждого vs LRU-кэш
+
+Два сценария:
+- общий снимок коллектора: котировки у всех пользователей одни и те же (один seq);
+- собственные котировки: каждый пользователь получил свои цены от бирж, снимка
+  нет - кэш не применяется, рендер идёт мимо него.
+
+Запуск из корня репозитория:
+    python -m benchmarks.alert_render [N]
+"""
+import random
+import sys
+import time
+
+from keyboards import get_opportunity_keyboard
+from models import UserSettings
+from services.alert_renderer import AlertRenderCache, render_spread_notification
+from services.profit_calculator import evaluate_spread
+
+# Типичные объём/плечо: большинство пользователей остаются на пресетах
+POSITION_PRESETS = (50, 100, 100, 100, 200, 500, 1000)
+LEVERAGE_PRESETS = (1, 1, 1, 2, 3, 5, 10)
+
+
+def _users(n: int) -> list[UserSettings]:
+    rng = random.Random(0)
+    return [
+        UserSettings(
+            position_size_usd=float(rng.choice(POSITION_PRESETS)),
+            leverage=float(rng.choice(LEVERAGE_PRESETS)),
+        )
+        for _ in range(n)
+    ]
+
+
+def _render_uncached(coin, prices_data, evaluation, settings):
+    """Прежний путь: текст и клавиатура собираются заново для каждого пользователя"""
+    long_exchange, short_exchange = evaluation["long"], evaluation["short"]
+    profit_data = evaluation["profit_data"]
+    text = (
+        f"🚨 Арбитражная возможность: {coin}\n\n"
+        f"📈 Лонг: {long_exchange} — {prices_data[long_exchange]['price']:.6g} USDT\n"
+        f"📉 Шорт: {short_exchange} — {prices_data[short_exchange]['price']:.6g} USDT\n"
+        f"📊 Спред: {evaluation['spread_percent']:.2f}%\n\n"
+        f"💰 Объём: {settings.position_size_usd}$ × {settings.leverage}\n"
+        f"💵 Профит (маркет): {profit_data['market_profit']:.2f}$ (комиссии {profit_data['market_fees']:.2f}$)\n"
+        f"💵 Профит (лимит): {profit_data['limit_profit']:.2f}$ (комиссии {profit_data['limit_fees']:.2f}$)"
+    )
+    return text, get_opportunity_keyboard(coin, long_exchange, short_exchange)
+
+
+def _user_prices(rng: random.Random) -> dict:
+    """Котировки, которые пользователь получил сам: цены расходятся на доли процента"""
+    long_price = 64000.0 * (1 + rng.uniform(-0.0005, 0.0005))
+    short_price = 65400.0 * (1 + rng.uniform(-0.0005, 0.0005))
+    return {
+        "Bybit": {"price": long_price, "bid": long_price - 0.5, "ask": long_price + 0.5},
+        "OKX": {"price": short_price, "bid": short_price - 1.0, "ask": short_price + 1.0},
+    }
+
+
+def _fan_out(coin: str, alerts: list, snapshot_seq) -> tuple[float, float, dict]:
+    """alerts - [(prices_data, evaluation, settings)]; время без кэша, время с кэшем, статистика кэша"""
+    started = time.perf_counter()
+    for prices_data, evaluation, s in alerts:
+        _render_uncached(coin, prices_data, evaluation, s)
+    uncached = time.perf_counter() - started
+
+    cache = AlertRenderCache()
+    started = time.perf_counter()
+    for prices_data, evaluation, s in alerts:
+        render_spread_notification(
+            coin,
+            prices_data,
+            evaluation["spread_percent"],
+            evaluation["profit_data"],
+            evaluation["long"],
+            evaluation["short"],
+            s,
+            cache=cache,
+            snapshot_seq=snapshot_seq,
+        )
+    cached = time.perf_counter() - started
+    return uncached, cached, cache.stats()
+
+
+def _report(title: str, n: int, uncached: float, cached: float, stats: dict):
+    print(title)
+    print(f"  рендер на каждого: {uncached * 1000:8.1f} мс ({uncached / n * 1e6:6.2f} мкс/уведомление)")
+    print(f"  LRU-кэш:           {cached * 1000:8.1f} мс ({cached / n * 1e6:6.2f} мкс/уведомление), "
+          f"hit rate {stats['hit_rate']:.1%}, мимо кэша {stats['uncached']}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    users = _users(n)
+    coin = "BTC"
+
+    # Общий снимок: оценка зависит от объёма/плеча и считается один раз на комбинацию
+    prices_data = {
+        "Bybit": {"price": 64000.0, "bid": 63999.5, "ask": 64000.5},
+        "OKX": {"price": 65400.0, "bid": 65399.0, "ask": 65401.0},
+    }
+    evaluations = {}
+    for s in users:
+        key = (s.position_size_usd, s.leverage)
+        if key not in evaluations:
+            evaluations[key] = evaluate_spread(prices_data, s.position_size_usd, s.leverage)
+    shared = [(prices_data, evaluations[(s.position_size_usd, s.leverage)], s) for s in users]
+
+    # Собственные котировки: оценка у каждого своя (считается вне замера)
+    rng = random.Random(1)
+    own = []
+    for s in users:
+        user_prices = _user_prices(rng)
+        own.append((user_prices, evaluate_spread(user_prices, s.position_size_usd, s.leverage), s))
+
+    print(f"Пользователей: {n}, комбинаций объём/плечо: {len(evaluations)}")
+    _report("Общий снимок коллектора (seq 1):", n, *_fan_out(coin, shared, 1))
+    _report("Собственные котировки (без снимка):", n, *_fan_out(coin, own, None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Сквозной бенчмарк цикла проверки спредов на локальных моках бирж
+
+Мок бирж (benchmarks.mock_exchanges) запускается в отдельном процессе,
+поэтому CPU и пиковая память в отчёте - только процесса бота. Бенчмарк
+направляет адаптеры на мок (api_base), создаёт N пользователей с M монетами
+и K биржами и гоняет настоящий check_spreads_task с очередью уведомлений
+(бот-заглушка отвечает мгновенно).
+
+Запуск из корня репозитория:
+    python -m benchmarks.e2e_scan --users 200 --coins 5 --exchanges 4 --cycles 5
+    python -m benchmarks.e2e_scan --exchanges Bybit,OKX,Hyperliquid --latency-ms 120 --output results.json
+
+В отчёте: циклов в секунду (с паузой между циклами и без неё), запросов на цикл,
+CPU на цикл, пиковый RSS, p50/p99 стадий из services.profiler. Результат - JSON
+для сравнения прогонов между релизами.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.mock_exchanges import api_bases, serve
+from config import ALL_COINS, ALL_EXCHANGES
+from models import get_user_settings
+from services import metrics
+from services.notifier import notifier
+from services.profiler import cycle_profiler
+from services.spread_checker import check_spreads_task
+from utils.registry import EXCHANGE_NAMES
+
+# Бирж без адаптера (Paradigm) в моке нет
+MOCKED_EXCHANGES = tuple(name for name in EXCHANGE_NAMES if name in api_bases("127.0.0.1", 0))
+# Проверка берёт у пользователя не больше стольких монет за цикл (см. spread_checker)
+COINS_PER_USER_CHECKED = 5
+
+
+class NullBot:
+    """Бот-заглушка для очереди уведомлений: отправка ничего не стоит"""
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return None
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _exchanges_arg(value: str) -> tuple[str, ...]:
+    if value.isdigit():
+        return MOCKED_EXCHANGES[:int(value)]
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = [name for name in names if name not in MOCKED_EXCHANGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"нет мока для бирж: {', '.join(unknown)}")
+    return names
+
+
+def setup_user(user_id: int, coins: list[str], exchanges: tuple[str, ...]):
+    s = get_user_settings(user_id)
+    for coin in coins:
+        s.add_coin(coin)
+    s.selected_exchanges = exchanges
+    s.scan_active = True
+    # Сигнальные монеты мока расходятся на ~3% - эти пары открывают возможности и идут в доставку
+    s.min_spread = 1.0
+    s.min_profit_usd = 0.01
+
+
+def setup_users(users: int, coins: list[str], exchanges: tuple[str, ...]):
+    for user_id in range(1, users + 1):
+        setup_user(user_id, coins, exchanges)
+
+
+async def mock_requests(session: aiohttp.ClientSession, url: str) -> int:
+    async with session.get(url) as response:
+        return sum((await response.json()).values())
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await mock_requests(session, url)
+            return
+        except aiohttp.ClientError:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Мок бирж не поднялся")
+            await asyncio.sleep(0.1)
+
+
+async def wait_cycles(count: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while metrics.scan_cycle.count < count:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"За {timeout:.0f} с выполнено только {metrics.scan_cycle.count} циклов из {count}")
+        await asyncio.sleep(0.05)
+
+
+async def run_benchmark(args) -> dict:
+    stats_url = f"http://127.0.0.1:{args.port}/stats"
+    for name, base in api_bases("127.0.0.1", args.port).items():
+        ALL_EXCHANGES[name]["api_base"] = base
+
+    universe = list(dict.fromkeys(ALL_COINS))
+    coins = universe[:args.coins]
+    setup_users(args.users, coins, args.exchanges)
+
+    async with aiohttp.ClientSession() as session:
+        await wait_ready(session, stats_url)
+        notifier.start(NullBot())
+        task = asyncio.create_task(check_spreads_task(None))
+        try:
+            await wait_cycles(args.warmup, args.timeout)
+            cycles_before = metrics.scan_cycle.count
+            busy_before = metrics.scan_cycle.sum
+            requests_before = await mock_requests(session, stats_url)
+            sent_before = notifier.stats["sent"]
+            cpu_before = cpu_seconds()
+            started = time.perf_counter()
+
+            await wait_cycles(cycles_before + args.cycles, args.timeout)
+
+            elapsed = time.perf_counter() - started
+            cpu = cpu_seconds() - cpu_before
+            cycles = metrics.scan_cycle.count - cycles_before
+            busy = metrics.scan_cycle.sum - busy_before
+            requests = await mock_requests(session, stats_url) - requests_before
+            sent = notifier.stats["sent"] - sent_before
+        finally:
+            task.cancel()
+            await notifier.stop()
+    # Возможности открываются уже в прогреве, поэтому проверка - по всему прогону
+    sent_total = notifier.stats["sent"]
+
+    profile = cycle_profiler.report()
+    return {
+        "benchmark": "e2e_scan",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {
+            "users": args.users,
+            "coins": args.coins,
+            "coins_checked_per_user": min(args.coins, COINS_PER_USER_CHECKED),
+            "exchanges": list(args.exchanges),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "payload_bytes": args.payload_bytes,
+            "cycles": cycles,
+            "warmup": args.warmup,
+        },
+        "results": {
+            "cycles_per_second": cycles / elapsed,
+            # Без паузы между циклами - предельная пропускная способность проверки
+            "busy_cycles_per_second": cycles / busy if busy else None,
+            "cycle_seconds_mean": busy / cycles,
+            "requests_per_cycle": requests / cycles,
+            "cpu_seconds_per_cycle": cpu / cycles,
+            "cpu_utilization": cpu / elapsed,
+            "alerts_delivered_per_cycle": sent / cycles,
+            "alerts_delivered_total": sent_total,
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "stages": profile["stages"],
+        "exchanges": profile["exchanges"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк проверки спредов на моках бирж")
+    parser.add_argument("--users", type=int, default=100, help="N пользователей")
+    parser.add_argument("--coins", type=int, default=5, help="M монет у каждого пользователя")
+    parser.add_argument("--exchanges", type=_exchanges_arg, default=MOCKED_EXCHANGES[:4], help="K бирж (число или список через запятую)")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--payload-bytes", type=int, default=0, help="Дополнительный размер каждого ответа")
+    parser.add_argument("--cycles", type=int, default=5, help="Измеряемых циклов")
+    parser.add_argument("--warmup", type=int, default=1, help="Циклов прогрева (не входят в результат)")
+    parser.add_argument("--timeout", type=float, default=1800, help="Предельное время прогона, с")
+    parser.add_argument("--port", type=int, default=0, help="Порт мока (по умолчанию - случайный свободный)")
+    parser.add_argument("--output", help="Файл для JSON-результата (по умолчанию - stdout)")
+    args = parser.parse_args()
+    if len(args.exchanges) < 2:
+        parser.error("нужно минимум 2 биржи")
+    if not args.port:
+        args.port = random.randint(20000, 60000)
+
+    mock = multiprocessing.Process(
+        target=serve,
+        args=(args.port, list(dict.fromkeys(ALL_COINS)), args.latency_ms / 1000, args.jitter_ms / 1000, args.payload_bytes),
+        kwargs={"exchanges": args.exchanges},
+        daemon=True,
+    )
+    mock.start()
+    try:
+        result = asyncio.run(run_benchmark(args))
+    finally:
+        mock.terminate()
+        mock.join()
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        r = result["results"]
+        print(
+            f"{r['cycles_per_second']:.3f} циклов/с ({r['busy_cycles_per_second']:.3f} без пауз), "
+            f"{r['requests_per_cycle']:.0f} запросов/цикл, CPU {r['cpu_seconds_per_cycle'] * 1000:.1f} мс/цикл, "
+            f"RSS {r['peak_rss_bytes'] / 2**20:.0f} МБ -> {args.output}",
+            file=sys.stderr,
+        )
+    else:
+        print(text)
+    # Без доставленных уведомлений прогон не измерил путь до доставки - результат недействителен
+    if not result["results"]["alerts_delivered_total"]:
+        sys.exit("Ни одного доставленного уведомления: проверь пороги пользователей и сигнальные монеты мока")
+
+
+if __name__ == "__main__":
+    main()
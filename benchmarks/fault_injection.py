@@ -0,0 +1,214 @@
+"""
+Сценарии неисправностей бирж: как деградирует цикл проверки и корректность уведомлений
+
+Каждый сценарий - свежая пара процессов: мок бирж (benchmarks.mock_exchanges)
+с неисправностью одной биржи и процесс с настоящим check_spreads_task.
+Всё работает без сети: мок слушает 127.0.0.1, "DNS-сбой" - хост в зоне
+.invalid, который резолвер процесса отвергает сразу.
+
+Корректность: мок знает, какие пары (монета, лонг, шорт) действительно
+расходятся (expected_opportunities). Открытые трекером возможности
+сравниваются с ними:
+- ложные - открыты, но не ожидались (например, из-за застывшей цены);
+- пропущенные - ожидались, но не открыты; recall_reachable не учитывает
+  пары с неисправной биржей (её цен нет - пропуск неизбежен).
+
+Запуск из корня репозитория:
+    python -m benchmarks.fault_injection
+    python -m benchmarks.fault_injection --target Gate --scenarios rate_limit,stale --cycles 3 --output faults.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.e2e_scan import COINS_PER_USER_CHECKED, MOCKED_EXCHANGES, NullBot, git_revision, setup_user, wait_cycles, wait_ready
+from benchmarks.mock_exchanges import FAULTS, FAULT_DNS, FAULT_STALE, api_bases, expected_opportunities, serve
+import services.spread_checker as spread_checker
+from config import ALL_COINS, ALL_EXCHANGES
+from services import metrics
+from services.notifier import notifier
+from services.opportunity_tracker import OpportunityTracker, EVENT_OPENED
+from services.profiler import cycle_profiler
+
+SCENARIO_BASELINE = "baseline"
+COINS_PER_USER = COINS_PER_USER_CHECKED
+
+
+class RecordingTracker(OpportunityTracker):
+    """Трекер, запоминающий открытые возможности (монета, лонг, шорт)"""
+
+    def __init__(self):
+        super().__init__()
+        self.opened: set[tuple[str, str, str]] = set()
+
+    def update(self, key, *args, **kwargs):
+        event = super().update(key, *args, **kwargs)
+        if event == EVENT_OPENED:
+            self.opened.add(key[1:])
+        return event
+
+
+def _refuse_invalid_hosts():
+    """Имена в зоне .invalid (RFC 6761) не резолвятся - без обращения к системному DNS"""
+    getaddrinfo = socket.getaddrinfo
+
+    def offline_getaddrinfo(host, *args, **kwargs):
+        if isinstance(host, str) and host.endswith(".invalid"):
+            raise socket.gaierror(socket.EAI_NONAME, f"{host}: Name or service not known")
+        return getaddrinfo(host, *args, **kwargs)
+
+    socket.getaddrinfo = offline_getaddrinfo
+
+
+async def _run_scenario(port: int, fault: str, target: str, args) -> dict:
+    _refuse_invalid_hosts()
+    unresolvable = (target,) if fault == FAULT_DNS else ()
+    for name, base in api_bases("127.0.0.1", port, unresolvable).items():
+        ALL_EXCHANGES[name]["api_base"] = base
+    tracker = RecordingTracker()
+    spread_checker.opportunity_tracker = tracker
+
+    # Каждому пользователю - свои 5 монет (проверка берёт не больше 5 за цикл)
+    universe = list(dict.fromkeys(ALL_COINS))
+    checked_coins = set()
+    for index in range(args.users):
+        coins = universe[index * COINS_PER_USER:(index + 1) * COINS_PER_USER]
+        setup_user(index + 1, coins, args.exchanges)
+        checked_coins.update(coins)
+
+    async with aiohttp.ClientSession() as session:
+        await wait_ready(session, f"http://127.0.0.1:{port}/stats")
+    notifier.start(NullBot())
+    task = asyncio.create_task(spread_checker.check_spreads_task(None))
+    started = time.perf_counter()
+    try:
+        await wait_cycles(args.cycles, args.timeout)
+    finally:
+        task.cancel()
+        await notifier.stop()
+    elapsed = time.perf_counter() - started
+
+    expected_all = expected_opportunities(universe, args.exchanges, args.signal_every)
+    expected = {key for key in expected_all if key[0] in checked_coins}
+    opened = tracker.opened
+    reachable = expected if fault in (SCENARIO_BASELINE, FAULT_STALE) else {key for key in expected if target not in key[1:]}
+    true_positive = opened & expected
+    profile = cycle_profiler.report()
+    return {
+        "scenario": fault,
+        "target": None if fault == SCENARIO_BASELINE else target,
+        "cycles": metrics.scan_cycle.count,
+        "elapsed_seconds": elapsed,
+        "cycle_seconds_mean": metrics.scan_cycle.sum / max(1, metrics.scan_cycle.count),
+        "cycle_seconds_p50": profile["cycle"]["p50"],
+        "cycle_seconds_p99": profile["cycle"]["p99"],
+        "timeouts": sum(series.value for series in metrics.exchange_timeouts.series.values()),
+        "alerts_opened": len(opened),
+        "alerts_expected": len(expected),
+        "true_positive": len(true_positive),
+        "false_positive": sorted(opened - expected),
+        "missed": sorted(expected - opened),
+        "precision": len(true_positive) / len(opened) if opened else None,
+        "recall": len(true_positive) / len(expected) if expected else None,
+        "recall_reachable": len(true_positive & reachable) / len(reachable) if reachable else None,
+        "alerts_delivered": notifier.stats["sent"],
+    }
+
+
+def _scenario_process(port: int, fault: str, target: str, args, results):
+    try:
+        results.put(asyncio.run(_run_scenario(port, fault, target, args)))
+    except Exception as e:
+        results.put({"scenario": fault, "target": target, "error": f"{type(e).__name__}: {e}"})
+
+
+def run(fault: str, target: str, args) -> dict:
+    """Один сценарий: мок с неисправностью target и процесс проверки, оба свежие"""
+    port = random.randint(20000, 60000)
+    faults = {target: fault} if fault not in (SCENARIO_BASELINE, FAULT_DNS) else {}
+    mock = multiprocessing.Process(
+        target=serve,
+        args=(port, list(dict.fromkeys(ALL_COINS)), args.latency_ms / 1000, args.jitter_ms / 1000, 0),
+        kwargs={"exchanges": args.exchanges, "signal_every": args.signal_every, "faults": faults},
+        daemon=True,
+    )
+    results = multiprocessing.Queue()
+    scanner = multiprocessing.Process(target=_scenario_process, args=(port, fault, target, args, results))
+    mock.start()
+    scanner.start()
+    try:
+        return results.get(timeout=args.timeout + 30)
+    finally:
+        scanner.join(5)
+        if scanner.is_alive():
+            scanner.terminate()
+        mock.terminate()
+        mock.join()
+
+
+def _format_row(result: dict, baseline: dict) -> str:
+    if "error" in result:
+        return f"{result['scenario']:<11} ошибка: {result['error']}"
+    slowdown = result["cycle_seconds_mean"] / baseline["cycle_seconds_mean"] if baseline.get("cycle_seconds_mean") else 0.0
+
+    def ratio(value):
+        return "—" if value is None else f"{value:.2f}"
+
+    return (
+        f"{result['scenario']:<11} цикл {result['cycle_seconds_mean']:7.2f} с (x{slowdown:4.1f}, p99 {result['cycle_seconds_p99']:6.2f} с) "
+        f"таймауты {result['timeouts']:4.0f}  возможности {result['alerts_opened']:3d}/{result['alerts_expected']:3d} "
+        f"ложных {len(result['false_positive']):3d}  precision {ratio(result['precision'])}  "
+        f"recall {ratio(result['recall'])} (достижимый {ratio(result['recall_reachable'])})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сценарии неисправностей бирж для check_spreads_task")
+    parser.add_argument("--target", default="OKX", choices=MOCKED_EXCHANGES, help="Неисправная биржа")
+    parser.add_argument("--scenarios", default=",".join(FAULTS), help=f"Через запятую: {', '.join(FAULTS)}")
+    parser.add_argument("--exchanges", default=",".join(MOCKED_EXCHANGES[:4]), help="Биржи пользователей через запятую")
+    parser.add_argument("--users", type=int, default=4, help="Пользователей (у каждого свои 5 монет)")
+    parser.add_argument("--signal-every", type=int, default=3, help="Каждая N-я монета расходится между двумя биржами")
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=900, help="Предельное время сценария, с")
+    parser.add_argument("--output", help="Файл для JSON-результата")
+    args = parser.parse_args()
+    args.exchanges = tuple(name.strip() for name in args.exchanges.split(","))
+    if args.target not in args.exchanges:
+        parser.error("неисправная биржа должна входить в --exchanges")
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in FAULTS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+
+    results = []
+    for fault in [SCENARIO_BASELINE] + scenarios:
+        print(f"Сценарий {fault}...", file=sys.stderr)
+        results.append(run(fault, args.target, args))
+
+    baseline = results[0]
+    for result in results:
+        print(_format_row(result, baseline))
+    # Без исправной базы сравнивать не с чем: ноль открытых ожидаемых возможностей - сломан сам стенд
+    baseline_failed = "error" in baseline or not baseline["alerts_expected"] or not baseline["true_positive"]
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "fault_injection", "revision": git_revision(), "params": {
+                "target": args.target, "exchanges": list(args.exchanges), "users": args.users,
+                "signal_every": args.signal_every, "latency_ms": args.latency_ms, "cycles": args.cycles,
+            }, "scenarios": results}, f, ensure_ascii=False, indent=2)
+    if baseline_failed:
+        sys.exit("Базовый сценарий не открыл ни одной ожидаемой возможности - результаты сценариев недействительны")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Время ответа обработчиков кнопок: клавиатуры на каждый вызов vs собранные заранее
+
+CallbackQuery подаются в настоящий Dispatcher с обработчиками из
+handlers.callbacks; Bot API - RecordingSession без задержки, поэтому
+время ответа - это только работа бота. Прежний путь эмулируется
+подменой функций клавиатур на сборку нового объекта при каждом вызове.
+
+Запуск из корня репозитория:
+    python -m benchmarks.keyboards [N]
+"""
+import asyncio
+import sys
+import time
+from contextlib import contextmanager
+
+from aiogram import Bot, Dispatcher
+
+import handlers.callbacks as callbacks
+import keyboards
+from benchmarks.telegram_load import RecordingSession, SyntheticUsers, _percentiles
+from keyboards import (
+    CALLBACK_EXCHANGES_SELECT,
+    CALLBACK_MIN_SPREAD,
+    CALLBACK_SETTINGS,
+    exchange_toggle_callback,
+    preset_callback,
+)
+from utils.registry import EXCHANGE_NAMES
+
+STEPS = (
+    ("settings_menu", CALLBACK_SETTINGS),
+    ("spread_menu", CALLBACK_MIN_SPREAD),
+    ("spread_preset", preset_callback("spread", 0.1)),
+    ("exchanges_select", CALLBACK_EXCHANGES_SELECT),
+    ("toggle_exchange", exchange_toggle_callback(EXCHANGE_NAMES[0])),
+)
+
+# Функции клавиатур, которые вызывают обработчики кнопок
+KEYBOARD_GETTERS = (
+    "get_settings_keyboard",
+    "get_coins_keyboard",
+    "get_coins_selected_keyboard",
+    "get_exchanges_keyboard",
+    "get_exchanges_all_keyboard",
+    "get_position_keyboard",
+    "get_spread_keyboard",
+    "get_profit_keyboard",
+    "get_zscore_keyboard",
+    "get_interval_keyboard",
+)
+
+
+def _rebuilding(getter):
+    """Прежний путь: каждый вызов - новая pydantic-модель со всеми кнопками"""
+
+    def build(*args):
+        keyboard = getter(*args)
+        return type(keyboard).model_validate(keyboard.model_dump())
+
+    return build
+
+
+@contextmanager
+def uncached_keyboards():
+    originals = {name: getattr(callbacks, name) for name in KEYBOARD_GETTERS + ("get_exchanges_select_keyboard",)}
+    try:
+        for name in KEYBOARD_GETTERS:
+            setattr(callbacks, name, _rebuilding(originals[name]))
+        callbacks.get_exchanges_select_keyboard = keyboards.get_exchanges_select_keyboard.__wrapped__
+        yield
+    finally:
+        for name, getter in originals.items():
+            setattr(callbacks, name, getter)
+
+
+async def _run(dp: Dispatcher, bot: Bot, users: SyntheticUsers, n: int) -> dict:
+    # Обновления собираются заранее - их разбор не входит во время ответа
+    updates = [(kind, users.callback(user_id, data)) for user_id in range(1, n + 1) for kind, data in STEPS]
+    latencies: dict[str, list[float]] = {kind: [] for kind, _ in STEPS}
+    started = time.perf_counter()
+    for kind, update in updates:
+        step_started = time.perf_counter()
+        await dp.feed_update(bot, update)
+        latencies[kind].append(time.perf_counter() - step_started)
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "steps": {kind: _percentiles(values) for kind, values in latencies.items()}}
+
+
+async def _main(n: int):
+    bot = Bot(token="123456:BENCH", session=RecordingSession())
+    dp = Dispatcher()
+    callbacks.register_callback_handlers(dp)
+    users = SyntheticUsers(bot)
+
+    # Прогрев: импорт, первые вызовы pydantic и кэш маски
+    await _run(dp, bot, users, 50)
+    with uncached_keyboards():
+        uncached = await _run(dp, bot, users, n)
+    cached = await _run(dp, bot, users, n)
+
+    updates = n * len(STEPS)
+    print(f"{updates} нажатий кнопок, {n} пользователей")
+    print(f"{'шаг':<18} {'p50 было':>10} {'p50 стало':>10} {'p99 было':>10} {'p99 стало':>10}")
+    for kind, _ in STEPS:
+        before, after = uncached["steps"][kind], cached["steps"][kind]
+        print(
+            f"{kind:<18} {before['p50_ms'] * 1000:8.1f}мкс {after['p50_ms'] * 1000:8.1f}мкс "
+            f"{before['p99_ms'] * 1000:8.1f}мкс {after['p99_ms'] * 1000:8.1f}мкс"
+        )
+    print(
+        f"всего: {uncached['elapsed'] / updates * 1e6:.1f} мкс/нажатие -> {cached['elapsed'] / updates * 1e6:.1f} мкс/нажатие "
+        f"(x{uncached['elapsed'] / cached['elapsed']:.2f})"
+    )
+    print(f"кэш клавиатур выбора бирж: {keyboards.get_exchanges_select_keyboard.cache_info()}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    asyncio.run(_main(n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Локальные моки API бирж для бенчмарков
+
+Один aiohttp-сервер эмулирует эндпоинты, которые вызывают адаптеры
+(Bybit, OKX, Gate, MEXC, Hyperliquid, Hibachi), под префиксом биржи:
+
+    http://127.0.0.1:{port}/bybit/v5/market/tickers?...
+
+Задержка ответа = latency ± jitter, размер ответа добирается полем-заполнителем
+до payload_bytes (нагрузка на разбор JSON). GET /stats - число запросов по биржам.
+
+Модель цен известна заранее, поэтому можно проверять корректность уведомлений:
+справедливая цена монеты медленно дрейфует, биржи котируют её с шумом
+±PRICE_NOISE, а у каждой signal_every-й монеты две биржи расходятся на
+±SIGNAL_OFFSET (ожидаемая возможность, см. expected_opportunities).
+
+Неисправности (faults) задаются на биржу, см. FAULTS.
+
+Запуск отдельно (например, для ручной проверки бота):
+    python -m benchmarks.mock_exchanges --port 9000 --latency-ms 50
+    BYBIT_API_BASE=http://127.0.0.1:9000/bybit ... python bot.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+# Префикс пути -> имя биржи в реестре
+PREFIXES = {
+    "bybit": "Bybit",
+    "okx": "OKX",
+    "gate": "Gate",
+    "mexc": "MEXC",
+    "hyperliquid": "Hyperliquid",
+    "hibachi": "Hibachi",
+}
+
+PRICE_NOISE = 0.0005  # ±0.05% - обычный разброс котировок между биржами
+SIGNAL_OFFSET = 0.015  # ±1.5% у пары бирж сигнальной монеты - спред ~3%
+PRICE_DRIFT_PER_SECOND = 0.002  # дрейф справедливой цены, +0.2%/с
+
+# ---------- Неисправности ----------
+
+FAULT_RATE_LIMIT = "rate_limit"  # шторм 429 с Retry-After
+FAULT_SLOW = "slow"  # ответ отдаётся по байту с паузами (дольше таймаутов клиента)
+FAULT_MALFORMED = "malformed"  # обрезанный JSON
+FAULT_STALE = "stale"  # цена заморожена на момент старта и не следует за рынком
+FAULT_RESET = "reset"  # соединение рвётся без ответа
+FAULT_DNS = "dns"  # имя хоста не резолвится (подменяется api_base, сервер не участвует)
+
+FAULTS = (FAULT_RATE_LIMIT, FAULT_SLOW, FAULT_MALFORMED, FAULT_STALE, FAULT_RESET, FAULT_DNS)
+
+RATE_LIMIT_SHARE = 0.9  # доля запросов с 429 во время шторма
+SLOW_CHUNK_INTERVAL = 0.5  # пауза между байтами медленного ответа, с
+
+
+class MockExchanges:
+    def __init__(
+        self,
+        coins: list[str],
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        payload_bytes: int = 0,
+        seed: int = 0,
+        exchanges: tuple[str, ...] = tuple(PREFIXES.values()),
+        signal_every: int = 3,
+        faults: Optional[dict[str, str]] = None,
+    ):
+        self.coins = coins
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_bytes = payload_bytes
+        self.faults = faults or {}
+        self.requests: Counter = Counter()
+        self.faulted: Counter = Counter()
+        self.started_at = time.time()
+        self._rng = random.Random(seed)
+        self._base = {coin: self._rng.uniform(0.1, 50_000) for coin in coins}
+        self._offsets = signal_offsets(coins, exchanges, signal_every)
+
+    def fair_price(self, coin: str, at: Optional[float] = None) -> float:
+        base = self._base.get(coin)
+        if base is None:
+            base = self._base[coin] = self._rng.uniform(0.1, 50_000)
+        return base * (1 + PRICE_DRIFT_PER_SECOND * ((at or time.time()) - self.started_at))
+
+    def price(self, exchange: str, coin: str) -> float:
+        # Застывшая биржа отдаёт цену момента старта
+        at = self.started_at if self.faults.get(exchange) == FAULT_STALE else None
+        offset = self._offsets.get((exchange, coin), 0.0)
+        return self.fair_price(coin, at) * (1 + offset + self._rng.uniform(-PRICE_NOISE, PRICE_NOISE))
+
+    async def _fault_response(self, request: web.Request, exchange: str) -> Optional[web.StreamResponse]:
+        fault = self.faults.get(exchange)
+        if fault == FAULT_RATE_LIMIT and self._rng.random() < RATE_LIMIT_SHARE:
+            self.faulted[exchange] += 1
+            return web.json_response({"error": "Too Many Requests"}, status=429, headers={"Retry-After": "1"})
+        if fault == FAULT_SLOW:
+            self.faulted[exchange] += 1
+            response = web.StreamResponse(headers={"Content-Type": "application/json"})
+            await response.prepare(request)
+            # Клиент отвалится по таймауту раньше, чем придёт весь ответ
+            for byte in b'{"retCode": 0, "result": {"list": []}}':
+                await response.write(bytes([byte]))
+                await asyncio.sleep(SLOW_CHUNK_INTERVAL)
+            await response.write_eof()
+            return response
+        if fault == FAULT_MALFORMED:
+            self.faulted[exchange] += 1
+            return web.Response(text='{"retCode": 0, "result": {"list": [{"lastPrice": "1', content_type="application/json")
+        if fault == FAULT_RESET:
+            self.faulted[exchange] += 1
+            request.transport.abort()
+            return web.Response()
+        return None
+
+    async def _respond(self, request: web.Request, exchange: str, payload) -> web.StreamResponse:
+        self.requests[exchange] += 1
+        delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        faulty = await self._fault_response(request, exchange)
+        if faulty is not None:
+            return faulty
+        if self.payload_bytes and isinstance(payload, dict):
+            payload = {**payload, "_pad": "x" * self.payload_bytes}
+        return web.Response(text=json.dumps(payload), content_type="application/json")
+
+    async def bybit(self, request: web.Request) -> web.StreamResponse:
+        coin = request.query.get("symbol", "").removesuffix("USDT")
+        price = self.price("Bybit", coin)
+        return await self._respond(request, "Bybit", {"retCode": 0, "result": {"list": [{"symbol": f"{coin}USDT", "lastPrice": str(price)}]}})
+
+    async def okx(self, request: web.Request) -> web.StreamResponse:
+        coin = request.query.get("instId", "").split("-")[0]
+        price = self.price("OKX", coin)
+        return await self._respond(request, "OKX", {"code": "0", "data": [{"instId": f"{coin}-USDT-SWAP", "last": str(price)}]})
+
+    async def gate(self, request: web.Request) -> web.StreamResponse:
+        coin = request.query.get("contract", "").removesuffix("_USDT")
+        # Gate отдаёт список; заполнитель - лишними элементами, чтобы формат не менялся
+        payload = [{"contract": f"{coin}_USDT", "last": str(self.price("Gate", coin))}]
+        if self.payload_bytes:
+            payload.append({"_pad": "x" * self.payload_bytes})
+        return await self._respond(request, "Gate", payload)
+
+    async def mexc(self, request: web.Request) -> web.StreamResponse:
+        coin = request.query.get("symbol", "").removesuffix("USDT")
+        return await self._respond(request, "MEXC", {"symbol": f"{coin}USDT", "price": str(self.price("MEXC", coin))})
+
+    async def hibachi(self, request: web.Request) -> web.StreamResponse:
+        coin = request.query.get("symbol", "").split("/")[0]
+        price = self.price("Hibachi", coin)
+        return await self._respond(request, "Hibachi", {
+            "symbol": f"{coin}/USDT-P",
+            "tradePrice": str(price),
+            "bidPrice": str(price * 0.9999),
+            "askPrice": str(price * 1.0001),
+        })
+
+    async def hyperliquid(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        kind = body.get("type")
+        if kind == "allMids":
+            return await self._respond(request, "Hyperliquid", {coin: str(self.price("Hyperliquid", coin)) for coin in self.coins})
+        if kind == "meta":
+            return await self._respond(request, "Hyperliquid", {"universe": [{"name": coin, "szDecimals": 2} for coin in self.coins]})
+        if kind == "spotMeta":
+            return await self._respond(request, "Hyperliquid", {"universe": [], "tokens": []})
+        return web.json_response({"error": f"unsupported type {kind}"}, status=400)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.requests))
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/bybit/v5/market/tickers", self.bybit)
+        app.router.add_get("/okx/api/v5/market/ticker", self.okx)
+        app.router.add_get("/gate/api/v4/futures/usdt/tickers", self.gate)
+        app.router.add_get("/mexc/api/v3/ticker/price", self.mexc)
+        app.router.add_get("/hibachi/market/data/prices", self.hibachi)
+        app.router.add_post("/hyperliquid/info", self.hyperliquid)
+        app.router.add_get("/stats", self.stats)
+        return app
+
+
+def signal_offsets(coins: list[str], exchanges: tuple[str, ...], signal_every: int) -> dict[tuple[str, str], float]:
+    """Смещения цен сигнальных монет: (биржа, монета) -> доля. Пары бирж чередуются по кругу."""
+    offsets = {}
+    if signal_every <= 0 or len(exchanges) < 2:
+        return offsets
+    for index, coin in enumerate(coins):
+        if index % signal_every:
+            continue
+        number = index // signal_every
+        long_exchange = exchanges[number % len(exchanges)]
+        short_exchange = exchanges[(number + 1) % len(exchanges)]
+        offsets[(long_exchange, coin)] = -SIGNAL_OFFSET
+        offsets[(short_exchange, coin)] = SIGNAL_OFFSET
+    return offsets
+
+
+def expected_opportunities(coins: list[str], exchanges: tuple[str, ...], signal_every: int) -> set[tuple[str, str, str]]:
+    """Ожидаемые возможности (монета, лонг, шорт) при исправных биржах"""
+    offsets = signal_offsets(coins, exchanges, signal_every)
+    expected = set()
+    for coin in coins:
+        low = [name for name in exchanges if offsets.get((name, coin), 0.0) < 0]
+        high = [name for name in exchanges if offsets.get((name, coin), 0.0) > 0]
+        expected.update((coin, long_exchange, short_exchange) for long_exchange in low for short_exchange in high)
+    return expected
+
+
+def api_bases(host: str, port: int, unresolvable: tuple[str, ...] = ()) -> dict[str, str]:
+    """api_base для каждой биржи, указывающие на мок; биржам из unresolvable - несуществующий хост"""
+    return {
+        name: f"http://{prefix}.mock.invalid:{port}/{prefix}" if name in unresolvable else f"http://{host}:{port}/{prefix}"
+        for prefix, name in PREFIXES.items()
+    }
+
+
+def serve(port: int, coins: list[str], latency: float, jitter: float, payload_bytes: int, host: str = "127.0.0.1", **options):
+    """Блокирующий запуск мока (для отдельного процесса); options - параметры MockExchanges"""
+    mock = MockExchanges(coins, latency, jitter, payload_bytes, **options)
+    web.run_app(mock.app(), host=host, port=port, print=None, handle_signals=True)
+
+
+def main():
+    from config import ALL_COINS
+
+    parser = argparse.ArgumentParser(description="Локальные моки API бирж")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument("--fault", action="append", default=[], metavar="EXCHANGE=FAULT", help=f"Неисправность биржи: {', '.join(FAULTS)}")
+    args = parser.parse_args()
+    faults = dict(item.split("=", 1) for item in args.fault)
+    for name, base in api_bases(args.host, args.port).items():
+        print(f"{name.upper()}_API_BASE={base}")
+    serve(
+        args.port, list(dict.fromkeys(ALL_COINS)), args.latency_ms / 1000, args.jitter_ms / 1000, args.payload_bytes,
+        args.host, faults=faults,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Нагрузочный прогон обработчиков Telegram на синтетических пользователях
+
+Тысячи синтетических пользователей проходят типичный сценарий (меню,
+настройки кнопками и ручным вводом, монеты, биржи). Их
+Message и CallbackQuery подаются в настоящий Dispatcher с теми же
+обработчиками и middleware, что в bot.py. Бот работает через
+RecordingSession: запросы к Bot API не уходят в сеть, а считаются, и
+на каждый выдерживается заданная задержка API. Скан синтетические
+пользователи не запускают: сканирующую нагрузку задаёт только --scan-users.
+
+Прогон идёт в две фазы: без сканирования и при работающем
+check_spreads_task (на моках бирж из benchmarks.mock_exchanges). Если
+изменение настроек где-то ждёт цикл проверки, p99 во второй фазе уходит
+к длительности цикла. Порог задаёт --max-p99-ms; при превышении код
+выхода 1.
+
+Запуск из корня репозитория:
+    python -m benchmarks.telegram_load --users 2000 --concurrency 200
+    python -m benchmarks.telegram_load --users 5000 --api-latency-ms 40 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Chat, Message, Update
+
+import models
+from benchmarks.e2e_scan import MOCKED_EXCHANGES, NullBot, git_revision, setup_user, wait_ready
+from benchmarks.mock_exchanges import api_bases, serve
+from config import ALL_COINS, ALL_EXCHANGES
+from handlers.callbacks import register_callback_handlers
+from handlers.commands import register_commands
+from handlers.messages import register_message_handlers
+from handlers.middlewares import ResidencyMiddleware
+from keyboards import (
+    CALLBACK_COINS_ADD,
+    CALLBACK_EXCHANGES_SELECT,
+    CALLBACK_MIN_SPREAD,
+    CALLBACK_NOTIFY_CLOSE,
+    CALLBACK_SETTINGS,
+    exchange_toggle_callback,
+    manual_input_callback,
+    preset_callback,
+)
+from services import metrics
+from services.notifier import notifier
+from services.spread_checker import check_spreads_task
+from services.storage import SettingsStore, flush_settings_task
+from utils.logger import setup_logging
+
+# Пользователи сканирующей нагрузки - отдельный диапазон id
+SCAN_USER_ID_BASE = 10_000_000
+
+# Изменения настроек (для отдельной статистики "не ждёт ли настройка скан")
+SETTINGS_CHANGES = {"spread_input", "coins_input", "toggle_exchange", "profit_preset", "notify_close"}
+
+
+class RecordingSession(BaseSession):
+    """Сессия Bot API без сети: считает вызовы и отвечает правдоподобными объектами"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is bool or getattr(method, "chat_id", None) is None:
+            return True
+        self._message_id += 1
+        return Message(
+            message_id=self._message_id,
+            date=datetime.now(),
+            chat=Chat(id=method.chat_id, type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        raise RuntimeError("Загрузка файлов в нагрузочном прогоне не используется")
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class SyntheticUsers:
+    """Генератор обновлений Telegram для синтетических пользователей"""
+
+    def __init__(self, bot: Bot, seed: int = 0):
+        self.bot = bot
+        self._rng = random.Random(seed)
+        self._update_id = 0
+        self._coins = list(dict.fromkeys(ALL_COINS))
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    def _user(self, user_id: int) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def message(self, user_id: int, text: str) -> Update:
+        update_id = self._next_id()
+        return Update.model_validate({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": self._user(user_id),
+                "text": text,
+            },
+        }, context={"bot": self.bot})
+
+    def callback(self, user_id: int, data: str) -> Update:
+        update_id = self._next_id()
+        return Update.model_validate({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+                    "text": "menu",
+                },
+            },
+        }, context={"bot": self.bot})
+
+    def script(self, user_id: int) -> list[tuple[str, Update]]:
+        """Типичная сессия пользователя: (вид шага, обновление)"""
+        exchange = self._rng.choice(MOCKED_EXCHANGES)
+        coins = " ".join(self._rng.sample(self._coins, 3)).lower()
+        return [
+            ("start", self.message(user_id, "/start")),
+            ("settings_menu", self.message(user_id, "⚙️ Настройки")),
+            ("callback_menu", self.callback(user_id, CALLBACK_MIN_SPREAD)),
+            ("callback_menu", self.callback(user_id, manual_input_callback("spread"))),
+            ("spread_input", self.message(user_id, f"{self._rng.uniform(0.1, 2):.2f}")),
+            ("callback_menu", self.callback(user_id, CALLBACK_SETTINGS)),
+            ("profit_preset", self.callback(user_id, preset_callback("profit", 20))),
+            ("notify_close", self.callback(user_id, CALLBACK_NOTIFY_CLOSE)),
+            ("coins_menu", self.message(user_id, "🪙 Монеты")),
+            ("callback_menu", self.callback(user_id, CALLBACK_COINS_ADD)),
+            ("coins_input", self.message(user_id, coins)),
+            ("exchanges_menu", self.message(user_id, "🏦 Биржи")),
+            ("callback_menu", self.callback(user_id, CALLBACK_EXCHANGES_SELECT)),
+            ("toggle_exchange", self.callback(user_id, exchange_toggle_callback(exchange))),
+            ("show_settings", self.message(user_id, "📊 Текущие настройки")),
+        ]
+
+
+def _percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def at(q: float) -> float:
+        return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+    return {"count": len(values), "p50_ms": at(50), "p90_ms": at(90), "p99_ms": at(99), "max_ms": values[-1] * 1000}
+
+
+async def _loop_lag_probe(samples: list[float], interval: float = 0.01):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def run_phase(dp: Dispatcher, bot: Bot, users: SyntheticUsers, user_ids: range, concurrency: int) -> dict:
+    """Все пользователи проходят сценарий параллельно (шаги одного пользователя - по порядку)"""
+    latencies: dict[str, list[float]] = defaultdict(list)
+    lag: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def session(user_id: int):
+        nonlocal errors
+        async with semaphore:
+            for kind, update in users.script(user_id):
+                started = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception:
+                    errors += 1
+                latencies[kind].append(time.perf_counter() - started)
+
+    probe = asyncio.create_task(_loop_lag_probe(lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(session(user_id) for user_id in user_ids))
+    elapsed = time.perf_counter() - started
+    probe.cancel()
+
+    every = [value for values in latencies.values() for value in values]
+    settings = [value for kind, values in latencies.items() if kind in SETTINGS_CHANGES for value in values]
+    return {
+        "updates": len(every),
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "updates_per_second": len(every) / elapsed,
+        "latency": _percentiles(every),
+        "settings_changes": _percentiles(settings),
+        "by_step": {kind: _percentiles(values) for kind, values in sorted(latencies.items())},
+        "loop_lag": _percentiles(lag),
+    }
+
+
+async def run_load(args) -> dict:
+    session = RecordingSession(args.api_latency_ms / 1000)
+    bot = Bot(token="123456:LOADTEST", session=session)
+    dp = Dispatcher()
+    register_commands(dp)
+    register_callback_handlers(dp)
+    register_message_handlers(dp)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SettingsStore(os.path.join(directory, "load.sqlite3"))
+        models.settings_loader = store.load_one
+        dp.message.outer_middleware(ResidencyMiddleware(store))
+        dp.callback_query.outer_middleware(ResidencyMiddleware(store))
+        flush_task = asyncio.create_task(flush_settings_task(store))
+        users = SyntheticUsers(bot)
+        result = {"api_calls": {}}
+        try:
+            result["idle"] = await run_phase(dp, bot, users, range(1, args.users + 1), args.concurrency)
+
+            if args.scan_users:
+                for name, base in api_bases("127.0.0.1", args.port).items():
+                    ALL_EXCHANGES[name]["api_base"] = base
+                coins = list(dict.fromkeys(ALL_COINS))[:5]
+                for index in range(args.scan_users):
+                    setup_user(SCAN_USER_ID_BASE + index, coins, MOCKED_EXCHANGES[:4])
+                async with aiohttp.ClientSession() as http:
+                    await wait_ready(http, f"http://127.0.0.1:{args.port}/stats")
+                notifier.start(NullBot())
+                scan = asyncio.create_task(check_spreads_task(None))
+                try:
+                    second = range(args.users + 1, 2 * args.users + 1)
+                    result["scanning"] = await run_phase(dp, bot, users, second, args.concurrency)
+                finally:
+                    scan.cancel()
+                    await notifier.stop()
+                result["scanning"]["scan_cycles_completed"] = metrics.scan_cycle.count
+        finally:
+            flush_task.cancel()
+            store.close()
+        result["api_calls"] = dict(session.calls)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон обработчиков Telegram")
+    parser.add_argument("--users", type=int, default=2000, help="Синтетических пользователей в каждой фазе")
+    parser.add_argument("--concurrency", type=int, default=200, help="Одновременно активных пользователей")
+    parser.add_argument("--api-latency-ms", type=float, default=30, help="Задержка ответа Bot API")
+    parser.add_argument("--scan-users", type=int, default=20, help="Сканирующих пользователей во второй фазе (0 - без неё)")
+    parser.add_argument("--max-p99-ms", type=float, default=0, help="Порог p99 изменений настроек во время скана (0 - не проверять)")
+    parser.add_argument("--port", type=int, default=0, help="Порт мока бирж")
+    parser.add_argument("--output", help="Файл для JSON-результата")
+    args = parser.parse_args()
+    # Тот же конвейер логов, что у бота (очередь и поток-слушатель); по умолчанию только предупреждения
+    setup_logging(os.getenv("LOG_LEVEL", "WARNING"))
+    if not args.port:
+        args.port = random.randint(20000, 60000)
+
+    mock = None
+    if args.scan_users:
+        mock = multiprocessing.Process(
+            target=serve, args=(args.port, list(dict.fromkeys(ALL_COINS)), 0.05, 0.02, 0), daemon=True
+        )
+        mock.start()
+    try:
+        result = asyncio.run(run_load(args))
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.join()
+
+    result = {
+        "benchmark": "telegram_load",
+        "revision": git_revision(),
+        "params": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "api_latency_ms": args.api_latency_ms,
+            "scan_users": args.scan_users,
+        },
+        **result,
+    }
+    for phase in ("idle", "scanning"):
+        if phase not in result:
+            continue
+        data = result[phase]
+        print(
+            f"{phase:<9} {data['updates_per_second']:8.0f} апдейтов/с, ошибок {data['errors']}, "
+            f"p50 {data['latency']['p50_ms']:.1f} мс, p99 {data['latency']['p99_ms']:.1f} мс, "
+            f"настройки p99 {data['settings_changes']['p99_ms']:.1f} мс, "
+            f"лаг loop max {data['loop_lag'].get('max_ms', 0):.1f} мс"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.max_p99_ms and "scanning" in result:
+        p99 = result["scanning"]["settings_changes"]["p99_ms"]
+        if p99 > args.max_p99_ms:
+            print(f"Изменения настроек во время скана: p99 {p99:.1f} мс > {args.max_p99_ms:.1f} мс", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
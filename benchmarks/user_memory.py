@@ -0,0 +1,89 @@
+"""
+Память на пользователя: прежний dataclass со списками vs компактный UserSettings
+
+Запуск из корня репозитория:
+    python -m benchmarks.user_memory [N]
+"""
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+
+from config import ALL_COINS, ALL_EXCHANGES
+from models import UserSettings
+from utils.coin_normalizer import normalize_coin_input
+
+
+@dataclass
+class LegacyUserSettings:
+    """Копия прежнего представления (списки строк) для сравнения"""
+    coins: list[str] = field(default_factory=list)
+    min_spread: float = 2.0
+    min_profit_usd: float = 10.0
+    min_zscore: float = 0.0
+    sources: list[str] = field(default_factory=list)
+    position_size_usd: float = 100.0
+    leverage: float = 1.0
+    interval_seconds: int = 60
+    paused: bool = False
+    scan_active: bool = False
+    track_all_coins: bool = False
+    track_all_exchanges: bool = False
+    notify_on_close: bool = False
+    selected_exchanges: list[str] = field(default_factory=list)
+    pending_action: str | None = None
+    menu_message_id: int | None = None
+
+
+def _user_inputs(n: int) -> list[tuple[str, list[str]]]:
+    rng = random.Random(0)
+    exchanges = list(ALL_EXCHANGES)
+    return [
+        (" ".join(rng.sample(ALL_COINS, 5)).lower(), rng.sample(exchanges, 3))
+        for _ in range(n)
+    ]
+
+
+def measure_legacy(inputs) -> float:
+    tracemalloc.start()
+    users = {}
+    for user_id, (coins_text, exchanges) in enumerate(inputs):
+        s = LegacyUserSettings()
+        for ticker in normalize_coin_input(coins_text):
+            s.coins.append(ticker)
+        for name in exchanges:
+            # Как в обработчике: имя берётся из callback.data (новая строка)
+            s.selected_exchanges.append(f"exchanges_toggle_{name}".replace("exchanges_toggle_", ""))
+        users[user_id] = s
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / len(inputs)
+
+
+def measure_compact(inputs) -> float:
+    tracemalloc.start()
+    users = {}
+    for user_id, (coins_text, exchanges) in enumerate(inputs):
+        s = UserSettings()
+        for ticker in normalize_coin_input(coins_text):
+            s.add_coin(ticker)
+        for name in exchanges:
+            s.toggle_exchange(f"exchanges_toggle_{name}".replace("exchanges_toggle_", ""))
+        users[user_id] = s
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / len(inputs)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    inputs = _user_inputs(n)
+    legacy = measure_legacy(inputs)
+    compact = measure_compact(inputs)
+    print(f"Пользователей: {n} (5 монет, 3 биржи у каждого)")
+    print(f"  dataclass со списками: {legacy:8.1f} байт/пользователь")
+    print(f"  компактный UserSettings: {compact:8.1f} байт/пользователь ({compact / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,53 @@ from dotenv import load_dotenv
 from handlers.commands import register_commands
 from handlers.messages import register_message_handlers
 from handlers.callbacks import register_callback_handlers
+from handlers.middlewares import ResidencyMiddleware
 from services.spread_checker import check_spreads_task
+from services.notifier import notifier
+from services.dashboard import live_dashboard
+from services.tick_recorder import tick_recorder
+from services.webhook import WebhookServer
+from services.market_snapshot import market_feed
+from services.quick_scan import quick_scanner
+from services.coin_universe import coin_universe
+from services.warm_state import load_state, save_final_state, save_state_task
+from services.metrics import start_metrics_server
+from services.storage import SettingsStore, flush_settings_task, flush_dirty_sync, load_user_settings
+from config import COIN_UNIVERSE_DEFAULT_PATH, WARM_STATE_DEFAULT_PATH, WEBHOOK_DEFAULT_WORKERS
+from utils.logger import setup_logging
+import models
 
 # ---------- Загрузка токена ----------
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+# Каталог для записи тиков; если не задан - запись выключена
+TICK_RECORDER_DIR = os.getenv("TICK_RECORDER_DIR")
+# Файл SQLite с настройками пользователей
+SETTINGS_DB_PATH = os.getenv("SETTINGS_DB_PATH", "data/bot.sqlite3")
+# Снимки рынка от collector.py; если не задан - бот опрашивает биржи сам
+MARKET_SNAPSHOT_PATH = os.getenv("MARKET_SNAPSHOT_PATH")
+# Кэш списков инструментов бирж ("Все монеты"); общий для бота, воркеров и коллектора
+COIN_UNIVERSE_PATH = os.getenv("COIN_UNIVERSE_PATH", COIN_UNIVERSE_DEFAULT_PATH)
+# Снимок состояния проверки для тёплого старта (без повторных уведомлений после перезапуска)
+WARM_STATE_PATH = os.getenv("WARM_STATE_PATH", WARM_STATE_DEFAULT_PATH)
+# Число воркеров scanner.py; если > 0 - этот процесс только принимает обновления и хранит настройки
+SCAN_SHARDS = int(os.getenv("SCAN_SHARDS", "0"))
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+# Публичный адрес для setWebhook; если не задан - сервер только слушает (локальная проверка)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", str(WEBHOOK_DEFAULT_WORKERS)))
+# Порт для /metrics (Prometheus); если не задан - метрики не отдаются
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+if BOT_MODE not in ("polling", "webhook"):
+    raise RuntimeError(f"Неизвестный BOT_MODE={BOT_MODE!r}: ожидается polling или webhook")
 
 if not BOT_TOKEN:
     raise RuntimeError(
@@ -40,6 +81,9 @@ async def setup_menu_button():
             BotCommand(command="help", description="Помощь"),
             BotCommand(command="pause", description="Пауза уведомлений"),
             BotCommand(command="resume", description="Возобновить уведомления"),
+            BotCommand(command="stats", description="Статистика спредов по монете"),
+            BotCommand(command="scan", description="Спред и профит по монете прямо сейчас"),
+            BotCommand(command="top", description="Лучшие спреды по всем монетам"),
         ]
         await bot.set_my_commands(commands)
         
@@ -49,18 +93,85 @@ async def setup_menu_button():
         print(f"Ошибка настройки Menu Button: {e}")
 
 
+# ---------- Webhook ----------
+
+
+async def run_webhook():
+    server = WebhookServer(dp, bot, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET, workers=WEBHOOK_WORKERS)
+    await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        print(f"Webhook установлен: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+    else:
+        print("WEBHOOK_URL не задан: setWebhook не вызывается, обновления можно отправлять вручную")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
 # ---------- Точка входа ----------
 
 
 async def main():
+    setup_logging()
     print("Бот запускается...")
     
+    store = SettingsStore(SETTINGS_DB_PATH)
+    loaded = await load_user_settings(store)
+    models.settings_loader = store.load_one
+    dp.message.outer_middleware(ResidencyMiddleware(store))
+    dp.callback_query.outer_middleware(ResidencyMiddleware(store))
+    print(f"Загружено настроек пользователей: {loaded}")
+    
     await setup_menu_button()
     
-    # Запускаем фоновую задачу проверки спредов
-    asyncio.create_task(check_spreads_task(bot))
+    coin_universe.load(COIN_UNIVERSE_PATH)
+    print(f"Вселенная монет: {len(coin_universe.coins)} монет")
     
-    await dp.start_polling(bot)
+    if TICK_RECORDER_DIR:
+        tick_recorder.start(TICK_RECORDER_DIR)
+    
+    if MARKET_SNAPSHOT_PATH:
+        market_feed.attach(MARKET_SNAPSHOT_PATH)
+        print(f"Котировки читаются из снимков коллектора: {MARKET_SNAPSHOT_PATH}")
+    
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_HOST, METRICS_PORT)
+    
+    # Запускаем фоновые задачи: доставка уведомлений, проверка спредов и сохранение настроек
+    notifier.start(bot)
+    state_task = None
+    if SCAN_SHARDS > 0:
+        print(f"Шардированный режим: сканируют {SCAN_SHARDS} воркеров scanner.py")
+    else:
+        restored = load_state(WARM_STATE_PATH)
+        if restored:
+            print(f"Состояние восстановлено из {WARM_STATE_PATH}: {restored}")
+        asyncio.create_task(live_dashboard.run(bot))
+        asyncio.create_task(check_spreads_task(bot))
+        state_task = asyncio.create_task(save_state_task(WARM_STATE_PATH))
+    asyncio.create_task(flush_settings_task(store))
+    asyncio.create_task(coin_universe.run(COIN_UNIVERSE_PATH))
+    
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            # Установленный ранее webhook блокирует getUpdates
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        flush_dirty_sync(store)
+        store.close()
+        if SCAN_SHARDS <= 0:
+            await save_final_state(state_task, WARM_STATE_PATH)
+        tick_recorder.stop()
+        await quick_scanner.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+"""
+Отдельный процесс сбора рыночных данных
+
+Публикует снимки котировок в разделяемую память; бот с тем же
+MARKET_SNAPSHOT_PATH читает их вместо собственных запросов к биржам.
+
+Пример:
+    MARKET_SNAPSHOT_PATH=/dev/shm/arb-bot-market python collector.py
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from config import COIN_UNIVERSE_DEFAULT_PATH, MARKET_SNAPSHOT_DEFAULT_PATH
+from services.coin_universe import coin_universe
+from services.collector import MarketCollector
+from services.market_snapshot import SnapshotWriter
+from services.metrics import start_metrics_server
+from services.tick_recorder import tick_recorder
+from utils.logger import setup_logging
+
+
+async def main():
+    load_dotenv()
+    setup_logging()
+    path = os.getenv("MARKET_SNAPSHOT_PATH", MARKET_SNAPSHOT_DEFAULT_PATH)
+    tick_dir = os.getenv("TICK_RECORDER_DIR")
+    metrics_port = int(os.getenv("COLLECTOR_METRICS_PORT", "0"))
+    universe_path = os.getenv("COIN_UNIVERSE_PATH", COIN_UNIVERSE_DEFAULT_PATH)
+
+    writer = SnapshotWriter(path)
+    print(f"Коллектор публикует снимки в {path}")
+    if tick_dir:
+        tick_recorder.start(tick_dir)
+    if metrics_port:
+        await start_metrics_server(os.getenv("METRICS_HOST", "127.0.0.1"), metrics_port)
+    coin_universe.load(universe_path)
+    universe_task = asyncio.create_task(coin_universe.run(universe_path))
+    try:
+        await MarketCollector(writer).run()
+    finally:
+        universe_task.cancel()
+        tick_recorder.stop()
+        writer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,5 @@
+import os
+
 # ---------- Конфигурация бирж ----------
 
 CEX_EXCHANGES = {
@@ -52,8 +54,8 @@ DEX_EXCHANGES = {
     "Hibachi": {
         "name": "Hibachi",
         "type": "DEX",
-        "api_base": "https://api.hibachi.fi",
-        "ticker_endpoint": "/v1/ticker",
+        "api_base": "https://data-api.hibachi.xyz",
+        "ticker_endpoint": "/market/data/prices",
         "maker_fee": 0.02,
         "taker_fee": 0.05,
         "url_template": "https://app.hibachi.fi/perpetual/{symbol}",
@@ -71,15 +73,181 @@ DEX_EXCHANGES = {
 
 ALL_EXCHANGES = {**CEX_EXCHANGES, **DEX_EXCHANGES}
 
+# Адрес API можно переопределить окружением: BYBIT_API_BASE=http://127.0.0.1:9000/bybit
+# (стенды, бенчмарки с локальными моками). Адаптеры читают api_base при каждом запросе.
+for _name, _exchange in ALL_EXCHANGES.items():
+    _exchange["api_base"] = os.getenv(f"{_name.upper()}_API_BASE", _exchange["api_base"]).rstrip("/")
+
 POPULAR_COINS = [
-    "BTC", "ETH", "SOL", "BNB", "XRP", "ADA", "DOGE", "DOT", "MATIC", "AVAX",
+    "BTC", "ETH", "SOL", "BNB", "XRP", "ADA", "DOGE", "DOT", "POL", "AVAX",
     "LINK", "UNI", "ATOM", "ETC", "LTC", "BCH", "XLM", "ALGO", "VET", "FIL",
-    "TRX", "EOS", "AAVE", "MKR", "COMP", "SNX", "YFI", "SUSHI", "CRV", "1INCH"
+    "TRX", "AAVE", "MKR", "COMP", "SNX", "YFI", "SUSHI", "CRV", "1INCH"
 ]
 
+# Запасной список "Все монеты": используется, пока нет кэша вселенной монет
+# (services/coin_universe.py), и задаёт порядок популярных монет в ней
 ALL_COINS = POPULAR_COINS + [
-    "ARB", "OP", "APT", "SUI", "TIA", "SEI", "INJ", "NEAR", "FTM", "AVAX",
+    "ARB", "OP", "APT", "SUI", "TIA", "SEI", "INJ", "NEAR",
     "ICP", "HBAR", "QNT", "EGLD", "FLOW", "THETA", "AXS", "SAND", "MANA", "ENJ"
 ]
 
+# ---------- Вселенная монет ----------
+
+# Кэш списков инструментов бирж (переопределяется COIN_UNIVERSE_PATH)
+COIN_UNIVERSE_DEFAULT_PATH = "data/coin_universe.json"
+COIN_UNIVERSE_TTL_SECONDS = 6 * 3600
+COIN_UNIVERSE_CHECK_SECONDS = 60
+COIN_UNIVERSE_MIN_EXCHANGES = 2  # монета нужна хотя бы на двух биржах - иначе нет пары
+COIN_UNIVERSE_FETCH_TIMEOUT_SECONDS = 15
+
+# Минимальный интервал между уведомлениями об открытии одной и той же возможности
 MIN_NOTIFICATION_INTERVAL_MINUTES = 1
+
+# ---------- Жизненный цикл возможностей (гистерезис) ----------
+
+# Возможность открывается, когда спред и профит достигают порогов пользователя
+# (ratio >= ENTRY), и закрывается только когда опускаются ниже EXIT * порог
+OPPORTUNITY_ENTRY_RATIO = 1.0
+OPPORTUNITY_EXIT_RATIO = 0.8
+OPPORTUNITY_CLOSED_TTL_SECONDS = 600
+OPPORTUNITY_STALE_SECONDS = 300
+OPPORTUNITY_TRACKER_CAPACITY = 20000
+
+# ---------- История спредов ----------
+
+SPREAD_HISTORY_SIZE = 720  # точек на пару (монета, лонг, шорт)
+SPREAD_HISTORY_MIN_INTERVAL_SECONDS = 1.0
+SPREAD_HISTORY_MIN_SAMPLES = 30  # меньше - z-score не считается
+SPREAD_HISTORY_EWMA_ALPHA = 0.05
+# Гистограмма чистого спреда (%) для приближённых перцентилей
+SPREAD_HISTOGRAM_MIN = -2.0
+SPREAD_HISTOGRAM_MAX = 8.0
+SPREAD_HISTOGRAM_BINS = 400
+
+# ---------- Запись тиков ----------
+
+TICK_RECORDER_QUEUE_SIZE = 200000  # при переполнении тики отбрасываются, цикл не ждёт диск
+TICK_RECORDER_FLUSH_SECONDS = 1.0
+TICK_RECORDER_MAX_BATCH = 20000
+
+# ---------- Бэктест ----------
+
+BACKTEST_MAX_QUOTE_AGE_SECONDS = 10.0
+BACKTEST_SWEEP_INTERVAL_SECONDS = 1.0
+
+# ---------- Хранение настроек ----------
+
+SETTINGS_FLUSH_SECONDS = 2.0
+# При старте поднимаются пользователи с активным сканом или менявшие настройки за этот срок
+USER_ACTIVE_DAYS = 30
+
+# Через сколько секунд повторно спрашивать биржу, не вернувшую цену по монете
+QUOTE_INDEX_RETRY_SECONDS = 900
+# Сколько пользователей держать в памяти; неактивные без скана вытесняются в БД
+USER_RESIDENT_LIMIT = 20000
+
+# ---------- Доставка уведомлений ----------
+
+TELEGRAM_GLOBAL_RATE = 25  # сообщений в секунду (лимит Telegram ~30)
+TELEGRAM_CHAT_INTERVAL_SECONDS = 1.0
+TELEGRAM_MESSAGE_LIMIT = 4096
+NOTIFY_MAX_PENDING_PER_CHAT = 20
+NOTIFY_WORKERS = 8
+NOTIFY_MAX_ATTEMPTS = 3
+
+# Сколько отрендеренных уведомлений (текст + клавиатура) держать в LRU-кэше
+ALERT_RENDER_CACHE_SIZE = 4096
+
+# ---------- Live-сообщение со спредами ----------
+
+DASHBOARD_EDIT_INTERVAL_SECONDS = 15  # не чаще одной правки сообщения пользователя
+DASHBOARD_TICK_SECONDS = 1.0
+DASHBOARD_TOP_N = 10
+DASHBOARD_ENTRY_TTL_SECONDS = 120  # возможность без подтверждения дольше - убирается из сообщения
+
+# ---------- Webhook ----------
+
+WEBHOOK_DEFAULT_WORKERS = 8
+WEBHOOK_QUEUE_SIZE = 10000  # принятых, но не обработанных обновлений; дальше - 503
+
+# ---------- Снимки рынка (отдельный процесс-коллектор) ----------
+
+MARKET_SNAPSHOT_DEFAULT_PATH = "/dev/shm/arb-bot-market" if os.path.isdir("/dev/shm") else "data/market.snapshot"
+SNAPSHOT_SLOTS = 4
+SNAPSHOT_MAX_QUOTES = 8192
+SNAPSHOT_MAX_QUOTE_AGE_SECONDS = 10.0  # более старые котировки из снимка не используются
+MARKET_COLLECT_INTERVAL_SECONDS = 2.0
+# Снимок публикуется по мере ответов бирж, не реже раза в столько секунд
+MARKET_COLLECT_PUBLISH_SECONDS = 0.5
+# Цикл не ждёт медленную биржу дольше: её опрос продолжается в следующем цикле
+MARKET_COLLECT_CYCLE_SECONDS = 5.0
+MARKET_COLLECT_TIMEOUT_SECONDS = 3.0
+MARKET_COLLECT_DEFAULT_CONCURRENCY = 8
+# Одновременных запросов к бирже (Hibachi ограничивает частоту сам)
+MARKET_COLLECT_CONCURRENCY = {
+    "Hibachi": 1,
+}
+
+# ---------- Шардирование сканирования ----------
+
+SHARD_VIRTUAL_NODES = 256  # точек на воркер в кольце консистентного хэширования
+SHARD_SYNC_SECONDS = 2.0  # как часто воркер подтягивает изменённые настройки из БД
+SHARD_SYNC_OVERLAP_SECONDS = 5.0
+SHARD_MAP_DEFAULT_PATH = "data/shards.json"
+
+# ---------- Логирование ----------
+
+LOG_SAMPLE_BURST = 20  # записей одного шаблона ниже WARNING за окно
+LOG_SAMPLE_WINDOW_SECONDS = 10.0
+
+# ---------- Метрики ----------
+
+METRICS_LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+METRICS_CYCLE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+METRICS_DELIVERY_BUCKETS = (0.25, 0.5, 1, 2, 3, 5, 10, 20, 30, 60)
+METRICS_LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# ---------- Профилирование (/perf) ----------
+
+PERF_CYCLES_KEPT = 200  # последних циклов проверки в отчёте
+PERF_SLOWEST_CALLS = 10  # самых медленных запросов (биржа, монета)
+PERF_PROFILE_DEFAULT_SECONDS = 30
+PERF_PROFILE_MAX_SECONDS = 120
+PERF_PROFILE_INTERVAL_SECONDS = 0.005  # период сэмплирования стека
+
+# ---------- Пресеты настроек ----------
+
+# Кнопки быстрого выбора: настройка -> значения. Клавиатуры и обработка
+# callback строятся по этой таблице, новый пресет - только новое значение здесь.
+# interval: 0 - режим "Постоянно"
+SETTING_PRESETS = {
+    "position": (1000, 5000, 10000),
+    "spread": (0.05, 0.1, 0.25, 0.5),
+    "profit": (5, 10, 20, 50, 100),
+    "interval": (10, 30, 60, 300, 0),
+}
+
+# Клавиатур выбора бирж в кэше (по одной на маску выбранных бирж)
+KEYBOARD_CACHE_SIZE = 256
+
+# ---------- Проверка по запросу (/scan) ----------
+
+SCAN_MAX_QUOTE_AGE_SECONDS = 5.0  # котировки не старше - ответ без запросов к биржам
+SCAN_FETCH_TIMEOUT_SECONDS = 1.5  # ожидание недостающих котировок; опоздавшие ответы уходят в кэш
+SCAN_MAX_COINS = 10  # монет в одной команде
+SCAN_PAIRS_SHOWN = 3  # лучших пар на монету
+
+# ---------- Лучшие спреды (/top) ----------
+
+TOP_CAPACITY = 500  # пар (монета, лонг, шорт) в таблице лучших
+TOP_ENTRY_TTL_SECONDS = 120  # пара без обновления дольше - не показывается
+TOP_DEFAULT_N = 10
+TOP_MAX_N = 50
+TOP_PAGE_SIZE = 10
+
+# ---------- Тёплый старт ----------
+
+# Снимок состояния проверки (индекс котировок, кэш котировок, возможности с временем
+# уведомлений, /top); переопределяется WARM_STATE_PATH, воркеры добавляют номер шарда
+WARM_STATE_DEFAULT_PATH = "data/warm_state.json"
+WARM_STATE_SAVE_SECONDS = 10.0
@@ -1,10 +1,16 @@
-from aiogram import Dispatcher, F
+import logging
+from typing import Awaitable, Callable
+
+from aiogram import Dispatcher
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
-from models import get_user_settings, user_settings
-from config import ALL_EXCHANGES, CEX_EXCHANGES, DEX_EXCHANGES, ALL_COINS
+from models import get_user_settings, mark_dirty
+from config import SETTING_PRESETS, TOP_MAX_N
+from utils.registry import CEX_MASK, DEX_MASK
+from services.dashboard import live_dashboard
+from services.coin_universe import coin_universe
+from handlers.commands import build_top_message
 from keyboards import (
-    get_main_menu_reply_keyboard,
     get_settings_keyboard,
     get_coins_keyboard,
     get_coins_selected_keyboard,
@@ -14,7 +20,16 @@ from keyboards import (
     get_position_keyboard,
     get_spread_keyboard,
     get_profit_keyboard,
+    get_zscore_keyboard,
     get_interval_keyboard,
+    exchange_toggle_callback,
+    manual_input_callback,
+    preset_callback,
+    top_page_callback,
+    CALLBACK_SEPARATOR,
+    LEGACY_CALLBACKS,
+    LEGACY_EXCHANGES_TOGGLE,
+    PRESET_SETTINGS,
     CALLBACK_MAIN_MENU,
     CALLBACK_SETTINGS,
     CALLBACK_COINS,
@@ -25,66 +40,120 @@ from keyboards import (
     CALLBACK_COINS_LIST,
     CALLBACK_EXCHANGES,
     CALLBACK_EXCHANGES_CEX,
-    CALLBACK_EXCHANGES_DEX,
     CALLBACK_EXCHANGES_SELECT,
     CALLBACK_EXCHANGES_ALL,
-    CALLBACK_EXCHANGES_TOGGLE,
     CALLBACK_EXCHANGES_ALL_ENABLE,
-    CALLBACK_EXCHANGES_ALL_DISABLE,
     CALLBACK_POSITION,
-    CALLBACK_POSITION_SIZE_1000,
-    CALLBACK_POSITION_SIZE_5000,
-    CALLBACK_POSITION_SIZE_10000,
     CALLBACK_MIN_SPREAD,
-    CALLBACK_SPREAD_005,
-    CALLBACK_SPREAD_01,
-    CALLBACK_SPREAD_025,
-    CALLBACK_SPREAD_05,
     CALLBACK_MIN_PROFIT,
-    CALLBACK_PROFIT_5,
-    CALLBACK_PROFIT_10,
-    CALLBACK_PROFIT_20,
-    CALLBACK_PROFIT_50,
-    CALLBACK_PROFIT_100,
+    CALLBACK_MIN_ZSCORE,
     CALLBACK_INTERVAL,
-    CALLBACK_INTERVAL_10,
-    CALLBACK_INTERVAL_30,
-    CALLBACK_INTERVAL_60,
-    CALLBACK_INTERVAL_300,
-    CALLBACK_INTERVAL_CONSTANT,
-    CALLBACK_MANUAL_INPUT,
+    CALLBACK_NOTIFY_CLOSE,
+    CALLBACK_LIVE_DASHBOARD,
 )
 
+log = logging.getLogger(__name__)
+
+# Обработчик получает значение из callback_data ("" если его нет)
+CallbackHandler = Callable[[CallbackQuery, str], Awaitable[None]]
+
+# Ручной ввод: настройка -> подсказка (pending_action совпадает с именем настройки)
+MANUAL_INPUT_TEXTS = {
+    "position": (
+        "💰 Объём позиции (ручной ввод)\n\n"
+        "Введи объём позиции в долларах.\n"
+        "Пример: 1000 или 1,000 или 1000$"
+    ),
+    "spread": (
+        "📈 Минимальный спред (ручной ввод)\n\n"
+        "Введи минимальный спред в процентах.\n"
+        "Пример: 2.5 или 0.01"
+    ),
+    "profit": (
+        "💵 Минимальный профит (ручной ввод)\n\n"
+        "Введи минимальный профит в долларах.\n"
+        "Пример: 20"
+    ),
+    "interval": (
+        "⏱ Интервал проверки (ручной ввод)\n\n"
+        "Введи интервал проверки в секундах.\n"
+        "Пример: 60\n\n"
+        "Для режима 'Постоянно' введи 0"
+    ),
+    "zscore": (
+        "📐 Аномальность спреда (ручной ввод)\n\n"
+        "Введи минимальный z-score чистого спреда.\n"
+        "Пример: 2 или 2.5\n\n"
+        "Чтобы выключить проверку, введи 0"
+    ),
+}
+
+
+def parse_callback_data(data: str) -> tuple[str, str, str]:
+    """"префикс:поле:значение" -> (префикс, поле, значение); старый формат сначала переводится в новый"""
+    legacy = LEGACY_CALLBACKS.get(data)
+    if legacy is not None:
+        data = legacy
+    elif data.startswith(LEGACY_EXCHANGES_TOGGLE):
+        data = exchange_toggle_callback(data[len(LEGACY_EXCHANGES_TOGGLE):])
+    prefix, _, rest = data.partition(CALLBACK_SEPARATOR)
+    field, _, value = rest.partition(CALLBACK_SEPARATOR)
+    return prefix, field, value
+
 
 def register_callback_handlers(dp: Dispatcher):
-    """Регистрирует обработчики callback-кнопок"""
-    
+    """Регистрирует обработчики callback-кнопок: одна точка входа и таблица (префикс, поле) -> обработчик"""
+    routes: dict[tuple[str, str], CallbackHandler] = {}
+
+    def route(data: str):
+        """Регистрирует обработчик для префикса и поля из callback_data (значение не учитывается)"""
+        key = parse_callback_data(data)[:2]
+
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            routes[key] = handler
+            return handler
+
+        return decorator
+
     async def safe_edit(callback: CallbackQuery, text: str, reply_markup=None):
         """Безопасное редактирование сообщения - игнорирует ошибку 'message is not modified'"""
         try:
             await callback.message.edit_text(text, reply_markup=reply_markup)
         except Exception as e:
             if "message is not modified" not in str(e).lower():
-                print(f"Ошибка редактирования сообщения: {e}")
-    
-    @dp.callback_query(F.data == CALLBACK_MAIN_MENU)
-    async def handle_main_menu(callback: CallbackQuery):
+                log.warning("Ошибка редактирования сообщения: %s", e)
+
+    @dp.callback_query()
+    async def handle_callback(callback: CallbackQuery):
+        """Единая точка входа: разбор callback_data и поиск обработчика в словаре"""
+        prefix, field, value = parse_callback_data(callback.data or "")
+        handler = routes.get((prefix, field))
+        if handler is None:
+            log.debug("Неизвестная кнопка от %s: %r", callback.from_user.id, callback.data)
+            await callback.answer()
+            return
+        await handler(callback, value)
+
+    @route(CALLBACK_MAIN_MENU)
+    async def handle_main_menu(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = "Главное меню\n\nВыбери раздел:"
         await safe_edit(callback, text, get_settings_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_SETTINGS)
-    async def handle_settings(callback: CallbackQuery):
+
+    @route(CALLBACK_SETTINGS)
+    async def handle_settings(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = "⚙️ Настройки\n\nВыбери параметр для изменения:"
         await safe_edit(callback, text, get_settings_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_COINS)
-    async def handle_coins(callback: CallbackQuery):
+
+    # ---------- Монеты ----------
+
+    @route(CALLBACK_COINS)
+    async def handle_coins(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         mode_text = "Все монеты" if s.track_all_coins else f"Только выбранные ({len(s.coins)} монет)"
         text = (
@@ -95,18 +164,19 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_coins_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_COINS_ALL)
-    async def handle_coins_all(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.track_all_coins = True
-        await callback.answer("Режим: Все монеты")
-        await handle_coins(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_COINS_SELECTED)
-    async def handle_coins_selected(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
+
+    @route(CALLBACK_COINS_ALL)
+    async def handle_coins_mode(callback: CallbackQuery, value: str = ""):
+        s = get_user_settings(callback.from_user.id)
+        if value == "all":
+            s.track_all_coins = True
+            mark_dirty(callback.from_user.id)
+            await callback.answer("Режим: Все монеты")
+            await handle_coins(callback)
+            return
+
         s.track_all_coins = False
+        mark_dirty(callback.from_user.id)
         text = (
             "✅ Только выбранные монеты\n\n"
             f"Текущие монеты: {', '.join(s.coins) if s.coins else 'пока не заданы'}\n\n"
@@ -115,9 +185,9 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_coins_selected_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_COINS_ADD)
-    async def handle_coins_add(callback: CallbackQuery):
+
+    @route(CALLBACK_COINS_ADD)
+    async def handle_coins_add(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         s.pending_action = "add_coin"
         text = (
@@ -133,9 +203,9 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, keyboard)
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_COINS_REMOVE)
-    async def handle_coins_remove(callback: CallbackQuery):
+
+    @route(CALLBACK_COINS_REMOVE)
+    async def handle_coins_remove(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         if not s.coins:
             text = "Список монет пуст. Нечего удалять."
@@ -164,17 +234,17 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, keyboard)
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_COINS_LIST)
-    async def handle_coins_list(callback: CallbackQuery):
+
+    @route(CALLBACK_COINS_LIST)
+    async def handle_coins_list(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         if s.track_all_coins:
-            text = f"🌐 Отслеживаются все монеты ({len(ALL_COINS)} монет)"
+            text = f"🌐 Отслеживаются все монеты ({len(coin_universe.coins)} монет)"
         elif not s.coins:
             text = "Список монет пуст. Добавь монеты через меню."
         else:
             text = f"📋 Отслеживаемые монеты ({len(s.coins)}):\n" + "\n".join(f"- {coin}" for coin in s.coins)
-        
+
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
                 [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_COINS)],
@@ -183,9 +253,11 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, keyboard)
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES)
-    async def handle_exchanges(callback: CallbackQuery):
+
+    # ---------- Биржи ----------
+
+    @route(CALLBACK_EXCHANGES)
+    async def handle_exchanges(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         exchanges_text = "Все биржи" if s.track_all_exchanges else f"Выбрано: {len(s.selected_exchanges)}"
         text = (
@@ -196,34 +268,33 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_exchanges_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES_SELECT)
-    async def handle_exchanges_select(callback: CallbackQuery):
+
+    @route(CALLBACK_EXCHANGES_SELECT)
+    async def handle_exchanges_select(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = (
             "✅ Отслеживать биржи\n\n"
             "Выбери биржи для отслеживания (зелёная галочка = выбрано):"
         )
-        await safe_edit(callback, text, get_exchanges_select_keyboard(s.selected_exchanges))
+        await safe_edit(callback, text, get_exchanges_select_keyboard(s.exchange_mask))
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data.startswith(CALLBACK_EXCHANGES_TOGGLE))
-    async def handle_exchange_toggle(callback: CallbackQuery):
+
+    @route(exchange_toggle_callback(""))
+    async def handle_exchange_toggle(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
-        exchange_name = callback.data.replace(CALLBACK_EXCHANGES_TOGGLE, "")
-        
-        if exchange_name in s.selected_exchanges:
-            s.selected_exchanges.remove(exchange_name)
-            await callback.answer(f"{exchange_name} убрана из списка")
-        else:
-            s.selected_exchanges.append(exchange_name)
+        exchange_name = value
+
+        if s.toggle_exchange(exchange_name):
             await callback.answer(f"{exchange_name} добавлена в список")
-        
+        else:
+            await callback.answer(f"{exchange_name} убрана из списка")
+        mark_dirty(callback.from_user.id)
+
         await handle_exchanges_select(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES_ALL)
-    async def handle_exchanges_all(callback: CallbackQuery):
+
+    @route(CALLBACK_EXCHANGES_ALL)
+    async def handle_exchanges_all(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = (
             "🌐 Все биржи\n\n"
@@ -233,39 +304,36 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_exchanges_all_keyboard(s.track_all_exchanges))
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES_ALL_ENABLE)
-    async def handle_exchanges_all_enable(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.track_all_exchanges = True
-        await callback.answer("✅ Все биржи включены")
-        await handle_exchanges_all(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES_ALL_DISABLE)
-    async def handle_exchanges_all_disable(callback: CallbackQuery):
+
+    @route(CALLBACK_EXCHANGES_ALL_ENABLE)
+    async def handle_exchanges_all_switch(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
-        s.track_all_exchanges = False
-        await callback.answer("⚪ Все биржи выключены")
+        s.track_all_exchanges = value == "on"
+        mark_dirty(callback.from_user.id)
+        await callback.answer("✅ Все биржи включены" if s.track_all_exchanges else "⚪ Все биржи выключены")
         await handle_exchanges_all(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES_CEX)
-    async def handle_exchanges_cex(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.selected_exchanges = [name for name in CEX_EXCHANGES.keys()]
-        s.track_all_exchanges = False
-        await callback.answer("✅ Выбраны только CEX биржи")
-        await handle_exchanges_select(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_EXCHANGES_DEX)
-    async def handle_exchanges_dex(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.selected_exchanges = [name for name in DEX_EXCHANGES.keys()]
+
+    @route(CALLBACK_EXCHANGES_CEX)
+    async def handle_exchanges_preset(callback: CallbackQuery, value: str = ""):
+        s = get_user_settings(callback.from_user.id)
+        if value == "cex":
+            s.exchange_mask = CEX_MASK
+            answer = "✅ Выбраны только CEX биржи"
+        elif value == "dex":
+            s.exchange_mask = DEX_MASK
+            answer = "✅ Выбраны только DEX биржи"
+        else:
+            await callback.answer()
+            return
         s.track_all_exchanges = False
-        await callback.answer("✅ Выбраны только DEX биржи")
+        mark_dirty(callback.from_user.id)
+        await callback.answer(answer)
         await handle_exchanges_select(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_POSITION)
-    async def handle_position(callback: CallbackQuery):
+
+    # ---------- Числовые настройки ----------
+
+    @route(CALLBACK_POSITION)
+    async def handle_position(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = (
             "💰 Объём позиции\n\n"
@@ -275,30 +343,9 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_position_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_POSITION_SIZE_1000)
-    async def handle_position_size_1000(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.position_size_usd = 1000.0
-        await callback.answer(f"Объём установлен: 1000$")
-        await handle_position(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_POSITION_SIZE_5000)
-    async def handle_position_size_5000(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.position_size_usd = 5000.0
-        await callback.answer(f"Объём установлен: 5000$")
-        await handle_position(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_POSITION_SIZE_10000)
-    async def handle_position_size_10000(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.position_size_usd = 10000.0
-        await callback.answer(f"Объём установлен: 10000$")
-        await handle_position(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_MIN_SPREAD)
-    async def handle_min_spread(callback: CallbackQuery):
+
+    @route(CALLBACK_MIN_SPREAD)
+    async def handle_min_spread(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = (
             "📈 Минимальный спред\n\n"
@@ -308,37 +355,9 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_spread_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_SPREAD_005)
-    async def handle_spread_005(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_spread = 0.05
-        await callback.answer(f"Спред установлен: 0.05%")
-        await handle_min_spread(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_SPREAD_01)
-    async def handle_spread_01(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_spread = 0.1
-        await callback.answer(f"Спред установлен: 0.1%")
-        await handle_min_spread(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_SPREAD_025)
-    async def handle_spread_025(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_spread = 0.25
-        await callback.answer(f"Спред установлен: 0.25%")
-        await handle_min_spread(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_SPREAD_05)
-    async def handle_spread_05(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_spread = 0.5
-        await callback.answer(f"Спред установлен: 0.5%")
-        await handle_min_spread(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_MIN_PROFIT)
-    async def handle_min_profit(callback: CallbackQuery):
+
+    @route(CALLBACK_MIN_PROFIT)
+    async def handle_min_profit(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         text = (
             "💵 Минимальный профит\n\n"
@@ -348,44 +367,24 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_profit_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_PROFIT_5)
-    async def handle_profit_5(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_profit_usd = 5.0
-        await callback.answer(f"Профит установлен: 5$")
-        await handle_min_profit(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_PROFIT_10)
-    async def handle_profit_10(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_profit_usd = 10.0
-        await callback.answer(f"Профит установлен: 10$")
-        await handle_min_profit(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_PROFIT_20)
-    async def handle_profit_20(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_profit_usd = 20.0
-        await callback.answer(f"Профит установлен: 20$")
-        await handle_min_profit(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_PROFIT_50)
-    async def handle_profit_50(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.min_profit_usd = 50.0
-        await callback.answer(f"Профит установлен: 50$")
-        await handle_min_profit(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_PROFIT_100)
-    async def handle_profit_100(callback: CallbackQuery):
+
+    @route(CALLBACK_MIN_ZSCORE)
+    async def handle_min_zscore(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
-        s.min_profit_usd = 100.0
-        await callback.answer(f"Профит установлен: 100$")
-        await handle_min_profit(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_INTERVAL)
-    async def handle_interval(callback: CallbackQuery):
+        zscore_text = "Выключено" if s.min_zscore <= 0 else f"z ≥ {s.min_zscore}"
+        text = (
+            "📐 Аномальность спреда\n\n"
+            "Уведомлять только если чистый спред необычно высок для этой пары бирж "
+            "(z-score относительно её недавней истории).\n\n"
+            f"Текущее значение: {zscore_text}\n\n"
+            "Введи порог вручную (0 - выключить):"
+        )
+        await safe_edit(callback, text, get_zscore_keyboard())
+        s.menu_message_id = callback.message.message_id
+        await callback.answer()
+
+    @route(CALLBACK_INTERVAL)
+    async def handle_interval(callback: CallbackQuery, value: str = ""):
         s = get_user_settings(callback.from_user.id)
         interval_text = "Постоянно" if s.interval_seconds == 0 else f"{s.interval_seconds} сек."
         text = (
@@ -396,108 +395,94 @@ def register_callback_handlers(dp: Dispatcher):
         await safe_edit(callback, text, get_interval_keyboard())
         s.menu_message_id = callback.message.message_id
         await callback.answer()
-    
-    @dp.callback_query(F.data == CALLBACK_INTERVAL_10)
-    async def handle_interval_10(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.interval_seconds = 10
-        await callback.answer(f"Интервал установлен: 10 сек")
-        await handle_interval(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_INTERVAL_30)
-    async def handle_interval_30(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.interval_seconds = 30
-        await callback.answer(f"Интервал установлен: 30 сек")
-        await handle_interval(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_INTERVAL_60)
-    async def handle_interval_60(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.interval_seconds = 60
-        await callback.answer(f"Интервал установлен: 60 сек")
-        await handle_interval(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_INTERVAL_300)
-    async def handle_interval_300(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.interval_seconds = 300
-        await callback.answer(f"Интервал установлен: 300 сек")
-        await handle_interval(callback)
-    
-    @dp.callback_query(F.data == CALLBACK_INTERVAL_CONSTANT)
-    async def handle_interval_constant(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        s.interval_seconds = 0
-        await callback.answer("⚡ Режим 'Постоянно' активирован!")
-        await handle_interval(callback)
-    
-    @dp.callback_query(F.data.startswith(f"{CALLBACK_MANUAL_INPUT}_"))
-    async def handle_manual_input(callback: CallbackQuery):
-        s = get_user_settings(callback.from_user.id)
-        
-        callback_data = callback.data
-        print(f"DEBUG: callback.data = '{callback_data}'")
-        
-        if callback_data.startswith(f"{CALLBACK_MANUAL_INPUT}_"):
-            action_type = callback_data[len(f"{CALLBACK_MANUAL_INPUT}_"):]
-        else:
-            action_type = callback_data.split("_", 1)[1] if "_" in callback_data else None
-        
-        print(f"DEBUG: action_type = '{action_type}'")
-        
-        # ВАЖНО: Устанавливаем pending_action ПЕРЕД отправкой сообщения
-        if action_type == "position":
-            s.pending_action = "position"
-        elif action_type == "spread":
-            s.pending_action = "spread"
-        elif action_type == "profit":
-            s.pending_action = "profit"
-        elif action_type == "interval":
-            s.pending_action = "interval"
-        else:
-            print(f"DEBUG: ❌ Неизвестный action_type: '{action_type}'")
-            s.pending_action = None
-        
-        print(f"DEBUG handle_manual_input: user_id={callback.from_user.id}, установлен pending_action='{s.pending_action}'")
-        print(f"DEBUG: Проверка - s.pending_action = {s.pending_action}")
-        if callback.from_user.id in user_settings:
-            print(f"DEBUG: Проверка - user_settings[{callback.from_user.id}].pending_action = {user_settings[callback.from_user.id].pending_action}")
-        
-        if action_type == "position":
-            text = (
-                "💰 Объём позиции (ручной ввод)\n\n"
-                "Введи объём позиции в долларах.\n"
-                "Пример: 1000 или 1,000 или 1000$"
-            )
-        elif action_type == "spread":
-            text = (
-                "📈 Минимальный спред (ручной ввод)\n\n"
-                "Введи минимальный спред в процентах.\n"
-                "Пример: 2.5 или 0.01"
-            )
-        elif action_type == "profit":
-            text = (
-                "💵 Минимальный профит (ручной ввод)\n\n"
-                "Введи минимальный профит в долларах.\n"
-                "Пример: 20"
-            )
-        elif action_type == "interval":
-            text = (
-                "⏱ Интервал проверки (ручной ввод)\n\n"
-                "Введи интервал проверки в секундах.\n"
-                "Пример: 60\n\n"
-                "Для режима 'Постоянно' введи 0"
+
+    # Экран, на который возвращает выбор пресета
+    setting_screens = {
+        "position": handle_position,
+        "spread": handle_min_spread,
+        "profit": handle_min_profit,
+        "interval": handle_interval,
+    }
+
+    def make_preset_handler(setting: str) -> CallbackHandler:
+        spec = PRESET_SETTINGS[setting]
+
+        async def handle_preset(callback: CallbackQuery, value: str = ""):
+            # Принимаются только значения из конфига - callback_data приходит от клиента
+            try:
+                number = spec.cast(value)
+            except ValueError:
+                number = None
+            if number not in SETTING_PRESETS[setting]:
+                await callback.answer()
+                return
+            s = get_user_settings(callback.from_user.id)
+            setattr(s, spec.attr, number)
+            mark_dirty(callback.from_user.id)
+            await callback.answer(spec.answer.format(spec.label(number)))
+            await setting_screens[setting](callback)
+
+        return handle_preset
+
+    # Новые пресеты добавляются только в config.SETTING_PRESETS
+    for setting in SETTING_PRESETS:
+        route(preset_callback(setting, ""))(make_preset_handler(setting))
+
+    def make_manual_input_handler(setting: str) -> CallbackHandler:
+        async def handle_manual_input(callback: CallbackQuery, value: str = ""):
+            s = get_user_settings(callback.from_user.id)
+            # ВАЖНО: Устанавливаем pending_action ПЕРЕД отправкой сообщения
+            s.pending_action = setting
+            log.debug("Ручной ввод: user_id=%s, pending_action=%s", callback.from_user.id, setting)
+            keyboard = InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_SETTINGS)],
+                ]
             )
-        else:
-            text = f"Неизвестное действие: {action_type}"
-            s.pending_action = None
-        
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_SETTINGS)],
-            ]
+            await safe_edit(callback, MANUAL_INPUT_TEXTS[setting], keyboard)
+            s.menu_message_id = callback.message.message_id
+            await callback.answer()
+
+        return handle_manual_input
+
+    for setting in MANUAL_INPUT_TEXTS:
+        route(manual_input_callback(setting))(make_manual_input_handler(setting))
+
+    # ---------- Переключатели ----------
+
+    @route(CALLBACK_NOTIFY_CLOSE)
+    async def handle_notify_close(callback: CallbackQuery, value: str = ""):
+        s = get_user_settings(callback.from_user.id)
+        s.notify_on_close = not s.notify_on_close
+        mark_dirty(callback.from_user.id)
+        await callback.answer(
+            "🔔 Уведомления о закрытии включены" if s.notify_on_close else "🔕 Уведомления о закрытии выключены"
         )
+        await handle_settings(callback)
+
+    @route(CALLBACK_LIVE_DASHBOARD)
+    async def handle_live_dashboard(callback: CallbackQuery, value: str = ""):
+        s = get_user_settings(callback.from_user.id)
+        s.live_dashboard = not s.live_dashboard
+        mark_dirty(callback.from_user.id)
+        if s.live_dashboard:
+            live_dashboard.activate(callback.from_user.id)
+            await callback.answer("📌 Live-сообщение включено: одно закреплённое сообщение вместо потока уведомлений")
+        else:
+            await live_dashboard.disable(callback.bot, callback.from_user.id)
+            await callback.answer("📌 Live-сообщение выключено: уведомления снова приходят отдельными сообщениями")
+        await handle_settings(callback)
+
+    # ---------- /top ----------
+
+    @route(top_page_callback(0, 0))
+    async def handle_top_page(callback: CallbackQuery, value: str = ""):
+        page, _, limit = value.partition(CALLBACK_SEPARATOR)
+        try:
+            page, limit = int(page), max(1, min(int(limit), TOP_MAX_N))
+        except ValueError:
+            await callback.answer()
+            return
+        text, keyboard = build_top_message(get_user_settings(callback.from_user.id), limit, page)
         await safe_edit(callback, text, keyboard)
-        s.menu_message_id = callback.message.message_id
         await callback.answer()
@@ -1,9 +1,145 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
 from aiogram import Dispatcher
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.types import BufferedInputFile, InlineKeyboardMarkup, Message
+
+from config import (
+    PERF_PROFILE_DEFAULT_SECONDS,
+    PERF_PROFILE_MAX_SECONDS,
+    SCAN_MAX_COINS,
+    SCAN_PAIRS_SHOWN,
+    TOP_DEFAULT_N,
+    TOP_MAX_N,
+    TOP_PAGE_SIZE,
+)
+from models import UserSettings, get_user_settings, mark_dirty
+from keyboards import get_main_menu_reply_keyboard, get_top_keyboard
+from services.coin_universe import coin_universe
+from services.leaderboard import leaderboard
+from services.profiler import cycle_profiler, StackSampler, STAGES, STAGE_TITLES
+from services.profit_calculator import rank_pairs
+from services.quick_scan import quick_scanner
+from services.quote_index import quote_index
+from services.spread_history import spread_history
+from utils.coin_normalizer import normalize_coin_input
+from utils.registry import exchanges_from_mask
+
+log = logging.getLogger(__name__)
+
+_sampler = StackSampler()
+# Фоновые задачи /perf profile (ссылки, чтобы задачу не собрал сборщик мусора)
+_profile_tasks: set[asyncio.Task] = set()
+
+
+async def _send_profile(message: Message, seconds: int):
+    """Сэмплирует seconds секунд (профайлер уже запущен) и отправляет отчёт файлом"""
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        _sampler.stop()
+    document = BufferedInputFile(
+        _sampler.summary().encode("utf-8"),
+        filename=f"profile-{time.strftime('%Y%m%d-%H%M%S')}.txt",
+    )
+    try:
+        await message.answer_document(document, caption=f"Профиль за {seconds} с: {_sampler.samples} сэмплов")
+    except Exception:
+        log.exception("Не удалось отправить отчёт профайлера")
+
 
-from models import get_user_settings
-from keyboards import get_main_menu_reply_keyboard
+def is_admin(user_id: int) -> bool:
+    """Администраторы задаются в ADMIN_IDS (id через запятую)"""
+    admin_ids = os.getenv("ADMIN_IDS", "")
+    return str(user_id) in {part.strip() for part in admin_ids.split(",") if part.strip()}
+
+
+def format_perf_report(report: dict) -> str:
+    """Текст отчёта /perf: стадии, биржи и самые медленные запросы (миллисекунды)"""
+    cycle = report["cycle"]
+    lines = [
+        f"⏱ Профиль последних {report['cycles']} циклов проверки\n",
+        f"Цикл целиком: p50 {cycle['p50'] * 1000:.0f} мс | p99 {cycle['p99'] * 1000:.0f} мс\n",
+        "Стадии (за цикл):",
+    ]
+    for stage in STAGES:
+        data = report["stages"][stage]
+        share = data["sum"] / cycle["sum"] * 100 if cycle["sum"] else 0.0
+        lines.append(
+            f"• {STAGE_TITLES[stage]}: p50 {data['p50'] * 1000:.1f} мс | p99 {data['p99'] * 1000:.1f} мс | {share:.0f}%"
+        )
+    if report["exchanges"]:
+        lines.append("\nЗапросы по биржам (за цикл):")
+        for name, data in report["exchanges"].items():
+            lines.append(f"• {name}: p50 {data['p50'] * 1000:.0f} мс | p99 {data['p99'] * 1000:.0f} мс")
+    if report["slowest"]:
+        lines.append("\nСамые медленные запросы:")
+        for call in report["slowest"]:
+            ago = time.time() - call["at"]
+            lines.append(f"• {call['exchange']} {call['coin']}: {call['seconds'] * 1000:.0f} мс ({ago:.0f} с назад)")
+    lines.append(
+        "\nДоставка идёт параллельно проверке, её доля может превышать 100%. "
+        "Остаток цикла - паузы между запросами."
+    )
+    return "\n".join(lines)
+
+
+def format_scan_result(
+    coin: str,
+    prices_data: dict,
+    oldest: Optional[float],
+    position_size_usd: float,
+    leverage: float,
+    now: Optional[float] = None,
+) -> str:
+    """Текст /scan по одной монете: лучшие пары, спред и профит на объём пользователя"""
+    if len(prices_data) < 2:
+        return f"🔎 {coin}: котировки есть только на {len(prices_data)} из выбранных бирж - сравнивать не с чем"
+    age = max(0.0, (now or time.time()) - oldest) if oldest is not None else 0.0
+    lines = [f"🔎 {coin}: {len(prices_data)} бирж, котировкам {age:.0f} с, объём {position_size_usd}$ × {leverage}"]
+    pairs = rank_pairs(prices_data, position_size_usd, leverage, SCAN_PAIRS_SHOWN)
+    if not pairs:
+        lines.append("Цены на биржах совпадают - спреда нет")
+    for pair in pairs:
+        profit_data = pair["profit_data"]
+        lines.append(
+            f"📈 {pair['long']} {pair['long_price']:.6g} → 📉 {pair['short']} {pair['short_price']:.6g} | "
+            f"спред {pair['spread_percent']:.2f}%\n"
+            f"  💵 маркет {profit_data['market_profit']:.2f}$ | лимит {profit_data['limit_profit']:.2f}$"
+        )
+    return "\n".join(lines)
+
+
+def build_top_message(s: UserSettings, limit: int, page: int, now: Optional[float] = None) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Страница /top: лучшие пары на биржах пользователя и клавиатура листания"""
+    now = now or time.time()
+    entries = leaderboard.top(s.effective_exchange_mask(), limit, now)
+    if not entries:
+        text = (
+            "🏆 Пока нет свежих спредов по твоим биржам.\n\n"
+            "Таблица заполняется фоновой проверкой по монетам пользователей с активным сканом. "
+            "В шардированном режиме проверка идёт в процессах scanner.py."
+        )
+        return text, None
+    pages = (len(entries) + TOP_PAGE_SIZE - 1) // TOP_PAGE_SIZE
+    page = max(0, min(page, pages - 1))
+    nominal_size = s.position_size_usd * s.leverage
+    lines = [
+        f"🏆 Лучшие спреды после комиссий: {len(entries)} из топ-{limit} (стр. {page + 1}/{pages})",
+        f"Профит на объём {s.position_size_usd}$ × {s.leverage}, маркет-ордера\n",
+    ]
+    start = page * TOP_PAGE_SIZE
+    for number, entry in enumerate(entries[start:start + TOP_PAGE_SIZE], start + 1):
+        lines.append(
+            f"{number}. {entry['coin']}: 📈 {entry['long']} → 📉 {entry['short']}\n"
+            f"   спред {entry['spread_percent']:.2f}% | чистый {entry['net_spread']:.3f}% ≈ "
+            f"{entry['net_spread'] / 100 * nominal_size:.2f}$ | {max(0.0, now - entry['ts']):.0f} с назад"
+        )
+    return "\n".join(lines), get_top_keyboard(page, pages, limit)
 
 
 def register_commands(dp: Dispatcher):
@@ -28,7 +164,10 @@ def register_commands(dp: Dispatcher):
             "/start - главное меню\n"
             "/help - эта помощь\n"
             "/pause - поставить уведомления на паузу\n"
-            "/resume - возобновить уведомления\n\n"
+            "/resume - возобновить уведомления\n"
+            "/stats COIN - статистика спредов по монете\n"
+            "/scan COIN [COIN ...] - лучшие пары и профит прямо сейчас\n"
+            f"/top [N] - лучшие спреды по всем монетам (до {TOP_MAX_N})\n\n"
             "Используй кнопки меню для навигации и настройки бота."
         )
         await message.answer(text, reply_markup=get_main_menu_reply_keyboard())
@@ -38,6 +177,7 @@ def register_commands(dp: Dispatcher):
     async def cmd_pause(message: Message):
         s = get_user_settings(message.from_user.id)
         s.paused = True
+        mark_dirty(message.from_user.id)
         await message.answer("Уведомления поставлены на паузу.", reply_markup=get_main_menu_reply_keyboard())
     
     
@@ -45,4 +185,124 @@ def register_commands(dp: Dispatcher):
     async def cmd_resume(message: Message):
         s = get_user_settings(message.from_user.id)
         s.paused = False
+        mark_dirty(message.from_user.id)
         await message.answer("Уведомления возобновлены.", reply_markup=get_main_menu_reply_keyboard())
+    
+    
+    @dp.message(Command("stats"))
+    async def cmd_stats(message: Message, command: CommandObject):
+        coins = normalize_coin_input(command.args or "")
+        if not coins:
+            await message.answer("Укажи монету. Пример: /stats BTC", reply_markup=get_main_menu_reply_keyboard())
+            return
+        
+        coin = coins[0]
+        pairs = spread_history.stats(coin)
+        if not pairs:
+            await message.answer(
+                f"По {coin} пока нет истории спредов. Она копится, пока монету отслеживает активный скан.\n"
+                "В шардированном режиме история хранится в процессах scanner.py и здесь недоступна.",
+                reply_markup=get_main_menu_reply_keyboard()
+            )
+            return
+        
+        lines = [f"📊 Статистика чистого спреда {coin} (после комиссий)\n"]
+        for pair in pairs[:5]:
+            zscore_text = f"{pair['zscore']:.2f}" if pair["zscore"] is not None else "—"
+            lines.append(
+                f"📈 {pair['long']} → 📉 {pair['short']}\n"
+                f"  Сейчас: {pair['last']:.3f}% | EWMA: {pair['ewma']:.3f}% | z: {zscore_text}\n"
+                f"  p50: {pair['p50']:.3f}% | p90: {pair['p90']:.3f}% | p99: {pair['p99']:.3f}%\n"
+                f"  Точек: {pair['samples']} за {pair['window_seconds'] / 60:.0f} мин."
+            )
+        await message.answer("\n".join(lines), reply_markup=get_main_menu_reply_keyboard())
+    
+    
+    @dp.message(Command("scan"))
+    async def cmd_scan(message: Message, command: CommandObject):
+        coins = normalize_coin_input(command.args or "")
+        if not coins:
+            await message.answer("Укажи монету. Пример: /scan BTC или /scan BTC ETH SOL", reply_markup=get_main_menu_reply_keyboard())
+            return
+        
+        s = get_user_settings(message.from_user.id)
+        exchange_mask = s.effective_exchange_mask()
+        if exchange_mask.bit_count() < 2:
+            await message.answer("Выбери хотя бы 2 биржи в меню «🏦 Биржи».", reply_markup=get_main_menu_reply_keyboard())
+            return
+        
+        # Незнакомые тикеры не доходят до бирж и индексов (иначе каждый опечатанный тикер оседал бы в реестре)
+        unknown = [coin for coin in coins if not coin_universe.is_listed(coin)]
+        coins = [coin for coin in coins if coin_universe.is_listed(coin)][:SCAN_MAX_COINS]
+        if not coins:
+            await message.answer(
+                f"Монеты не торгуются на подключённых биржах: {', '.join(unknown)}",
+                reply_markup=get_main_menu_reply_keyboard(),
+            )
+            return
+        
+        # Монеты проверяются параллельно; тёплый кэш отвечает без запросов к биржам
+        results = await asyncio.gather(*(
+            quick_scanner.quotes(coin, exchanges_from_mask(exchange_mask & quote_index.mask(coin)))
+            for coin in coins
+        ))
+        now = time.time()
+        blocks = [
+            format_scan_result(coin, prices_data, oldest, s.position_size_usd, s.leverage, now)
+            for coin, (prices_data, oldest) in zip(coins, results)
+        ]
+        if unknown:
+            blocks.append(f"Не торгуются на подключённых биржах: {', '.join(unknown)}")
+        await message.answer("\n\n".join(blocks), reply_markup=get_main_menu_reply_keyboard())
+    
+    
+    @dp.message(Command("top"))
+    async def cmd_top(message: Message, command: CommandObject):
+        try:
+            limit = int((command.args or "").split()[0]) if command.args else TOP_DEFAULT_N
+        except ValueError:
+            limit = TOP_DEFAULT_N
+        limit = max(1, min(limit, TOP_MAX_N))
+        text, keyboard = build_top_message(get_user_settings(message.from_user.id), limit, 0)
+        await message.answer(text, reply_markup=keyboard or get_main_menu_reply_keyboard())
+    
+    
+    @dp.message(Command("perf"))
+    async def cmd_perf(message: Message, command: CommandObject):
+        if not is_admin(message.from_user.id):
+            await message.answer("Команда доступна только администраторам.")
+            return
+        
+        args = (command.args or "").split()
+        if not args:
+            if not len(cycle_profiler):
+                await message.answer(
+                    "Пока нет завершённых циклов проверки. "
+                    "В шардированном режиме циклы идут в процессах scanner.py."
+                )
+                return
+            await message.answer(format_perf_report(cycle_profiler.report()))
+            return
+        
+        if args[0] != "profile":
+            await message.answer(
+                f"Использование: /perf - профиль циклов, "
+                f"/perf profile [секунд, до {PERF_PROFILE_MAX_SECONDS}] - сэмплирующий профайлер"
+            )
+            return
+        
+        try:
+            seconds = int(args[1]) if len(args) > 1 else PERF_PROFILE_DEFAULT_SECONDS
+        except ValueError:
+            seconds = PERF_PROFILE_DEFAULT_SECONDS
+        seconds = max(1, min(seconds, PERF_PROFILE_MAX_SECONDS))
+        if _sampler.running:
+            await message.answer("Профайлер уже запущен, дождись его отчёта.")
+            return
+        
+        _sampler.start()
+        # Обработчик отвечает сразу: сэмплирование и отчёт идут в фоновой задаче
+        task = asyncio.create_task(_send_profile(message, seconds))
+        _profile_tasks.add(task)
+        task.add_done_callback(_profile_tasks.discard)
+        await message.answer(f"Профайлер запущен на {seconds} с, отчёт придёт отдельным сообщением.")
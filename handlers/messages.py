@@ -1,7 +1,9 @@
+import logging
+
 from aiogram import Dispatcher, F
 from aiogram.types import Message
 
-from models import get_user_settings, user_settings
+from models import get_user_settings, user_settings, mark_dirty
 from keyboards import (
     get_main_menu_reply_keyboard,
     get_settings_keyboard,
@@ -11,12 +13,15 @@ from keyboards import (
 from handlers.settings_handlers import (
     apply_min_spread,
     apply_min_profit,
+    apply_min_zscore,
     apply_position,
     apply_interval,
     handle_add_coin_input,
     handle_remove_coin_input,
 )
 
+log = logging.getLogger(__name__)
+
 
 def register_message_handlers(dp: Dispatcher):
     """Регистрирует обработчики текстовых сообщений"""
@@ -28,55 +33,47 @@ def register_message_handlers(dp: Dispatcher):
         s = get_user_settings(user_id)
         user_text = message.text or ""
         
-        print(f"DEBUG handle_all_messages: user_id={user_id}, text='{user_text}'")
-        print(f"DEBUG: s.pending_action = {s.pending_action}")
+        log.debug("Сообщение от %s: %r, pending_action=%s", user_id, user_text, s.pending_action)
         
         # ВАЖНО: Проверяем pending_action ПЕРВЫМ, до проверки кнопок
         if s.pending_action:
             action = s.pending_action
-            print(f"DEBUG: ✅ Найден pending_action = '{action}' для текста '{user_text}'")
             
             try:
                 if action == "add_coin":
-                    print(f"DEBUG: Обрабатываем add_coin")
                     await handle_add_coin_input(message, s, user_text)
                     return
                 elif action == "remove_coin":
-                    print(f"DEBUG: Обрабатываем remove_coin")
                     await handle_remove_coin_input(message, s, user_text)
                     return
                 elif action == "spread":
-                    print(f"DEBUG: Обрабатываем spread")
                     await apply_min_spread(message, s, user_text)
                     return
                 elif action == "profit":
-                    print(f"DEBUG: Обрабатываем profit")
                     await apply_min_profit(message, s, user_text)
                     return
+                elif action == "zscore":
+                    await apply_min_zscore(message, s, user_text)
+                    return
                 elif action == "position":
-                    print(f"DEBUG: Обрабатываем position с текстом '{user_text}'")
                     await apply_position(message, s, user_text)
                     return
                 elif action == "interval":
-                    print(f"DEBUG: Обрабатываем interval")
                     await apply_interval(message, s, user_text)
                     return
                 else:
-                    print(f"DEBUG: ❌ Неизвестное действие: {action}")
+                    log.warning("Неизвестное действие %r у пользователя %s", action, user_id)
                     await message.answer("Неизвестное действие. Попробуй ещё раз через меню.")
                     s.pending_action = None
                     return
             except Exception as e:
-                print(f"DEBUG: ❌ ИСКЛЮЧЕНИЕ при обработке действия {action}: {e}")
-                import traceback
-                traceback.print_exc()
+                log.exception("Ошибка при обработке действия %s у пользователя %s", action, user_id)
                 await message.answer(
                     f"Произошла ошибка при обработке: {e}\nПопробуй ещё раз или используй кнопки меню.",
                     reply_markup=get_main_menu_reply_keyboard()
                 )
                 return
         
-        print(f"DEBUG: ⚠️ НЕТ pending_action, проверяем кнопки для текста '{user_text}'")
         text = user_text
         
         if text == "⚙️ Настройки":
@@ -116,8 +113,11 @@ def register_message_handlers(dp: Dispatcher):
                 f"- Биржи: {exchanges_mode}\n"
                 f"- Минимальный спред: {s.min_spread}%\n"
                 f"- Минимальный профит: {s.min_profit_usd}$\n"
+                f"- Аномальность спреда: {'Выкл' if s.min_zscore <= 0 else f'z ≥ {s.min_zscore}'}\n"
                 f"- Объём позиции: {s.position_size_usd}$\n"
                 f"- Интервал проверки: {interval_text}\n"
+                f"- Уведомления о закрытии: {'Да' if s.notify_on_close else 'Нет'}\n"
+                f"- Live-сообщение: {'Да' if s.live_dashboard else 'Нет'}\n"
                 f"- Скан активен: {'Да' if s.scan_active else 'Нет'}\n"
                 f"- Пауза уведомлений: {'Да' if s.paused else 'Нет'}",
                 reply_markup=get_main_menu_reply_keyboard()
@@ -127,16 +127,18 @@ def register_message_handlers(dp: Dispatcher):
         if text == "▶️ Активировать скан":
             s = get_user_settings(message.from_user.id)
             s.scan_active = True
+            mark_dirty(message.from_user.id)
             await message.answer("✅ Скан активирован! Бот начал отслеживание.", reply_markup=get_main_menu_reply_keyboard())
             return
         
         if text == "⏹ Остановить скан":
             s = get_user_settings(message.from_user.id)
             s.scan_active = False
+            mark_dirty(message.from_user.id)
             await message.answer("⏹ Скан остановлен. Уведомления не будут отправляться.", reply_markup=get_main_menu_reply_keyboard())
             return
         
-        print(f"DEBUG: ❌ Не распознано сообщение '{text}'")
+        log.debug("Не распознано сообщение %r", text)
         await message.answer(
             f"Я тебя не понял. Используй кнопки меню для навигации.",
             reply_markup=get_main_menu_reply_keyboard()
@@ -0,0 +1,31 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+import models
+from services.storage import SettingsStore
+
+
+class ResidencyMiddleware(BaseMiddleware):
+    """
+    Поднимает настройки вытесненного пользователя из БД до вызова обработчика.
+    Загрузка идёт в отдельном потоке, поэтому event loop не ждёт диск,
+    а обработчики по-прежнему синхронно вызывают get_user_settings.
+    """
+
+    def __init__(self, store: SettingsStore):
+        self.store = store
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None and not models.touch_user(user.id):
+            loaded = await asyncio.to_thread(self.store.load_one, user.id)
+            models.admit_user(user.id, loaded)
+        return await handler(event, data)
@@ -1,9 +1,13 @@
+import logging
+
 from aiogram.types import Message
-from models import UserSettings
+from models import UserSettings, mark_dirty
 from keyboards import get_main_menu_reply_keyboard
 from utils.coin_normalizer import normalize_coin_input
 import re
 
+log = logging.getLogger(__name__)
+
 
 async def apply_min_spread(message: Message, s: UserSettings, raw_value: str):
     try:
@@ -19,6 +23,7 @@ async def apply_min_spread(message: Message, s: UserSettings, raw_value: str):
         return
 
     s.min_spread = value
+    mark_dirty(message.from_user.id)
     # Сбрасываем pending_action ПОСЛЕ успешной обработки
     s.pending_action = None
     await message.answer(f"✅ Минимальный спред установлен: {s.min_spread}%.", reply_markup=get_main_menu_reply_keyboard())
@@ -38,10 +43,27 @@ async def apply_min_profit(message: Message, s: UserSettings, raw_value: str):
         return
 
     s.min_profit_usd = value
+    mark_dirty(message.from_user.id)
     s.pending_action = None
     await message.answer(f"✅ Минимальный профит установлен: {s.min_profit_usd}$.", reply_markup=get_main_menu_reply_keyboard())
 
 
+async def apply_min_zscore(message: Message, s: UserSettings, raw_value: str):
+    try:
+        cleaned = re.sub(r'[^\d.,]', '', raw_value)
+        cleaned = cleaned.replace(',', '.')
+        value = float(cleaned)
+    except (ValueError, AttributeError):
+        await message.answer("Не получилось прочитать число. Пример: 2 или 2,5 (0 - выключить)")
+        return
+
+    s.min_zscore = value
+    mark_dirty(message.from_user.id)
+    s.pending_action = None
+    zscore_text = "выключена" if value == 0 else f"z ≥ {value}"
+    await message.answer(f"✅ Проверка аномальности спреда: {zscore_text}.", reply_markup=get_main_menu_reply_keyboard())
+
+
 async def apply_position(message: Message, s: UserSettings, raw_value: str):
     try:
         cleaned = re.sub(r'[^\d.,]', '', raw_value.strip())
@@ -55,9 +77,9 @@ async def apply_position(message: Message, s: UserSettings, raw_value: str):
                 cleaned = cleaned.replace(',', '')
         
         value = float(cleaned)
-        print(f"DEBUG apply_position: raw={raw_value}, cleaned={cleaned}, value={value}")
-    except (ValueError, AttributeError) as e:
-        print(f"DEBUG apply_position ERROR: {e}, raw_value={raw_value}")
+        log.debug("apply_position: raw=%r, cleaned=%r, value=%s", raw_value, cleaned, value)
+    except (ValueError, AttributeError):
+        log.debug("apply_position: не удалось разобрать %r", raw_value)
         await message.answer("Не получилось прочитать число. Пример: 1000 или 1,000 или 1000$")
         return
 
@@ -66,8 +88,9 @@ async def apply_position(message: Message, s: UserSettings, raw_value: str):
         return
 
     s.position_size_usd = value
+    mark_dirty(message.from_user.id)
     s.pending_action = None
-    print(f"DEBUG apply_position SUCCESS: установлен объём {s.position_size_usd}$")
+    log.debug("apply_position: установлен объём %s$", s.position_size_usd)
     await message.answer(
         f"✅ Объём позиции установлен: {s.position_size_usd}$",
         reply_markup=get_main_menu_reply_keyboard()
@@ -87,6 +110,7 @@ async def apply_interval(message: Message, s: UserSettings, raw_value: str):
         return
 
     s.interval_seconds = value
+    mark_dirty(message.from_user.id)
     interval_text = "Постоянно" if value == 0 else f"{value} сек."
     s.pending_action = None
     await message.answer(f"✅ Интервал проверки установлен: {interval_text}", reply_markup=get_main_menu_reply_keyboard())
@@ -103,11 +127,13 @@ async def handle_add_coin_input(message: Message, s: UserSettings, raw_input: st
     already_exists = []
 
     for ticker in normalized_coins:
-        if ticker in s.coins:
-            already_exists.append(ticker)
-        else:
-            s.coins.append(ticker)
+        if s.add_coin(ticker):
             added.append(ticker)
+        else:
+            already_exists.append(ticker)
+
+    if added:
+        mark_dirty(message.from_user.id)
 
     response_parts = []
     if added:
@@ -116,7 +142,7 @@ async def handle_add_coin_input(message: Message, s: UserSettings, raw_input: st
         response_parts.append(f"ℹ️ Уже есть в списке: {', '.join(already_exists)}")
 
     s.pending_action = None
-    await message.answer("\n".join(response_parts) + f"\n\nВсего монет: {len(s.coins)}", reply_markup=get_main_menu_reply_keyboard())
+    await message.answer("\n".join(response_parts) + f"\n\nВсего монет: {len(s.coin_ids)}", reply_markup=get_main_menu_reply_keyboard())
 
 
 async def handle_remove_coin_input(message: Message, s: UserSettings, raw_input: str):
@@ -128,11 +154,11 @@ async def handle_remove_coin_input(message: Message, s: UserSettings, raw_input:
     
     ticker = normalized_coins[0]
 
-    if ticker not in s.coins:
+    if not s.remove_coin(ticker):
         await message.answer(f"❌ Монеты {ticker} нет в списке.")
         s.pending_action = None
         return
 
-    s.coins.remove(ticker)
+    mark_dirty(message.from_user.id)
     s.pending_action = None
-    await message.answer(f"✅ Монета {ticker} удалена. Осталось монет: {len(s.coins)}", reply_markup=get_main_menu_reply_keyboard())
+    await message.answer(f"✅ Монета {ticker} удалена. Осталось монет: {len(s.coin_ids)}", reply_markup=get_main_menu_reply_keyboard())
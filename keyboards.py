@@ -4,244 +4,358 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
 )
-from typing import List
-from config import ALL_EXCHANGES, CEX_EXCHANGES, DEX_EXCHANGES
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+from config import ALL_EXCHANGES, KEYBOARD_CACHE_SIZE, SETTING_PRESETS
+from utils.registry import EXCHANGE_BITS, EXCHANGE_NAMES
 
 # ---------- Callback data ----------
+#
+# Формат: "префикс:поле:значение" (значение может отсутствовать).
+# Разбор и диспетчеризация через словарь - handlers/callbacks.py.
 
-CALLBACK_MAIN_MENU = "main_menu"
-CALLBACK_SETTINGS = "settings"
-CALLBACK_COINS = "coins"
-CALLBACK_EXCHANGES = "exchanges"
-CALLBACK_POSITION = "position"
-CALLBACK_MIN_SPREAD = "min_spread"
-CALLBACK_MIN_PROFIT = "min_profit"
-CALLBACK_INTERVAL = "interval"
-CALLBACK_COINS_ADD = "coins_add"
-CALLBACK_COINS_REMOVE = "coins_remove"
-CALLBACK_COINS_LIST = "coins_list"
-CALLBACK_COINS_ALL = "coins_all"
-CALLBACK_COINS_SELECTED = "coins_selected"
-CALLBACK_EXCHANGES_CEX = "exchanges_cex"
-CALLBACK_EXCHANGES_DEX = "exchanges_dex"
-CALLBACK_EXCHANGES_SELECT = "exchanges_select"
-CALLBACK_EXCHANGES_ALL = "exchanges_all"
-CALLBACK_EXCHANGES_TOGGLE = "exchanges_toggle_"
-CALLBACK_EXCHANGES_ALL_ENABLE = "exchanges_all_enable"
-CALLBACK_EXCHANGES_ALL_DISABLE = "exchanges_all_disable"
-CALLBACK_MANUAL_INPUT = "manual_input"
-CALLBACK_SCAN_START = "scan_start"
-CALLBACK_SCAN_STOP = "scan_stop"
-
-CALLBACK_POSITION_SIZE_1000 = "pos_size_1000"
-CALLBACK_POSITION_SIZE_5000 = "pos_size_5000"
-CALLBACK_POSITION_SIZE_10000 = "pos_size_10000"
-
-CALLBACK_SPREAD_005 = "spread_0.05"
-CALLBACK_SPREAD_01 = "spread_0.1"
-CALLBACK_SPREAD_025 = "spread_0.25"
-CALLBACK_SPREAD_05 = "spread_0.5"
-
-CALLBACK_PROFIT_5 = "profit_5"
-CALLBACK_PROFIT_10 = "profit_10"
-CALLBACK_PROFIT_20 = "profit_20"
-CALLBACK_PROFIT_50 = "profit_50"
-CALLBACK_PROFIT_100 = "profit_100"
-
-CALLBACK_INTERVAL_10 = "interval_10"
-CALLBACK_INTERVAL_30 = "interval_30"
-CALLBACK_INTERVAL_60 = "interval_60"
-CALLBACK_INTERVAL_300 = "interval_300"
-CALLBACK_INTERVAL_CONSTANT = "interval_constant"
+CALLBACK_SEPARATOR = ":"
+
+PREFIX_MENU = "menu"  # menu:<экран> - показать экран
+PREFIX_SET = "set"  # set:<настройка>:<значение> - пресет из SETTING_PRESETS
+PREFIX_INPUT = "input"  # input:<настройка> - ручной ввод
+PREFIX_TOGGLE = "toggle"  # toggle:<флаг>
+PREFIX_COINS = "coins"  # coins:<действие>[:<значение>]
+PREFIX_EXCHANGES = "ex"  # ex:<действие>[:<значение>]
+PREFIX_TOP = "top"  # top:page:<страница>:<N> - страница /top
+
+
+def callback_data(prefix: str, field: str, value=None) -> str:
+    if value is None:
+        return f"{prefix}{CALLBACK_SEPARATOR}{field}"
+    return f"{prefix}{CALLBACK_SEPARATOR}{field}{CALLBACK_SEPARATOR}{value}"
+
+
+CALLBACK_MAIN_MENU = callback_data(PREFIX_MENU, "main")
+CALLBACK_SETTINGS = callback_data(PREFIX_MENU, "settings")
+CALLBACK_COINS = callback_data(PREFIX_MENU, "coins")
+CALLBACK_COINS_LIST = callback_data(PREFIX_MENU, "coins_list")
+CALLBACK_EXCHANGES = callback_data(PREFIX_MENU, "exchanges")
+CALLBACK_EXCHANGES_SELECT = callback_data(PREFIX_MENU, "exchanges_select")
+CALLBACK_EXCHANGES_ALL = callback_data(PREFIX_MENU, "exchanges_all")
+CALLBACK_POSITION = callback_data(PREFIX_MENU, "position")
+CALLBACK_MIN_SPREAD = callback_data(PREFIX_MENU, "spread")
+CALLBACK_MIN_PROFIT = callback_data(PREFIX_MENU, "profit")
+CALLBACK_MIN_ZSCORE = callback_data(PREFIX_MENU, "zscore")
+CALLBACK_INTERVAL = callback_data(PREFIX_MENU, "interval")
+CALLBACK_NOTIFY_CLOSE = callback_data(PREFIX_TOGGLE, "notify_close")
+CALLBACK_LIVE_DASHBOARD = callback_data(PREFIX_TOGGLE, "live_dashboard")
+CALLBACK_COINS_ADD = callback_data(PREFIX_COINS, "add")
+CALLBACK_COINS_REMOVE = callback_data(PREFIX_COINS, "remove")
+CALLBACK_COINS_ALL = callback_data(PREFIX_COINS, "mode", "all")
+CALLBACK_COINS_SELECTED = callback_data(PREFIX_COINS, "mode", "selected")
+CALLBACK_EXCHANGES_CEX = callback_data(PREFIX_EXCHANGES, "preset", "cex")
+CALLBACK_EXCHANGES_DEX = callback_data(PREFIX_EXCHANGES, "preset", "dex")
+CALLBACK_EXCHANGES_ALL_ENABLE = callback_data(PREFIX_EXCHANGES, "all", "on")
+CALLBACK_EXCHANGES_ALL_DISABLE = callback_data(PREFIX_EXCHANGES, "all", "off")
+
+
+def exchange_toggle_callback(exchange_name: str) -> str:
+    return callback_data(PREFIX_EXCHANGES, "toggle", exchange_name)
+
+
+def manual_input_callback(setting: str) -> str:
+    return callback_data(PREFIX_INPUT, setting)
+
+
+def preset_callback(setting: str, value) -> str:
+    return callback_data(PREFIX_SET, setting, value)
+
+
+def top_page_callback(page: int, limit: int) -> str:
+    return callback_data(PREFIX_TOP, "page", f"{page}{CALLBACK_SEPARATOR}{limit}")
+
+
+# Старый формат callback_data - кнопки в уже отправленных сообщениях продолжают работать
+LEGACY_CALLBACKS = {
+    "main_menu": CALLBACK_MAIN_MENU,
+    "settings": CALLBACK_SETTINGS,
+    "coins": CALLBACK_COINS,
+    "coins_list": CALLBACK_COINS_LIST,
+    "exchanges": CALLBACK_EXCHANGES,
+    "exchanges_select": CALLBACK_EXCHANGES_SELECT,
+    "exchanges_all": CALLBACK_EXCHANGES_ALL,
+    "position": CALLBACK_POSITION,
+    "min_spread": CALLBACK_MIN_SPREAD,
+    "min_profit": CALLBACK_MIN_PROFIT,
+    "min_zscore": CALLBACK_MIN_ZSCORE,
+    "interval": CALLBACK_INTERVAL,
+    "notify_close": CALLBACK_NOTIFY_CLOSE,
+    "live_dashboard": CALLBACK_LIVE_DASHBOARD,
+    "coins_add": CALLBACK_COINS_ADD,
+    "coins_remove": CALLBACK_COINS_REMOVE,
+    "coins_all": CALLBACK_COINS_ALL,
+    "coins_selected": CALLBACK_COINS_SELECTED,
+    "exchanges_cex": CALLBACK_EXCHANGES_CEX,
+    "exchanges_dex": CALLBACK_EXCHANGES_DEX,
+    "exchanges_all_enable": CALLBACK_EXCHANGES_ALL_ENABLE,
+    "exchanges_all_disable": CALLBACK_EXCHANGES_ALL_DISABLE,
+    "pos_size_1000": preset_callback("position", 1000),
+    "pos_size_5000": preset_callback("position", 5000),
+    "pos_size_10000": preset_callback("position", 10000),
+    "spread_0.05": preset_callback("spread", 0.05),
+    "spread_0.1": preset_callback("spread", 0.1),
+    "spread_0.25": preset_callback("spread", 0.25),
+    "spread_0.5": preset_callback("spread", 0.5),
+    "profit_5": preset_callback("profit", 5),
+    "profit_10": preset_callback("profit", 10),
+    "profit_20": preset_callback("profit", 20),
+    "profit_50": preset_callback("profit", 50),
+    "profit_100": preset_callback("profit", 100),
+    "interval_10": preset_callback("interval", 10),
+    "interval_30": preset_callback("interval", 30),
+    "interval_60": preset_callback("interval", 60),
+    "interval_300": preset_callback("interval", 300),
+    "interval_constant": preset_callback("interval", 0),
+    **{f"manual_input_{setting}": manual_input_callback(setting) for setting in ("position", "spread", "profit", "interval", "zscore")},
+}
+LEGACY_EXCHANGES_TOGGLE = "exchanges_toggle_"
+
+
+# ---------- Настройки с пресетами ----------
+
+
+def _interval_label(value: int) -> str:
+    if value == 0:
+        return "⚡ Постоянно"
+    if value >= 60 and value % 60 == 0:
+        return f"{value // 60} мин"
+    return f"{value} сек"
+
+
+@dataclass(frozen=True)
+class PresetSetting:
+    """Как показывать и применять пресеты настройки (значения - config.SETTING_PRESETS)"""
+    attr: str  # поле UserSettings
+    cast: Callable
+    label: Callable  # текст кнопки по значению
+    answer: str  # ответ на нажатие, {} - текст кнопки
+    row_width: int  # кнопок в ряду
+
+
+PRESET_SETTINGS = {
+    "position": PresetSetting("position_size_usd", float, lambda value: f"{value:g}$", "Объём установлен: {}", 3),
+    "spread": PresetSetting("min_spread", float, lambda value: f"{value:g}%", "Спред установлен: {}", 2),
+    "profit": PresetSetting("min_profit_usd", float, lambda value: f"{value:g}$", "Профит установлен: {}", 3),
+    "interval": PresetSetting("interval_seconds", int, _interval_label, "Интервал установлен: {}", 2),
+}
+
+
+def get_preset_rows(setting: str) -> list[list[InlineKeyboardButton]]:
+    """Ряды кнопок пресетов настройки по config.SETTING_PRESETS"""
+    spec = PRESET_SETTINGS[setting]
+    buttons = [
+        InlineKeyboardButton(text=spec.label(value), callback_data=preset_callback(setting, value))
+        for value in SETTING_PRESETS.get(setting, ())
+    ]
+    return [buttons[i:i + spec.row_width] for i in range(0, len(buttons), spec.row_width)]
 
 
 # ---------- Функции для создания клавиатур ----------
+#
+# Статические клавиатуры собираются один раз при импорте, функции возвращают
+# один и тот же объект. Зависящие от состояния (выбор бирж) кэшируются по
+# битовой маске. Возвращённые клавиатуры общие - изменять их нельзя.
 
 
-def get_main_menu_reply_keyboard() -> ReplyKeyboardMarkup:
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [
-                KeyboardButton(text="⚙️ Настройки"),
-                KeyboardButton(text="🪙 Монеты"),
-            ],
-            [
-                KeyboardButton(text="📊 Текущие настройки"),
-                KeyboardButton(text="🏦 Биржи"),
-            ],
-            [
-                KeyboardButton(text="▶️ Активировать скан"),
-                KeyboardButton(text="⏹ Остановить скан"),
-            ],
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=False,
-    )
-    return keyboard
+def _back_row(callback: str) -> list[InlineKeyboardButton]:
+    return [InlineKeyboardButton(text="◀️ Назад", callback_data=callback)]
 
 
-def get_settings_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
+def _preset_keyboard(setting: str) -> InlineKeyboardMarkup:
+    """Пресеты из config.SETTING_PRESETS, ручной ввод и возврат в настройки"""
+    return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="💰 Объём позиции", callback_data=CALLBACK_POSITION)],
-            [InlineKeyboardButton(text="📈 Минимальный спред", callback_data=CALLBACK_MIN_SPREAD)],
-            [InlineKeyboardButton(text="💵 Минимальный профит", callback_data=CALLBACK_MIN_PROFIT)],
-            [InlineKeyboardButton(text="⏱ Интервал проверки", callback_data=CALLBACK_INTERVAL)],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_MAIN_MENU)],
+            *get_preset_rows(setting),
+            [InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=manual_input_callback(setting))],
+            _back_row(CALLBACK_SETTINGS),
         ]
     )
-    return keyboard
 
 
-def get_exchanges_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
+_MAIN_MENU_REPLY_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [
+            KeyboardButton(text="⚙️ Настройки"),
+            KeyboardButton(text="🪙 Монеты"),
+        ],
+        [
+            KeyboardButton(text="📊 Текущие настройки"),
+            KeyboardButton(text="🏦 Биржи"),
+        ],
+        [
+            KeyboardButton(text="▶️ Активировать скан"),
+            KeyboardButton(text="⏹ Остановить скан"),
+        ],
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=False,
+)
+
+_SETTINGS_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="💰 Объём позиции", callback_data=CALLBACK_POSITION)],
+        [InlineKeyboardButton(text="📈 Минимальный спред", callback_data=CALLBACK_MIN_SPREAD)],
+        [InlineKeyboardButton(text="💵 Минимальный профит", callback_data=CALLBACK_MIN_PROFIT)],
+        [InlineKeyboardButton(text="📐 Аномальность спреда", callback_data=CALLBACK_MIN_ZSCORE)],
+        [InlineKeyboardButton(text="⏱ Интервал проверки", callback_data=CALLBACK_INTERVAL)],
+        [InlineKeyboardButton(text="🔔 Уведомления о закрытии", callback_data=CALLBACK_NOTIFY_CLOSE)],
+        [InlineKeyboardButton(text="📌 Live-сообщение", callback_data=CALLBACK_LIVE_DASHBOARD)],
+        _back_row(CALLBACK_MAIN_MENU),
+    ]
+)
+
+_EXCHANGES_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="🏢 Только CEX", callback_data=CALLBACK_EXCHANGES_CEX)],
+        [InlineKeyboardButton(text="🔷 Только DEX", callback_data=CALLBACK_EXCHANGES_DEX)],
+        [InlineKeyboardButton(text="✅ Отслеживать биржи", callback_data=CALLBACK_EXCHANGES_SELECT)],
+        [InlineKeyboardButton(text="🌐 Все биржи", callback_data=CALLBACK_EXCHANGES_ALL)],
+        _back_row(CALLBACK_MAIN_MENU),
+    ]
+)
+
+# track_all -> клавиатура
+_EXCHANGES_ALL_KEYBOARDS = {
+    track_all: InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="🏢 Только CEX", callback_data=CALLBACK_EXCHANGES_CEX)],
-            [InlineKeyboardButton(text="🔷 Только DEX", callback_data=CALLBACK_EXCHANGES_DEX)],
-            [InlineKeyboardButton(text="✅ Отслеживать биржи", callback_data=CALLBACK_EXCHANGES_SELECT)],
-            [InlineKeyboardButton(text="🌐 Все биржи", callback_data=CALLBACK_EXCHANGES_ALL)],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_MAIN_MENU)],
+            [
+                InlineKeyboardButton(
+                    text="✅ Включить" if not track_all else "⚪ Выключить",
+                    callback_data=CALLBACK_EXCHANGES_ALL_DISABLE if track_all else CALLBACK_EXCHANGES_ALL_ENABLE
+                ),
+            ],
+            _back_row(CALLBACK_EXCHANGES),
         ]
     )
-    return keyboard
+    for track_all in (False, True)
+}
+
+_POSITION_KEYBOARD = _preset_keyboard("position")
+_SPREAD_KEYBOARD = _preset_keyboard("spread")
+_PROFIT_KEYBOARD = _preset_keyboard("profit")
+_INTERVAL_KEYBOARD = _preset_keyboard("interval")
+
+_ZSCORE_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=manual_input_callback("zscore"))],
+        _back_row(CALLBACK_SETTINGS),
+    ]
+)
+
+_COINS_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="🌐 Все монеты", callback_data=CALLBACK_COINS_ALL)],
+        [InlineKeyboardButton(text="✅ Только выбранные", callback_data=CALLBACK_COINS_SELECTED)],
+        [InlineKeyboardButton(text="📋 Список монет", callback_data=CALLBACK_COINS_LIST)],
+        _back_row(CALLBACK_MAIN_MENU),
+    ]
+)
+
+_COINS_SELECTED_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="➕ Добавить монету", callback_data=CALLBACK_COINS_ADD)],
+        [InlineKeyboardButton(text="➖ Удалить монету", callback_data=CALLBACK_COINS_REMOVE)],
+        _back_row(CALLBACK_COINS),
+    ]
+)
+
+
+def get_main_menu_reply_keyboard() -> ReplyKeyboardMarkup:
+    return _MAIN_MENU_REPLY_KEYBOARD
+
+
+def get_settings_keyboard() -> InlineKeyboardMarkup:
+    return _SETTINGS_KEYBOARD
 
 
-def get_exchanges_select_keyboard(selected_exchanges: List[str]) -> InlineKeyboardMarkup:
-    keyboard_buttons = []
+def get_exchanges_keyboard() -> InlineKeyboardMarkup:
+    return _EXCHANGES_KEYBOARD
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_exchanges_select_keyboard(selected_mask: int) -> InlineKeyboardMarkup:
+    """Выбор бирж по маске выбранных (utils.registry); одна клавиатура на маску"""
     cex_buttons = []
     dex_buttons = []
-    
-    for exchange_name in ALL_EXCHANGES.keys():
-        is_selected = exchange_name in selected_exchanges
-        button_text = f"{'✅' if is_selected else '⚪'} {exchange_name}"
-        callback_data = f"{CALLBACK_EXCHANGES_TOGGLE}{exchange_name}"
-        
+
+    for exchange_name in EXCHANGE_NAMES:
+        is_selected = bool(selected_mask & EXCHANGE_BITS[exchange_name])
+        button = InlineKeyboardButton(
+            text=f"{'✅' if is_selected else '⚪'} {exchange_name}",
+            callback_data=exchange_toggle_callback(exchange_name),
+        )
         if ALL_EXCHANGES[exchange_name]["type"] == "CEX":
-            cex_buttons.append(InlineKeyboardButton(text=button_text, callback_data=callback_data))
+            cex_buttons.append(button)
         else:
-            dex_buttons.append(InlineKeyboardButton(text=button_text, callback_data=callback_data))
-    
-    for i in range(0, len(cex_buttons), 2):
-        if i + 1 < len(cex_buttons):
-            keyboard_buttons.append([cex_buttons[i], cex_buttons[i + 1]])
-        else:
-            keyboard_buttons.append([cex_buttons[i]])
-    
-    for i in range(0, len(dex_buttons), 2):
-        if i + 1 < len(dex_buttons):
-            keyboard_buttons.append([dex_buttons[i], dex_buttons[i + 1]])
-        else:
-            keyboard_buttons.append([dex_buttons[i]])
-    
-    keyboard_buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_EXCHANGES)])
-    
+            dex_buttons.append(button)
+
+    keyboard_buttons = [cex_buttons[i:i + 2] for i in range(0, len(cex_buttons), 2)]
+    keyboard_buttons.extend(dex_buttons[i:i + 2] for i in range(0, len(dex_buttons), 2))
+    keyboard_buttons.append(_back_row(CALLBACK_EXCHANGES))
+
     return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
 
 def get_exchanges_all_keyboard(track_all: bool) -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(
-                    text="✅ Включить" if not track_all else "⚪ Выключить",
-                    callback_data=CALLBACK_EXCHANGES_ALL_DISABLE if track_all else CALLBACK_EXCHANGES_ALL_ENABLE
-                ),
-            ],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_EXCHANGES)],
-        ]
-    )
-    return keyboard
+    return _EXCHANGES_ALL_KEYBOARDS[bool(track_all)]
 
 
 def get_position_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="1000$", callback_data=CALLBACK_POSITION_SIZE_1000),
-                InlineKeyboardButton(text="5000$", callback_data=CALLBACK_POSITION_SIZE_5000),
-                InlineKeyboardButton(text="10000$", callback_data=CALLBACK_POSITION_SIZE_10000),
-            ],
-            [InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=f"{CALLBACK_MANUAL_INPUT}_position")],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_SETTINGS)],
-        ]
-    )
-    return keyboard
+    return _POSITION_KEYBOARD
 
 
 def get_spread_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="0.05%", callback_data=CALLBACK_SPREAD_005),
-                InlineKeyboardButton(text="0.1%", callback_data=CALLBACK_SPREAD_01),
-            ],
-            [
-                InlineKeyboardButton(text="0.25%", callback_data=CALLBACK_SPREAD_025),
-                InlineKeyboardButton(text="0.5%", callback_data=CALLBACK_SPREAD_05),
-            ],
-            [InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=f"{CALLBACK_MANUAL_INPUT}_spread")],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_SETTINGS)],
-        ]
-    )
-    return keyboard
+    return _SPREAD_KEYBOARD
 
 
 def get_profit_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="5$", callback_data=CALLBACK_PROFIT_5),
-                InlineKeyboardButton(text="10$", callback_data=CALLBACK_PROFIT_10),
-                InlineKeyboardButton(text="20$", callback_data=CALLBACK_PROFIT_20),
-            ],
-            [
-                InlineKeyboardButton(text="50$", callback_data=CALLBACK_PROFIT_50),
-                InlineKeyboardButton(text="100$", callback_data=CALLBACK_PROFIT_100),
-            ],
-            [InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=f"{CALLBACK_MANUAL_INPUT}_profit")],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_SETTINGS)],
-        ]
-    )
-    return keyboard
+    return _PROFIT_KEYBOARD
+
+
+def get_zscore_keyboard() -> InlineKeyboardMarkup:
+    return _ZSCORE_KEYBOARD
 
 
 def get_interval_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="10 сек", callback_data=CALLBACK_INTERVAL_10),
-                InlineKeyboardButton(text="30 сек", callback_data=CALLBACK_INTERVAL_30),
-            ],
-            [
-                InlineKeyboardButton(text="1 мин", callback_data=CALLBACK_INTERVAL_60),
-                InlineKeyboardButton(text="5 мин", callback_data=CALLBACK_INTERVAL_300),
-            ],
-            [InlineKeyboardButton(text="⚡ Постоянно", callback_data=CALLBACK_INTERVAL_CONSTANT)],
-            [InlineKeyboardButton(text="✏️ Ввести вручную", callback_data=f"{CALLBACK_MANUAL_INPUT}_interval")],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_SETTINGS)],
-        ]
-    )
-    return keyboard
+    return _INTERVAL_KEYBOARD
 
 
 def get_coins_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="🌐 Все монеты", callback_data=CALLBACK_COINS_ALL)],
-            [InlineKeyboardButton(text="✅ Только выбранные", callback_data=CALLBACK_COINS_SELECTED)],
-            [InlineKeyboardButton(text="📋 Список монет", callback_data=CALLBACK_COINS_LIST)],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_MAIN_MENU)],
-        ]
-    )
-    return keyboard
+    return _COINS_KEYBOARD
 
 
 def get_coins_selected_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="➕ Добавить монету", callback_data=CALLBACK_COINS_ADD)],
-            [InlineKeyboardButton(text="➖ Удалить монету", callback_data=CALLBACK_COINS_REMOVE)],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data=CALLBACK_COINS)],
-        ]
-    )
-    return keyboard
+    return _COINS_SELECTED_KEYBOARD
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_top_keyboard(page: int, pages: int, limit: int) -> InlineKeyboardMarkup:
+    """Листание /top: назад, обновить, вперёд (страницы с нуля)"""
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=top_page_callback(page - 1, limit)))
+    row.append(InlineKeyboardButton(text="🔄 Обновить", callback_data=top_page_callback(page, limit)))
+    if page + 1 < pages:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=top_page_callback(page + 1, limit)))
+    return InlineKeyboardMarkup(inline_keyboard=[row])
+
+
+def get_opportunity_keyboard(coin: str, long_exchange: str, short_exchange: str) -> InlineKeyboardMarkup:
+    buttons = []
+    for label, exchange_name in (("📈 Лонг", long_exchange), ("📉 Шорт", short_exchange)):
+        url_template = ALL_EXCHANGES.get(exchange_name, {}).get("url_template")
+        if url_template:
+            buttons.append(
+                InlineKeyboardButton(
+                    text=f"{label}: {exchange_name}",
+                    url=url_template.format(symbol=coin),
+                )
+            )
+    return InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
@@ -1,37 +1,275 @@
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from utils.registry import (
+    ALL_EXCHANGES_MASK,
+    EXCHANGE_BITS,
+    coin_id,
+    coin_name,
+    exchanges_from_mask,
+    exchanges_mask,
+    known_coin_id,
+)
 
 # ---------- Модель настроек пользователя ----------
 
 
-@dataclass
 class UserSettings:
-    coins: list[str] = field(default_factory=list)
-    min_spread: float = 2.0
-    min_profit_usd: float = 10.0
-    sources: list[str] = field(default_factory=list)
-    position_size_usd: float = 100.0
-    leverage: float = 1.0
-    interval_seconds: int = 60
-    paused: bool = False
-    scan_active: bool = False
-    track_all_coins: bool = False
-    track_all_exchanges: bool = False
-    selected_exchanges: list[str] = field(default_factory=list)
-    pending_action: str | None = None
-    menu_message_id: int | None = None
-
-
-# Глобальные хранилища (в будущем перенесём в БД)
-user_settings: dict[int, UserSettings] = {}
-last_notifications: dict[int, dict[str, datetime]] = {}
+    """
+    Настройки пользователя в компактном виде:
+    - биржи - битовая маска в порядке реестра (utils.registry),
+    - монеты - упорядоченное множество интернированных id (dict без значений).
+    Для обработчиков сохранены прежние списки coins / selected_exchanges (только чтение).
+    """
+
+    __slots__ = (
+        "coin_ids",
+        "min_spread",
+        "min_profit_usd",
+        "min_zscore",
+        "sources",
+        "position_size_usd",
+        "leverage",
+        "interval_seconds",
+        "paused",
+        "scan_active",
+        "track_all_coins",
+        "track_all_exchanges",
+        "notify_on_close",
+        "live_dashboard",
+        "exchange_mask",
+        "pending_action",
+        "menu_message_id",
+        "dashboard_message_id",
+    )
+
+    def __init__(
+        self,
+        coins: Iterable[str] = (),
+        min_spread: float = 2.0,
+        min_profit_usd: float = 10.0,
+        min_zscore: float = 0.0,  # 0 = без проверки аномальности
+        sources: Iterable[str] = (),
+        position_size_usd: float = 100.0,
+        leverage: float = 1.0,
+        interval_seconds: int = 60,
+        paused: bool = False,
+        scan_active: bool = False,
+        track_all_coins: bool = False,
+        track_all_exchanges: bool = False,
+        notify_on_close: bool = False,
+        live_dashboard: bool = False,
+        selected_exchanges: Iterable[str] = (),
+        pending_action: str | None = None,
+        menu_message_id: int | None = None,
+        dashboard_message_id: int | None = None,
+    ):
+        self.coin_ids: dict[int, None] = dict.fromkeys(coin_id(ticker) for ticker in coins)
+        self.min_spread = min_spread
+        self.min_profit_usd = min_profit_usd
+        self.min_zscore = min_zscore
+        self.sources = tuple(sources)
+        self.position_size_usd = position_size_usd
+        self.leverage = leverage
+        self.interval_seconds = interval_seconds
+        self.paused = paused
+        self.scan_active = scan_active
+        self.track_all_coins = track_all_coins
+        self.track_all_exchanges = track_all_exchanges
+        self.notify_on_close = notify_on_close
+        self.live_dashboard = live_dashboard
+        self.exchange_mask = exchanges_mask(selected_exchanges)
+        self.pending_action = pending_action
+        self.menu_message_id = menu_message_id
+        self.dashboard_message_id = dashboard_message_id
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in FIELD_NAMES)
+        return f"UserSettings({values})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, UserSettings):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    # ---------- Монеты ----------
+
+    @property
+    def coins(self) -> list[str]:
+        return [coin_name(id_) for id_ in self.coin_ids]
+
+    def has_coin(self, ticker: str) -> bool:
+        id_ = known_coin_id(ticker)
+        return id_ is not None and id_ in self.coin_ids
+
+    def add_coin(self, ticker: str) -> bool:
+        """Добавляет монету; False, если она уже была в списке"""
+        id_ = coin_id(ticker)
+        if id_ in self.coin_ids:
+            return False
+        self.coin_ids[id_] = None
+        return True
+
+    def remove_coin(self, ticker: str) -> bool:
+        """Удаляет монету; False, если её не было в списке"""
+        id_ = known_coin_id(ticker)
+        if id_ is None or id_ not in self.coin_ids:
+            return False
+        del self.coin_ids[id_]
+        return True
+
+    # ---------- Биржи ----------
+
+    @property
+    def selected_exchanges(self) -> tuple[str, ...]:
+        return exchanges_from_mask(self.exchange_mask)
+
+    @selected_exchanges.setter
+    def selected_exchanges(self, names: Iterable[str]):
+        self.exchange_mask = exchanges_mask(names)
+
+    def toggle_exchange(self, name: str) -> bool:
+        """Переключает биржу; возвращает True, если биржа теперь выбрана"""
+        self.exchange_mask ^= EXCHANGE_BITS.get(name, 0)
+        return bool(self.exchange_mask & EXCHANGE_BITS.get(name, 0))
+
+    def effective_exchange_mask(self) -> int:
+        """Маска бирж для скана: все биржи, если включён режим "все" или ничего не выбрано"""
+        if self.track_all_exchanges or not self.exchange_mask:
+            return ALL_EXCHANGES_MASK
+        return self.exchange_mask
+
+
+# Имена полей в формате прежнего dataclass (для сериализации и repr)
+FIELD_NAMES = (
+    "coins",
+    "min_spread",
+    "min_profit_usd",
+    "min_zscore",
+    "sources",
+    "position_size_usd",
+    "leverage",
+    "interval_seconds",
+    "paused",
+    "scan_active",
+    "track_all_coins",
+    "track_all_exchanges",
+    "notify_on_close",
+    "live_dashboard",
+    "selected_exchanges",
+    "pending_action",
+    "menu_message_id",
+    "dashboard_message_id",
+)
+
+
+# Поля, которые не сохраняются в БД (состояние текущего диалога)
+TRANSIENT_FIELDS = {"pending_action"}
+
+
+PERSISTENT_FIELDS = tuple(name for name in FIELD_NAMES if name not in TRANSIENT_FIELDS)
+_PERSISTENT_FIELD_SET = frozenset(PERSISTENT_FIELDS)
+
+
+def settings_to_dict(s: UserSettings) -> dict:
+    data = {name: getattr(s, name) for name in PERSISTENT_FIELDS}
+    data["sources"] = list(s.sources)
+    data["selected_exchanges"] = list(s.selected_exchanges)
+    return data
+
+
+def settings_from_dict(data: dict) -> UserSettings:
+    # Неизвестные ключи (поля из старых/новых версий) игнорируются
+    if data.keys() <= _PERSISTENT_FIELD_SET:
+        return UserSettings(**data)
+    return UserSettings(**{key: value for key, value in data.items() if key in _PERSISTENT_FIELD_SET})
+
+
+# Глобальные хранилища. user_settings - резидентный рабочий набор в порядке LRU
+# (последние обращения в конце); остальные пользователи лежат в SQLite, см. services/storage.py
+user_settings: "OrderedDict[int, UserSettings]" = OrderedDict()
+# Пользователи, чьи настройки изменились с последнего сброса в БД
+dirty_users: set[int] = set()
+# Загрузчик настроек пользователя, не поднятого при старте (устанавливается в bot.py)
+settings_loader: Optional[Callable[[int], Optional[UserSettings]]] = None
+
+# Счётчики резидентности: попадания, подгрузки из БД, новые пользователи, вытеснения
+residency = {"hits": 0, "loads": 0, "created": 0, "evicted": 0}
 
 
 def get_user_settings(user_id: int) -> UserSettings:
     """Возвращает настройки пользователя, создаёт с дефолтами, если их ещё нет."""
-    if user_id not in user_settings:
-        user_settings[user_id] = UserSettings()
-    if user_id not in last_notifications:
-        last_notifications[user_id] = {}
-    return user_settings[user_id]
+    s = user_settings.get(user_id)
+    if s is not None:
+        user_settings.move_to_end(user_id)
+        return s
+    # Обычно пользователя уже поднял ResidencyMiddleware; синхронная загрузка - запасной путь
+    loaded = settings_loader(user_id) if settings_loader else None
+    return admit_user(user_id, loaded)
+
+
+def touch_user(user_id: int) -> bool:
+    """Отмечает обращение пользователя. True - настройки уже в памяти."""
+    if user_id in user_settings:
+        user_settings.move_to_end(user_id)
+        residency["hits"] += 1
+        return True
+    return False
+
+
+def admit_user(user_id: int, loaded: Optional[UserSettings]) -> UserSettings:
+    """Делает пользователя резидентным (loaded - настройки из БД или None для нового)"""
+    s = user_settings.get(user_id)
+    if s is not None:
+        # Пока шла загрузка, пользователя уже поднял параллельный апдейт
+        return s
+    if loaded is not None:
+        residency["loads"] += 1
+        s = loaded
+    else:
+        residency["created"] += 1
+        s = UserSettings()
+    user_settings[user_id] = s
+    return s
+
+
+def evict_idle_users(limit: int) -> int:
+    """
+    Вытесняет давно неактивных пользователей, пока резидентных больше limit.
+    Не трогает тех, у кого активен скан, есть несохранённые изменения или открыт диалог ввода.
+    """
+    excess = len(user_settings) - limit
+    if excess <= 0:
+        return 0
+    evicted = 0
+    pinned = []
+    for user_id in list(user_settings):
+        if evicted >= excess:
+            break
+        s = user_settings[user_id]
+        if s.scan_active:
+            pinned.append(user_id)
+            continue
+        if user_id in dirty_users or s.pending_action:
+            continue
+        del user_settings[user_id]
+        evicted += 1
+    # Сканирующих пользователей переносим в конец, чтобы не перебирать их каждый проход
+    for user_id in pinned:
+        user_settings.move_to_end(user_id)
+    residency["evicted"] += evicted
+    return evicted
+
+
+def residency_stats() -> dict:
+    lookups = residency["hits"] + residency["loads"] + residency["created"]
+    return {
+        **residency,
+        "resident": len(user_settings),
+        "hit_rate": residency["hits"] / lookups if lookups else 1.0,
+    }
+
+
+def mark_dirty(user_id: int):
+    """Помечает настройки пользователя для сохранения в БД (без ожидания диска)"""
+    dirty_users.add(user_id)
@@ -0,0 +1,136 @@
+"""
+Воркеры сканирования для шардированного режима
+
+Основной процесс (bot.py с SCAN_SHARDS=N) принимает обновления Telegram и
+сохраняет настройки; сканированием и уведомлениями занимаются N воркеров.
+
+Примеры:
+    python scanner.py --shard 0 --shards 4      # один воркер (отдельный процесс/контейнер)
+    python scanner.py --spawn 4                 # локально: N воркеров-подпроцессов
+    python scanner.py --set-shards 6            # перебалансировка: новое число воркеров
+
+Локальный режим (--spawn) заменяет внешний брокер: координация идёт через
+общие файлы (SQLite с настройками, снимок коллектора, карта шардов), а
+лаунчер поднимает и гасит подпроцессы при изменении карты шардов.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from aiogram import Bot
+from dotenv import load_dotenv
+
+from config import COIN_UNIVERSE_DEFAULT_PATH, TELEGRAM_GLOBAL_RATE, SHARD_MAP_DEFAULT_PATH, WARM_STATE_DEFAULT_PATH
+from services.coin_universe import coin_universe
+from services.dashboard import live_dashboard
+from services.market_snapshot import market_feed
+from services.metrics import start_metrics_server
+from services.notifier import notifier
+from services.shard_worker import ShardWorker
+from services.sharding import read_shard_count, write_shard_count
+from services.spread_checker import check_spreads_task
+from services.storage import SettingsStore
+from services.warm_state import load_state, save_final_state, save_state_task
+from utils.logger import setup_logging
+
+
+async def run_worker(index: int, count: int, shard_map_path: str):
+    bot = Bot(token=os.environ["BOT_TOKEN"])
+    store = SettingsStore(os.getenv("SETTINGS_DB_PATH", "data/bot.sqlite3"))
+    snapshot_path = os.getenv("MARKET_SNAPSHOT_PATH")
+    if snapshot_path:
+        market_feed.attach(snapshot_path)
+    else:
+        print("MARKET_SNAPSHOT_PATH не задан: воркер сам опрашивает биржи для своих пользователей")
+
+    count = read_shard_count(shard_map_path, count) or count
+    worker = ShardWorker(store, index, count, shard_map_path, bot=bot)
+    loaded = await worker.load()
+    print(f"Шард {index}/{count}: пользователей с активным сканом: {loaded}")
+
+    # Каждый воркер отдаёт свои метрики на METRICS_PORT + 1 + номер шарда
+    metrics_port = int(os.getenv("METRICS_PORT", "0"))
+    if metrics_port:
+        await start_metrics_server(os.getenv("METRICS_HOST", "127.0.0.1"), metrics_port + 1 + index)
+
+    # Лимит Telegram общий для бота - делим его между воркерами
+    notifier.set_global_rate(TELEGRAM_GLOBAL_RATE / count)
+    notifier.start(bot)
+    universe_path = os.getenv("COIN_UNIVERSE_PATH", COIN_UNIVERSE_DEFAULT_PATH)
+    coin_universe.load(universe_path)
+    # У каждого шарда свой снимок: возможности принадлежат его пользователям
+    state_path = f"{os.getenv('WARM_STATE_PATH', WARM_STATE_DEFAULT_PATH)}.{index}"
+    restored = load_state(state_path)
+    if restored:
+        print(f"Шард {index}: состояние восстановлено из {state_path}: {restored}")
+    state_task = asyncio.create_task(save_state_task(state_path))
+    tasks = [
+        asyncio.create_task(coin_universe.run(universe_path)),
+        asyncio.create_task(live_dashboard.run(bot)),
+        asyncio.create_task(check_spreads_task(bot)),
+    ]
+    try:
+        await worker.run()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await save_final_state(state_task, state_path)
+        await notifier.stop()
+        await worker.flush_dashboard_ids()
+        store.close()
+        await bot.session.close()
+
+
+def spawn(count: int, shard_map_path: str):
+    """Локальный лаунчер: держит число подпроцессов равным числу в карте шардов"""
+    write_shard_count(shard_map_path, count)
+    processes: dict[int, subprocess.Popen] = {}
+    try:
+        while True:
+            count = read_shard_count(shard_map_path, count)
+            for index in range(count):
+                process = processes.get(index)
+                if process is None or process.poll() is not None:
+                    processes[index] = subprocess.Popen(
+                        [sys.executable, __file__, "--shard", str(index), "--shards", str(count), "--map", shard_map_path]
+                    )
+            # Воркеры с номером >= count завершаются сами, лаунчер только забывает их
+            for index in [index for index, process in processes.items() if index >= count and process.poll() is not None]:
+                del processes[index]
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.wait()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Воркеры сканирования шардов пользователей")
+    parser.add_argument("--shard", type=int, help="Номер воркера (0..N-1)")
+    parser.add_argument("--shards", type=int, default=1, help="Число воркеров, если карта шардов ещё не создана")
+    parser.add_argument("--spawn", type=int, help="Запустить N воркеров локально")
+    parser.add_argument("--set-shards", type=int, help="Записать новое число воркеров в карту шардов")
+    parser.add_argument("--map", default=os.getenv("SHARD_MAP_PATH", SHARD_MAP_DEFAULT_PATH), help="Файл карты шардов")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.set_shards:
+        write_shard_count(args.map, args.set_shards)
+        print(f"Карта шардов {args.map}: {args.set_shards} воркеров")
+    elif args.spawn:
+        spawn(args.spawn, args.map)
+    elif args.shard is not None:
+        asyncio.run(run_worker(args.shard, args.shards, args.map))
+    else:
+        parser.error("нужен --shard, --spawn или --set-shards")
+
+
+if __name__ == "__main__":
+    main()
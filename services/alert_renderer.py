@@ -0,0 +1,156 @@
+"""
+Рендеринг уведомлений о возможностях с LRU-кэшем
+
+Одна и та же возможность (монета, пара бирж) из одного снимка коллектора
+рассылается многим пользователям. Текст зависит только от котировок снимка и
+объёма позиции/плеча, поэтому готовые (текст, клавиатура) кэшируются по
+(монета, лонг, шорт, seq снимка, объём, плечо): пользователи с одинаковыми
+объёмом и плечом получают уже собранное сообщение, а клавиатура со ссылками на
+биржи строится один раз на (монета, лонг, шорт).
+
+Котировки, которые проверка запросила у бирж сама, у каждого пользователя свои -
+общего снимка нет, и такие уведомления рендерятся без кэша.
+"""
+from collections import OrderedDict
+from typing import Optional
+
+from aiogram.types import InlineKeyboardMarkup
+
+from config import ALERT_RENDER_CACHE_SIZE
+from keyboards import get_opportunity_keyboard
+
+
+def _spread_alert_text(
+    coin: str,
+    prices_data: dict,
+    spread_percent: float,
+    profit_data: dict,
+    long_exchange: str,
+    short_exchange: str,
+    position_size_usd: float,
+    leverage: float,
+) -> str:
+    return (
+        f"🚨 Арбитражная возможность: {coin}\n\n"
+        f"📈 Лонг: {long_exchange} — {prices_data[long_exchange]['price']:.6g} USDT\n"
+        f"📉 Шорт: {short_exchange} — {prices_data[short_exchange]['price']:.6g} USDT\n"
+        f"📊 Спред: {spread_percent:.2f}%\n\n"
+        f"💰 Объём: {position_size_usd}$ × {leverage}\n"
+        f"💵 Профит (маркет): {profit_data['market_profit']:.2f}$ (комиссии {profit_data['market_fees']:.2f}$)\n"
+        f"💵 Профит (лимит): {profit_data['limit_profit']:.2f}$ (комиссии {profit_data['limit_fees']:.2f}$)"
+    )
+
+
+class AlertRenderCache:
+    def __init__(self, capacity: int = ALERT_RENDER_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        # Уведомления по собственным котировкам пользователя (без снимка) - мимо кэша
+        self.uncached = 0
+        self._messages: OrderedDict[tuple, tuple[str, InlineKeyboardMarkup]] = OrderedDict()
+        self._keyboards: OrderedDict[tuple[str, str, str], InlineKeyboardMarkup] = OrderedDict()
+
+    def _put(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        if len(cache) > self.capacity:
+            cache.popitem(last=False)
+
+    def keyboard(self, coin: str, long_exchange: str, short_exchange: str) -> InlineKeyboardMarkup:
+        key = (coin, long_exchange, short_exchange)
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            keyboard = get_opportunity_keyboard(coin, long_exchange, short_exchange)
+            self._put(self._keyboards, key, keyboard)
+        else:
+            self._keyboards.move_to_end(key)
+        return keyboard
+
+    def spread_alert(
+        self,
+        coin: str,
+        prices_data: dict,
+        spread_percent: float,
+        profit_data: dict,
+        long_exchange: str,
+        short_exchange: str,
+        position_size_usd: float,
+        leverage: float,
+        snapshot_seq: Optional[int] = None,
+    ) -> tuple[str, InlineKeyboardMarkup]:
+        if snapshot_seq is None:
+            self.uncached += 1
+            text = _spread_alert_text(coin, prices_data, spread_percent, profit_data, long_exchange, short_exchange, position_size_usd, leverage)
+            return text, self.keyboard(coin, long_exchange, short_exchange)
+
+        key = (coin, long_exchange, short_exchange, snapshot_seq, position_size_usd, leverage)
+        cached = self._messages.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._messages.move_to_end(key)
+            return cached
+
+        self.misses += 1
+        text = _spread_alert_text(coin, prices_data, spread_percent, profit_data, long_exchange, short_exchange, position_size_usd, leverage)
+        rendered = (text, self.keyboard(coin, long_exchange, short_exchange))
+        self._put(self._messages, key, rendered)
+        return rendered
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses + self.uncached
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_rate": self.hits / total if total else 0.0,
+            "messages": len(self._messages),
+            "keyboards": len(self._keyboards),
+        }
+
+
+# Глобальный кэш для фоновой проверки спредов
+alert_cache = AlertRenderCache()
+
+
+def render_spread_notification(
+    coin: str,
+    prices_data: dict,
+    spread_percent: float,
+    profit_data: dict,
+    long_exchange: str,
+    short_exchange: str,
+    settings,
+    cache: Optional[AlertRenderCache] = None,
+    snapshot_seq: Optional[int] = None,
+) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Текст и клавиатура уведомления об открытии арбитражной возможности
+
+    snapshot_seq - seq снимка коллектора, из которого взяты обе котировки пары;
+    None - котировки собственные, уведомление рендерится без кэша.
+    """
+    return (cache or alert_cache).spread_alert(
+        coin,
+        prices_data,
+        spread_percent,
+        profit_data,
+        long_exchange,
+        short_exchange,
+        settings.position_size_usd,
+        settings.leverage,
+        snapshot_seq,
+    )
+
+
+def render_close_notification(
+    coin: str,
+    spread_percent: float,
+    long_exchange: str,
+    short_exchange: str,
+) -> str:
+    """Текст уведомления о закрытии арбитражной возможности"""
+    return (
+        f"✅ Возможность закрылась: {coin}\n\n"
+        f"Лонг {long_exchange} / Шорт {short_exchange}\n"
+        f"📊 Текущий спред: {spread_percent:.2f}%"
+    )
@@ -0,0 +1,222 @@
+"""
+Детерминированный реплей записанных тиков через логику проверки спредов
+
+Котировки из TickRecorder проигрываются по времени записи (симулированные часы).
+На каждый тик монета оценивается тем же шагом, что и в check_spreads_task:
+evaluate_spread -> observe_coin (ratio, гистерезис, кулдаун, прежние лучшие пары).
+Для каждой комбинации порогов (min_spread, min_profit_usd) считаются
+уведомления, гипотетический профит на момент открытия и длительность возможностей.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from config import BACKTEST_MAX_QUOTE_AGE_SECONDS, BACKTEST_SWEEP_INTERVAL_SECONDS
+from services.opportunity_tracker import OpportunityTracker, observe_coin, EVENT_OPENED, EVENT_CLOSED
+from services.profit_calculator import evaluate_spread
+from services.spread_history import SpreadHistory
+from services.tick_recorder import TickReader
+
+
+@dataclass
+class ThresholdResult:
+    min_spread: float
+    min_profit_usd: float
+    alerts: int = 0
+    closes: int = 0
+    profits: list[float] = field(default_factory=list)
+    durations: list[float] = field(default_factory=list)
+    still_open: int = 0
+
+
+@dataclass
+class BacktestReport:
+    ticks: int
+    evaluations: int
+    elapsed_seconds: float
+    sim_start: float
+    sim_end: float
+    results: list[ThresholdResult]
+
+    @property
+    def ticks_per_second(self) -> float:
+        return self.ticks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль по отсортированной копии (ближайший ранг)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_backtest(
+    quotes: Iterable[tuple],
+    thresholds: list[tuple[float, float]],
+    position_size_usd: float = 100.0,
+    leverage: float = 1.0,
+    min_zscore: float = 0.0,
+    max_quote_age: float = BACKTEST_MAX_QUOTE_AGE_SECONDS,
+    sweep_interval: float = BACKTEST_SWEEP_INTERVAL_SECONDS,
+) -> BacktestReport:
+    """
+    Проигрывает котировки через логику возможностей
+
+    Args:
+        quotes: Котировки (ts, coin, exchange, price, bid, ask) по возрастанию ts
+        thresholds: Комбинации (min_spread %, min_profit_usd) для сравнения
+        position_size_usd: Объём позиции
+        leverage: Плечо
+        min_zscore: Порог аномальности чистого спреда (0 - выключено)
+        max_quote_age: Котировки старше (по симулированным часам) не участвуют в оценке
+        sweep_interval: Как часто (по симулированным часам) вызывать sweep трекеров
+
+    Returns:
+        BacktestReport с результатами по каждой комбинации порогов
+    """
+    results = [ThresholdResult(min_spread, min_profit) for min_spread, min_profit in thresholds]
+    trackers = [OpportunityTracker(capacity=1 << 16) for _ in thresholds]
+    history = SpreadHistory()
+    latest: dict[str, dict[str, tuple[float, dict]]] = {}
+
+    ticks = 0
+    evaluations = 0
+    sim_start = None
+    now = 0.0
+    next_sweep = 0.0
+    started = time.perf_counter()
+
+    for ts, coin, exchange, price, bid, ask in quotes:
+        ticks += 1
+        now = ts
+        if sim_start is None:
+            sim_start = ts
+            next_sweep = ts + sweep_interval
+
+        coin_quotes = latest.get(coin)
+        if coin_quotes is None:
+            coin_quotes = latest[coin] = {}
+        coin_quotes[exchange] = (ts, {"price": price, "bid": bid, "ask": ask})
+
+        if ts >= next_sweep:
+            for tracker in trackers:
+                tracker.sweep(ts)
+            next_sweep = ts + sweep_interval
+
+        prices_data = {
+            name: data for name, (quote_ts, data) in coin_quotes.items()
+            if ts - quote_ts <= max_quote_age
+        }
+        if len(prices_data) < 2:
+            continue
+
+        evaluation = evaluate_spread(prices_data, position_size_usd, leverage)
+        if evaluation is None:
+            continue
+        evaluations += 1
+
+        long_exchange = evaluation["long"]
+        short_exchange = evaluation["short"]
+
+        allow_open = True
+        if min_zscore > 0:
+            zscore = history.zscore(coin, long_exchange, short_exchange, evaluation["net_spread"])
+            if zscore is not None:
+                allow_open = zscore >= min_zscore
+        history.record(coin, long_exchange, short_exchange, evaluation["net_spread"], now=ts)
+
+        for result, tracker in zip(results, trackers):
+            observations = observe_coin(
+                tracker,
+                (coin,),
+                prices_data,
+                evaluation,
+                result.min_spread,
+                result.min_profit_usd,
+                position_size_usd,
+                leverage,
+                allow_open=allow_open,
+                now=ts,
+            )
+            for key, event, pair in observations:
+                if event == EVENT_OPENED:
+                    result.alerts += 1
+                    result.profits.append(pair["best_profit"])
+                elif event == EVENT_CLOSED:
+                    result.closes += 1
+                    state = tracker.get(key)
+                    result.durations.append(ts - state["opened_at"])
+
+    for result, tracker in zip(results, trackers):
+        result.still_open = tracker.open_count()
+
+    return BacktestReport(
+        ticks=ticks,
+        evaluations=evaluations,
+        elapsed_seconds=time.perf_counter() - started,
+        sim_start=sim_start or 0.0,
+        sim_end=now,
+        results=results,
+    )
+
+
+def iter_recorded_quotes(root: str, days: Optional[list[str]] = None) -> Iterable[tuple]:
+    """Котировки из каталога TickRecorder за указанные дни (по умолчанию - все)"""
+    reader = TickReader(root)
+    for day in days or reader.days():
+        yield from reader.iter_quotes(day)
+
+
+def format_report(report: BacktestReport) -> str:
+    sim_hours = (report.sim_end - report.sim_start) / 3600
+    lines = [
+        f"Тиков: {report.ticks}, оценок: {report.evaluations}, "
+        f"период: {sim_hours:.2f} ч, время: {report.elapsed_seconds:.2f} с, "
+        f"скорость: {report.ticks_per_second:,.0f} тиков/с",
+        "",
+        f"{'спред%':>7} {'профит$':>8} {'алертов':>8} {'закрыто':>8} {'открыто':>8} "
+        f"{'PnL p10':>8} {'p50':>8} {'p90':>8} {'Σ PnL':>10} {'длит p50':>9} {'p90':>8}",
+    ]
+    for result in report.results:
+        lines.append(
+            f"{result.min_spread:>7g} {result.min_profit_usd:>8g} {result.alerts:>8} {result.closes:>8} "
+            f"{result.still_open:>8} "
+            f"{percentile(result.profits, 10):>8.2f} {percentile(result.profits, 50):>8.2f} "
+            f"{percentile(result.profits, 90):>8.2f} {sum(result.profits):>10.2f} "
+            f"{percentile(result.durations, 50):>8.0f}s {percentile(result.durations, 90):>7.0f}s"
+        )
+    return "\n".join(lines)
+
+
+def report_to_dict(report: BacktestReport) -> dict:
+    return {
+        "ticks": report.ticks,
+        "evaluations": report.evaluations,
+        "elapsed_seconds": report.elapsed_seconds,
+        "ticks_per_second": report.ticks_per_second,
+        "sim_start": report.sim_start,
+        "sim_end": report.sim_end,
+        "results": [
+            {
+                "min_spread": result.min_spread,
+                "min_profit_usd": result.min_profit_usd,
+                "alerts": result.alerts,
+                "closes": result.closes,
+                "still_open": result.still_open,
+                "pnl": {
+                    "sum": sum(result.profits),
+                    "p10": percentile(result.profits, 10),
+                    "p50": percentile(result.profits, 50),
+                    "p90": percentile(result.profits, 90),
+                },
+                "duration_seconds": {
+                    "p50": percentile(result.durations, 50),
+                    "p90": percentile(result.durations, 90),
+                    "max": max(result.durations, default=0.0),
+                },
+            }
+            for result in report.results
+        ],
+    }
@@ -2,9 +2,15 @@
 Bybit API - получение цен
 Документация: https://bybit-exchange.github.io/docs/v5/intro
 """
+import logging
+
 import aiohttp
 from typing import Optional
 
+from config import ALL_EXCHANGES
+
+log = logging.getLogger(__name__)
+
 
 async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[float]:
     """
@@ -18,12 +24,42 @@ async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[flo
         Цена в USDT или None при ошибке
     """
     try:
-        url = f"https://api.bybit.com/v5/market/tickers?category=linear&symbol={symbol}USDT"
+        url = f"{ALL_EXCHANGES['Bybit']['api_base']}/v5/market/tickers?category=linear&symbol={symbol}USDT"
         async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
             if response.status == 200:
                 data = await response.json()
                 if data.get("retCode") == 0 and data.get("result", {}).get("list"):
                     return float(data["result"]["list"][0]["lastPrice"])
-    except Exception as e:
-        print(f"Ошибка получения цены с Bybit для {symbol}: {e}")
+    except Exception:
+        log.warning("Ошибка получения цены %s", symbol, exc_info=True)
+    return None
+
+
+async def get_instruments(session: aiohttp.ClientSession) -> Optional[set[str]]:
+    """
+    Тикеры торгуемых линейных USDT-перпетуалов Bybit
+
+    Returns:
+        Множество тикеров (например, {"BTC", "ETH"}) или None при ошибке
+    """
+    tickers = set()
+    cursor = ""
+    try:
+        while True:
+            url = f"{ALL_EXCHANGES['Bybit']['api_base']}/v5/market/instruments-info?category=linear&limit=1000&cursor={cursor}"
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                if response.status != 200:
+                    return None
+                data = await response.json()
+            if data.get("retCode") != 0:
+                return None
+            result = data.get("result", {})
+            for item in result.get("list", []):
+                if item.get("quoteCoin") == "USDT" and item.get("status") == "Trading" and item.get("symbol") == f"{item.get('baseCoin')}USDT":
+                    tickers.add(item["baseCoin"])
+            cursor = result.get("nextPageCursor") or ""
+            if not cursor:
+                return tickers
+    except Exception:
+        log.warning("Ошибка получения списка инструментов", exc_info=True)
     return None
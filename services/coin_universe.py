@@ -0,0 +1,178 @@
+"""
+Вселенная монет: тикеры, торгуемые хотя бы на COIN_UNIVERSE_MIN_EXCHANGES наших биржах
+
+Списки инструментов запрашиваются у каждого адаптера (get_instruments), результат
+кэшируется на диске с TTL. При старте процесс сразу берёт список из кэша (даже
+устаревший - он лучше запасного config.ALL_COINS) и обновляет его в фоне, поэтому
+перезапуск не ждёт опроса бирж. Несколько процессов (бот, воркеры, коллектор)
+делят один файл: свежий кэш подхватывается без запросов к биржам.
+
+Если биржа не ответила, для неё остаётся прошлый список. Биржи, не листингующие
+монету, сразу отмечаются в QuoteIndex - проверка не тратит на них запросы.
+Только по спискам инструментов монета и считается отсутствующей на бирже
+(is_unlisted): ошибка запроса цены - не повод убирать биржу на QUOTE_INDEX_RETRY_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+
+from config import (
+    ALL_COINS,
+    COIN_UNIVERSE_CHECK_SECONDS,
+    COIN_UNIVERSE_FETCH_TIMEOUT_SECONDS,
+    COIN_UNIVERSE_MIN_EXCHANGES,
+    COIN_UNIVERSE_TTL_SECONDS,
+)
+from services import bybit, gate, hibachi, hyperliquid, mexc, okx
+from services import metrics
+from services.quote_index import QuoteIndex, quote_index
+from utils.atomic_file import write_json_atomic
+from utils.registry import EXCHANGE_NAMES
+
+log = logging.getLogger(__name__)
+
+# Биржа -> получение тикеров её инструментов (у Paradigm адаптера нет)
+INSTRUMENT_FETCHERS = {
+    "Bybit": bybit.get_instruments,
+    "OKX": okx.get_instruments,
+    "Gate": gate.get_instruments,
+    "MEXC": mexc.get_instruments,
+    "Hyperliquid": hyperliquid.get_instruments,
+    "Hibachi": hibachi.get_instruments,
+}
+
+
+def tradable_coins(listings: dict[str, set[str]], min_exchanges: int = COIN_UNIVERSE_MIN_EXCHANGES) -> list[str]:
+    """
+    Тикеры, листингованные минимум на min_exchanges биржах
+
+    Порядок: сначала монеты из config.ALL_COINS (в его порядке), затем остальные -
+    по числу бирж (больше - раньше) и по имени.
+    """
+    counts: dict[str, int] = {}
+    for tickers in listings.values():
+        for ticker in tickers:
+            counts[ticker] = counts.get(ticker, 0) + 1
+    tradable = {ticker for ticker, count in counts.items() if count >= min_exchanges}
+    popular = [coin for coin in dict.fromkeys(ALL_COINS) if coin in tradable]
+    rest = sorted(tradable.difference(popular), key=lambda ticker: (-counts[ticker], ticker))
+    return popular + rest
+
+
+class CoinUniverse:
+    def __init__(self, ttl: float = COIN_UNIVERSE_TTL_SECONDS, min_exchanges: int = COIN_UNIVERSE_MIN_EXCHANGES):
+        self.ttl = ttl
+        self.min_exchanges = min_exchanges
+        # Пока нет ни кэша, ни ответа бирж - запасной список из конфига
+        self.coins: list[str] = list(dict.fromkeys(ALL_COINS))
+        self.listings: dict[str, set[str]] = {}
+        self.updated_at = 0.0
+        self.path: Optional[str] = None
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - self.updated_at < self.ttl
+
+    def _apply(self, listings: dict[str, set[str]], updated_at: float):
+        coins = tradable_coins(listings, self.min_exchanges)
+        if not coins:
+            return
+        self.listings = listings
+        self.coins = coins
+        self.updated_at = updated_at
+        self.seed(quote_index)
+
+    def seed(self, index: QuoteIndex):
+        """Отмечает в индексе биржи без листинга монеты: проверка пропустит их сразу"""
+        now = time.time()
+        for coin in self.coins:
+            for exchange, tickers in self.listings.items():
+                if coin not in tickers:
+                    index.mark_unlisted(coin, exchange, now)
+
+    def is_listed(self, coin: str) -> bool:
+        """Монета торгуется хотя бы на одной бирже (без списков - есть в запасном списке)"""
+        if not self.listings:
+            return coin in self.coins
+        return any(coin in tickers for tickers in self.listings.values())
+
+    def is_unlisted(self, coin: str, exchange: str) -> bool:
+        """
+        Биржа точно не торгует монетой: у неё нет адаптера или монеты нет в её
+        списке инструментов. Пустой ответ цены (429, 5xx, таймаут, ошибка разбора)
+        сам по себе ничего не доказывает - такая биржа только пропускается в цикле.
+        """
+        if exchange not in INSTRUMENT_FETCHERS:
+            return True
+        tickers = self.listings.get(exchange)
+        return tickers is not None and coin not in tickers
+
+    def load(self, path: str) -> bool:
+        """Читает кэш с диска. True - если в нём был список (свежесть - is_fresh)."""
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            updated_at = float(data["updated_at"])
+            listings = {name: set(tickers) for name, tickers in data["listings"].items() if name in EXCHANGE_NAMES}
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError):
+            log.warning("Кэш вселенной монет %s повреждён, будет пересобран", path, exc_info=True)
+            return False
+        if updated_at > self.updated_at:
+            self._apply(listings, updated_at)
+        return bool(self.listings)
+
+    def save(self):
+        """Атомарная запись кэша (его одновременно могут писать несколько процессов)"""
+        if self.path is None:
+            return
+        write_json_atomic(self.path, {
+            "updated_at": self.updated_at,
+            "listings": {name: sorted(tickers) for name, tickers in self.listings.items()},
+        })
+
+    async def refresh(self, session: aiohttp.ClientSession, timeout: float = COIN_UNIVERSE_FETCH_TIMEOUT_SECONDS) -> int:
+        """Опрашивает списки инструментов всех бирж параллельно. Возвращает число ответивших бирж."""
+        names = list(INSTRUMENT_FETCHERS)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(INSTRUMENT_FETCHERS[name](session), timeout) for name in names),
+            return_exceptions=True,
+        )
+        listings = dict(self.listings)
+        answered = 0
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException) or not result:
+                log.warning("%s: список инструментов не получен (%s), остаётся прошлый", name, type(result).__name__ if isinstance(result, BaseException) else "пусто")
+                continue
+            listings[name] = result
+            answered += 1
+        if answered:
+            self._apply(listings, time.time())
+            self.save()
+        return answered
+
+    async def run(self, path: str, check_interval: float = COIN_UNIVERSE_CHECK_SECONDS):
+        """
+        Фоновое обновление: перечитывает кэш (его мог обновить другой процесс)
+        и опрашивает биржи, только если кэш устарел
+        """
+        self.load(path)
+        async with aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()]) as session:
+            while True:
+                try:
+                    self.load(path)
+                    if not self.is_fresh():
+                        answered = await self.refresh(session)
+                        log.info("Вселенная монет: %d монет, ответили %d бирж из %d", len(self.coins), answered, len(INSTRUMENT_FETCHERS))
+                except Exception:
+                    log.exception("Ошибка обновления вселенной монет")
+                await asyncio.sleep(check_interval)
+
+
+# Глобальная вселенная монет ("Все монеты" в настройках, коллектор)
+coin_universe = CoinUniverse()
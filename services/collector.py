@@ -0,0 +1,163 @@
+"""
+Сбор рыночных данных в отдельном процессе
+
+Опрашивает все биржи по всем монетам вселенной (параллельно, с ограничением
+одновременных запросов на биржу) и публикует снимок через SnapshotWriter
+по мере поступления котировок: после ответа каждой биржи и не реже
+MARKET_COLLECT_PUBLISH_SECONDS. Цикл ограничен MARKET_COLLECT_CYCLE_SECONDS:
+медленная биржа (Hibachi с минимальным интервалом запросов) не задерживает
+остальные - её опрос продолжается в фоне и подхватывается следующим циклом.
+Процессы бота читают снимки из разделяемой памяти и не тратят свой event
+loop на HTTP и разбор JSON.
+"""
+import asyncio
+import logging
+import time
+from typing import Iterable, Optional
+
+import aiohttp
+
+from config import (
+    ALL_EXCHANGES,
+    MARKET_COLLECT_INTERVAL_SECONDS,
+    MARKET_COLLECT_CONCURRENCY,
+    MARKET_COLLECT_CYCLE_SECONDS,
+    MARKET_COLLECT_DEFAULT_CONCURRENCY,
+    MARKET_COLLECT_PUBLISH_SECONDS,
+    MARKET_COLLECT_TIMEOUT_SECONDS,
+    SNAPSHOT_MAX_QUOTE_AGE_SECONDS,
+)
+from services import metrics
+from services.coin_universe import coin_universe
+from services.market_snapshot import SnapshotWriter
+from services.price_fetcher import get_price_data_for_exchange
+from services.quote_index import QuoteIndex
+from utils.registry import EXCHANGE_BITS
+
+log = logging.getLogger(__name__)
+
+class MarketCollector:
+    def __init__(self, writer: SnapshotWriter, coins: Optional[Iterable[str]] = None, exchanges: Iterable[str] = ALL_EXCHANGES):
+        self.writer = writer
+        # Без явного списка коллектор следует за вселенной монет (обновляется в фоне)
+        self.follow_universe = coins is None
+        self.coins = list(dict.fromkeys(coins)) if coins is not None else []
+        self.exchanges = list(exchanges)
+        self.quote_index = QuoteIndex()
+        self._universe_version = None
+        # (exchange, coin) -> (ts, price, bid, ask)
+        self.latest: dict[tuple[str, str], tuple[float, float, float, float]] = {}
+        self.stats = {"cycles": 0, "requests": 0, "quotes": 0, "errors": 0, "last_cycle_seconds": 0.0}
+        self.seq = 0
+        # Биржа -> незавершённый опрос всех её монет (переживает границу цикла)
+        self._sweeps: dict[str, asyncio.Task] = {}
+        self._semaphores = {
+            name: asyncio.Semaphore(MARKET_COLLECT_CONCURRENCY.get(name, MARKET_COLLECT_DEFAULT_CONCURRENCY))
+            for name in self.exchanges
+        }
+
+    async def _fetch(self, session: aiohttp.ClientSession, exchange: str, coin: str):
+        async with self._semaphores[exchange]:
+            self.stats["requests"] += 1
+            try:
+                data = await asyncio.wait_for(
+                    get_price_data_for_exchange(session, exchange, coin),
+                    timeout=MARKET_COLLECT_TIMEOUT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                metrics.exchange_timeouts.labels(exchange).inc()
+                self.stats["errors"] += 1
+                return
+            except Exception:
+                self.stats["errors"] += 1
+                return
+        if data and data.get("price"):
+            self.latest[(exchange, coin)] = (time.time(), data["price"], data.get("bid") or data["price"], data.get("ask") or data["price"])
+            self.quote_index.mark_quoted(coin, exchange)
+            self.stats["quotes"] += 1
+        elif coin_universe.is_unlisted(coin, exchange):
+            self.quote_index.mark_unlisted(coin, exchange)
+
+    async def _sweep_exchange(self, session: aiohttp.ClientSession, exchange: str, coins: list[str]):
+        """Опрашивает одну биржу по всем монетам, которые она листингует"""
+        bit = EXCHANGE_BITS.get(exchange, 0)
+        await asyncio.gather(*(
+            self._fetch(session, exchange, coin) for coin in coins if self.quote_index.mask(coin) & bit
+        ))
+
+    def publish(self) -> int:
+        """Публикует снимок из последних котировок (устаревшие выбрасываются)"""
+        now = time.time()
+        for key in [key for key, quote in self.latest.items() if now - quote[0] > SNAPSHOT_MAX_QUOTE_AGE_SECONDS * 6]:
+            del self.latest[key]
+        self.seq = self.writer.publish(
+            (exchange, coin, ts, price, bid, ask)
+            for (exchange, coin), (ts, price, bid, ask) in self.latest.items()
+        )
+        return self.seq
+
+    async def collect_once(
+        self,
+        session: aiohttp.ClientSession,
+        max_seconds: float = MARKET_COLLECT_CYCLE_SECONDS,
+        publish_interval: float = MARKET_COLLECT_PUBLISH_SECONDS,
+    ) -> int:
+        """
+        Один цикл опроса. Снимок публикуется после ответа каждой биржи и не реже
+        publish_interval, пока пришли новые котировки. Цикл заканчивается, когда
+        ответили все биржи или прошло max_seconds; незавершённые опросы не
+        отменяются и не перезапускаются следующим циклом.
+
+        Returns:
+            seq последнего опубликованного снимка
+        """
+        started = time.perf_counter()
+        if self.follow_universe and self._universe_version != coin_universe.updated_at:
+            self._universe_version = coin_universe.updated_at
+            self.coins = coin_universe.coins
+            coin_universe.seed(self.quote_index)
+        coins = list(self.coins)
+        for exchange in self.exchanges:
+            if exchange not in self._sweeps:
+                self._sweeps[exchange] = asyncio.ensure_future(self._sweep_exchange(session, exchange, coins))
+
+        deadline = time.monotonic() + max_seconds
+        # None - в этом цикле снимок ещё не публиковался
+        published_quotes = None
+        while self._sweeps:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = await asyncio.wait(
+                self._sweeps.values(), timeout=min(publish_interval, remaining), return_when=asyncio.FIRST_COMPLETED
+            )
+            for exchange in [exchange for exchange, task in self._sweeps.items() if task in done]:
+                task = self._sweeps.pop(exchange)
+                if not task.cancelled() and task.exception() is not None:
+                    log.error("Ошибка опроса %s", exchange, exc_info=task.exception())
+            if self.stats["quotes"] != published_quotes:
+                published_quotes = self.stats["quotes"]
+                self.publish()
+        if self.stats["quotes"] != published_quotes:
+            self.publish()
+        self.stats["cycles"] += 1
+        self.stats["last_cycle_seconds"] = time.perf_counter() - started
+        return self.seq
+
+    async def run(self, interval: float = MARKET_COLLECT_INTERVAL_SECONDS):
+        async with aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()]) as session:
+            try:
+                while True:
+                    started = time.monotonic()
+                    try:
+                        seq = await self.collect_once(session)
+                        log.info(
+                            "Снимок #%d: котировок %d, цикл %.2f с, в фоне бирж %d, ошибок всего %d",
+                            seq, len(self.latest), self.stats["last_cycle_seconds"], len(self._sweeps), self.stats["errors"],
+                        )
+                    except Exception:
+                        log.exception("Ошибка цикла сбора данных")
+                    await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+            finally:
+                for task in self._sweeps.values():
+                    task.cancel()
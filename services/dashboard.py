@@ -0,0 +1,180 @@
+"""
+Live-сообщение со спредами (опционально, настройка live_dashboard)
+
+Вместо потока уведомлений пользователь получает одно закреплённое сообщение
+с его лучшими открытыми возможностями. Проверка спредов только обновляет
+записи в памяти, фоновая задача правит сообщение не чаще DASHBOARD_EDIT_INTERVAL_SECONDS
+и пропускает правку, если отрендеренное содержимое не изменилось (по хэшу).
+"""
+import asyncio
+import logging
+import time
+import zlib
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from config import (
+    DASHBOARD_EDIT_INTERVAL_SECONDS,
+    DASHBOARD_TICK_SECONDS,
+    DASHBOARD_TOP_N,
+    DASHBOARD_ENTRY_TTL_SECONDS,
+)
+from models import mark_dirty, user_settings
+from services.notifier import notifier
+
+log = logging.getLogger(__name__)
+
+
+class LiveDashboard:
+    def __init__(
+        self,
+        edit_interval: float = DASHBOARD_EDIT_INTERVAL_SECONDS,
+        top_n: int = DASHBOARD_TOP_N,
+        entry_ttl: float = DASHBOARD_ENTRY_TTL_SECONDS,
+    ):
+        self.edit_interval = edit_interval
+        self.top_n = top_n
+        self.entry_ttl = entry_ttl
+        self.stats = {"sent": 0, "edits": 0, "unchanged": 0, "errors": 0}
+        # user_id -> {(coin, long, short): (спред %, профит $, время обновления)}
+        self._entries: dict[int, dict[tuple[str, str, str], tuple[float, float, float]]] = {}
+        self._dirty: set[int] = set()
+        self._last_hash: dict[int, int] = {}
+        self._next_edit_at: dict[int, float] = {}
+
+    # ---------- Обновления из проверки спредов (синхронно) ----------
+
+    def update(self, user_id: int, coin: str, long_exchange: str, short_exchange: str,
+               spread_percent: float, profit: float, now: Optional[float] = None):
+        entries = self._entries.get(user_id)
+        if entries is None:
+            entries = self._entries[user_id] = {}
+        entries[(coin, long_exchange, short_exchange)] = (spread_percent, profit, now or time.time())
+        self._dirty.add(user_id)
+
+    def discard(self, user_id: int, coin: str, long_exchange: str, short_exchange: str):
+        entries = self._entries.get(user_id)
+        if entries and entries.pop((coin, long_exchange, short_exchange), None) is not None:
+            self._dirty.add(user_id)
+
+    def activate(self, user_id: int):
+        """Режим включён: сообщение появится на ближайшем тике, даже без возможностей"""
+        self._dirty.add(user_id)
+
+    def reset(self, user_id: int):
+        """Забывает состояние пользователя (режим выключен)"""
+        self._entries.pop(user_id, None)
+        self._dirty.discard(user_id)
+        self._last_hash.pop(user_id, None)
+        self._next_edit_at.pop(user_id, None)
+
+    # ---------- Рендеринг ----------
+
+    def render_body(self, user_id: int, now: float) -> str:
+        entries = self._entries.get(user_id) or {}
+        # Записи, которые давно не подтверждались проверкой, не показываем
+        for key in [key for key, (_, _, updated_at) in entries.items() if now - updated_at > self.entry_ttl]:
+            del entries[key]
+        if not entries:
+            self._entries.pop(user_id, None)
+            return "Открытых возможностей сейчас нет."
+
+        top = sorted(entries.items(), key=lambda item: item[1][0], reverse=True)[:self.top_n]
+        lines = [
+            f"{place}. {coin}: {long_exchange} → {short_exchange} — {spread:.2f}% (профит {profit:.2f}$)"
+            for place, ((coin, long_exchange, short_exchange), (spread, profit, _)) in enumerate(top, 1)
+        ]
+        if len(entries) > len(top):
+            lines.append(f"… и ещё {len(entries) - len(top)}")
+        return "\n".join(lines)
+
+    # ---------- Доставка ----------
+
+    async def run(self, bot, tick: float = DASHBOARD_TICK_SECONDS):
+        """Фоновая задача: правит live-сообщения пользователей с изменениями"""
+        while True:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            # Пользователи с записями проверяются и без изменений: устаревшие записи должны исчезнуть
+            for user_id in list(self._dirty.union(self._entries)):
+                if self._next_edit_at.get(user_id, 0.0) > now:
+                    continue
+                self._dirty.discard(user_id)
+                try:
+                    await self._publish(bot, user_id)
+                except Exception:
+                    self.stats["errors"] += 1
+                    log.exception("Ошибка обновления live-сообщения %s", user_id)
+
+    async def _publish(self, bot, user_id: int):
+        s = user_settings.get(user_id)
+        if s is None or not s.live_dashboard:
+            self.reset(user_id)
+            return
+
+        body = self.render_body(user_id, time.time())
+        body_hash = zlib.crc32(body.encode())
+        if self._last_hash.get(user_id) == body_hash and s.dashboard_message_id:
+            self.stats["unchanged"] += 1
+            return
+
+        text = f"📌 Live-спреды (обновлено {time.strftime('%H:%M:%S')})\n\n{body}"
+        self._next_edit_at[user_id] = time.monotonic() + self.edit_interval
+        await notifier.acquire()
+        try:
+            if s.dashboard_message_id:
+                await bot.edit_message_text(
+                    text=text,
+                    chat_id=user_id,
+                    message_id=s.dashboard_message_id,
+                    disable_web_page_preview=True,
+                )
+                self.stats["edits"] += 1
+            else:
+                msg = await bot.send_message(user_id, text, disable_notification=True, disable_web_page_preview=True)
+                s.dashboard_message_id = msg.message_id
+                mark_dirty(user_id)
+                self.stats["sent"] += 1
+                try:
+                    await bot.pin_chat_message(user_id, msg.message_id, disable_notification=True)
+                except TelegramBadRequest as e:
+                    log.warning("Не удалось закрепить live-сообщение %s: %s", user_id, e)
+        except TelegramRetryAfter as e:
+            self._next_edit_at[user_id] = time.monotonic() + e.retry_after
+            self._dirty.add(user_id)
+            return
+        except TelegramForbiddenError:
+            # Пользователь заблокировал бота
+            self.reset(user_id)
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                self._last_hash[user_id] = body_hash
+                return
+            # Сообщение удалено пользователем - отправим новое на следующем тике
+            log.info("Live-сообщение %s недоступно, создаём заново: %s", user_id, e)
+            s.dashboard_message_id = None
+            mark_dirty(user_id)
+            self._next_edit_at.pop(user_id, None)
+            self._dirty.add(user_id)
+            return
+        self._last_hash[user_id] = body_hash
+
+    async def disable(self, bot, user_id: int):
+        """Выключение режима: открепляет сообщение и забывает состояние"""
+        s = user_settings.get(user_id)
+        self.reset(user_id)
+        if s is None or not s.dashboard_message_id:
+            return
+        message_id = s.dashboard_message_id
+        s.dashboard_message_id = None
+        mark_dirty(user_id)
+        try:
+            await bot.unpin_chat_message(user_id, message_id=message_id)
+        except (TelegramBadRequest, TelegramForbiddenError) as e:
+            log.warning("Не удалось открепить live-сообщение %s: %s", user_id, e)
+
+
+# Глобальные live-сообщения пользователей
+live_dashboard = LiveDashboard()
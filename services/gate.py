@@ -2,9 +2,15 @@
 Gate.io API - получение цен
 Документация: https://www.gate.io/docs/developers/apiv4/
 """
+import logging
+
 import aiohttp
 from typing import Optional
 
+from config import ALL_EXCHANGES
+
+log = logging.getLogger(__name__)
+
 
 async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[float]:
     """
@@ -18,12 +24,34 @@ async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[flo
         Цена в USDT или None при ошибке
     """
     try:
-        url = f"https://api.gateio.ws/api/v4/futures/usdt/tickers?contract={symbol}_USDT"
+        url = f"{ALL_EXCHANGES['Gate']['api_base']}/api/v4/futures/usdt/tickers?contract={symbol}_USDT"
         async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
             if response.status == 200:
                 data = await response.json()
                 if data and len(data) > 0:
                     return float(data[0]["last"])
-    except Exception as e:
-        print(f"Ошибка получения цены с Gate.io для {symbol}: {e}")
+    except Exception:
+        log.warning("Ошибка получения цены %s", symbol, exc_info=True)
+    return None
+
+
+async def get_instruments(session: aiohttp.ClientSession) -> Optional[set[str]]:
+    """
+    Тикеры USDT-фьючерсов Gate.io (без контрактов в делистинге)
+
+    Returns:
+        Множество тикеров (например, {"BTC", "ETH"}) или None при ошибке
+    """
+    try:
+        url = f"{ALL_EXCHANGES['Gate']['api_base']}/api/v4/futures/usdt/contracts"
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status == 200:
+                data = await response.json()
+                return {
+                    item["name"].removesuffix("_USDT")
+                    for item in data
+                    if item.get("name", "").endswith("_USDT") and not item.get("in_delisting")
+                }
+    except Exception:
+        log.warning("Ошибка получения списка инструментов", exc_info=True)
     return None
@@ -3,9 +3,14 @@ Hibachi API - получение цен с bid/ask
 """
 import aiohttp
 import asyncio
+import logging
 from typing import Optional, Dict
 from datetime import datetime, timedelta
 
+from config import ALL_EXCHANGES
+
+log = logging.getLogger(__name__)
+
 # Кэш для хранения цен и времени последнего запроса
 _price_cache = {}
 _last_request_time = {}
@@ -41,7 +46,7 @@ async def get_price_data(session: aiohttp.ClientSession, symbol: str) -> Optiona
         # Пробуем только основной формат (остальные редко работают)
         symbol_formatted = f"{symbol}/USDT-P"
         
-        url = "https://data-api.hibachi.xyz/market/data/prices"
+        url = f"{ALL_EXCHANGES['Hibachi']['api_base']}/market/data/prices"
         params = {"symbol": symbol_formatted}
         headers = {
             "User-Agent": "TelegramBot/1.0",
@@ -51,7 +56,7 @@ async def get_price_data(session: aiohttp.ClientSession, symbol: str) -> Optiona
         async with session.get(url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
             # Если получили 429, просто возвращаем None (не ждём)
             if response.status == 429:
-                print(f"DEBUG Hibachi: ⚠️ Rate limit для {symbol}, пропускаем")
+                log.debug("Rate limit для %s, пропускаем", symbol)
                 return None
             
             if response.status == 200:
@@ -105,9 +110,32 @@ async def get_price_data(session: aiohttp.ClientSession, symbol: str) -> Optiona
                 return None
         
     except asyncio.TimeoutError:
-        print(f"DEBUG Hibachi: ⚠️ Timeout для {symbol}, пропускаем")
+        log.debug("Timeout для %s, пропускаем", symbol)
         return None
-    except Exception as e:
-        print(f"DEBUG Hibachi: ❌ Ошибка для {symbol}: {e}")
+    except Exception:
+        log.warning("Ошибка получения цены %s", symbol, exc_info=True)
     
     return None
+
+
+async def get_instruments(session: aiohttp.ClientSession) -> Optional[set[str]]:
+    """
+    Тикеры перпетуалов Hibachi (формат символа "BTC/USDT-P")
+
+    Returns:
+        Множество тикеров (например, {"BTC", "ETH"}) или None при ошибке
+    """
+    try:
+        url = f"{ALL_EXCHANGES['Hibachi']['api_base']}/market/exchange-info"
+        headers = {"User-Agent": "TelegramBot/1.0", "Accept": "application/json"}
+        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status == 200:
+                data = await response.json()
+                return {
+                    item["symbol"].split("/")[0]
+                    for item in data.get("futureContracts", [])
+                    if item.get("symbol", "").endswith("/USDT-P") and item.get("status", "LIVE") == "LIVE"
+                }
+    except Exception:
+        log.warning("Ошибка получения списка инструментов", exc_info=True)
+    return None
@@ -2,9 +2,13 @@
 Hyperliquid API - получение цен с bid/ask через официальный SDK
 """
 import asyncio
+import logging
 from typing import Optional, Dict
 from hyperliquid.info import Info
-from hyperliquid.utils import constants
+
+from config import ALL_EXCHANGES
+
+log = logging.getLogger(__name__)
 
 # Создаём один экземпляр Info для переиспользования
 _info_instance = None
@@ -13,7 +17,7 @@ def get_info_instance():
     """Получает или создаёт экземпляр Info"""
     global _info_instance
     if _info_instance is None:
-        _info_instance = Info(constants.MAINNET_API_URL, skip_ws=True)
+        _info_instance = Info(ALL_EXCHANGES["Hyperliquid"]["api_base"], skip_ws=True)
     return _info_instance
 
 
@@ -36,7 +40,7 @@ async def get_price_data(session, symbol: str) -> Optional[Dict[str, float]]:
         all_mids = await asyncio.to_thread(info.all_mids)
         
         if not all_mids or not isinstance(all_mids, dict):
-            print(f"DEBUG Hyperliquid: all_mids вернул неожиданный формат")
+            log.warning("all_mids вернул неожиданный формат: %s", type(all_mids).__name__)
             return None
         
         # ИСПРАВЛЕНИЕ: Ищем точное совпадение или стандартные форматы
@@ -63,14 +67,14 @@ async def get_price_data(session, symbol: str) -> Optional[Dict[str, float]]:
                         price = float(value)
                     if price:
                         found_key = key
-                        print(f"DEBUG Hyperliquid: ✅ Найден точный ключ '{key}' = {price}")
+                        log.debug("%s: найден точный ключ %r = %s", symbol_upper, key, price)
                         break
                 except (ValueError, TypeError):
                     continue
         
         # Если точного совпадения нет, ищем частичное (но с проверкой на разумность)
         if price is None:
-            print(f"DEBUG Hyperliquid: Точного совпадения нет, ищем частичное для '{symbol_upper}'...")
+            log.debug("%s: точного совпадения нет, ищем частичное", symbol_upper)
             for key, value in all_mids.items():
                 # Ищем ключ, который начинается с символа или содержит его как отдельное слово
                 key_upper = key.upper()
@@ -90,19 +94,18 @@ async def get_price_data(session, symbol: str) -> Optional[Dict[str, float]]:
                         if 0.1 <= candidate_price <= 1000000:
                             price = candidate_price
                             found_key = key
-                            print(f"DEBUG Hyperliquid: ✅ Найден ключ '{key}' = {price} (прошёл проверку на разумность)")
+                            log.debug("%s: найден ключ %r = %s (прошёл проверку на разумность)", symbol_upper, key, price)
                             break
                         else:
-                            print(f"DEBUG Hyperliquid: ⚠️ Ключ '{key}' = {candidate_price} не прошёл проверку на разумность")
+                            log.debug("%s: ключ %r = %s не прошёл проверку на разумность", symbol_upper, key, candidate_price)
                     except (ValueError, TypeError):
                         continue
         
         if price is None:
-            print(f"DEBUG Hyperliquid: ⚠️ Символ '{symbol_upper}' не найден или цена не прошла проверку")
-            # Выводим первые несколько ключей для отладки
-            sample_keys = [k for k in list(all_mids.keys())[:20] if symbol_upper in k.upper()]
-            if sample_keys:
-                print(f"DEBUG Hyperliquid: Похожие ключи: {sample_keys}")
+            # Похожие ключи считаем только при включённом DEBUG
+            if log.isEnabledFor(logging.DEBUG):
+                sample_keys = [k for k in list(all_mids.keys())[:20] if symbol_upper in k.upper()]
+                log.debug("%s: символ не найден или цена не прошла проверку, похожие ключи: %s", symbol_upper, sample_keys)
             return None
         
         # Получаем bid/ask (упрощённо, так как orderbook может быть недоступен)
@@ -112,12 +115,24 @@ async def get_price_data(session, symbol: str) -> Optional[Dict[str, float]]:
             "ask": price * 1.0001   # Приблизительный ask (на 0.01% выше)
         }
         
-        print(f"DEBUG Hyperliquid: ✅ Получена цена через SDK: {result}")
         return result
         
-    except Exception as e:
-        print(f"DEBUG Hyperliquid: ❌ ИСКЛЮЧЕНИЕ для {symbol}: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.warning("Ошибка получения цены %s", symbol, exc_info=True)
     
     return None
+
+
+async def get_instruments(session) -> Optional[set[str]]:
+    """
+    Тикеры перпетуалов Hyperliquid (без делистингованных)
+
+    Returns:
+        Множество тикеров (например, {"BTC", "ETH"}) или None при ошибке
+    """
+    try:
+        meta = await asyncio.to_thread(get_info_instance().meta)
+        return {item["name"] for item in meta.get("universe", []) if not item.get("isDelisted")}
+    except Exception:
+        log.warning("Ошибка получения списка инструментов", exc_info=True)
+    return None
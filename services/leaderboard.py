@@ -0,0 +1,149 @@
+"""
+Лучшие текущие спреды по всем монетам и парам бирж (/top)
+
+Проверка спредов после каждой оценки монеты передаёт все её пары (record): каждая
+пара (монета, лонг, шорт) хранится с чистым спредом после комиссий, а пары тех же
+бирж, которых в оценке больше нет (спред развернулся), удаляются. Одинаковые
+котировки монеты (общий снимок у многих пользователей) ранжируются один раз.
+Записи хранятся в списке, отсортированном по
+убыванию чистого спреда, не больше capacity: обновление - бинарный поиск и
+вставка, худшая запись вытесняется. Команда только проходит по списку
+(O(K)) и отбирает пары на биржах пользователя - без сортировки и без проверки рынка.
+"""
+import time
+from bisect import bisect_left, insort
+from typing import Optional
+
+from config import TOP_CAPACITY, TOP_ENTRY_TTL_SECONDS
+from services.profit_calculator import rank_pairs
+from utils.registry import EXCHANGE_BITS
+
+
+class Leaderboard:
+    def __init__(self, capacity: int = TOP_CAPACITY, entry_ttl: float = TOP_ENTRY_TTL_SECONDS):
+        self.capacity = capacity
+        self.entry_ttl = entry_ttl
+        # (-чистый спред, ключ) по возрастанию - лучшие первыми
+        self._order: list[tuple[float, tuple[str, str, str]]] = []
+        # (монета, лонг, шорт) -> (чистый спред %, спред %, цена лонга, цена шорта, маска пары, время)
+        self._entries: dict[tuple[str, str, str], tuple[float, float, float, float, int, float]] = {}
+        # Монета -> её ключи в таблице
+        self._by_coin: dict[str, set[tuple[str, str, str]]] = {}
+        # Монета -> котировки последней переданной оценки (повтор не ранжируется заново)
+        self._last_quotes: dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def update(self, coin: str, long_exchange: str, short_exchange: str, net_spread: float, spread_percent: float,
+               long_price: float, short_price: float, now: Optional[float] = None):
+        key = (coin, long_exchange, short_exchange)
+        item = (-net_spread, key)
+        old = self._entries.get(key)
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old[0], key))]
+        elif len(self._order) >= self.capacity:
+            if item >= self._order[-1]:
+                return
+            _, evicted = self._order.pop()
+            self._forget(evicted)
+        insort(self._order, item)
+        pair_mask = EXCHANGE_BITS.get(long_exchange, 0) | EXCHANGE_BITS.get(short_exchange, 0)
+        self._entries[key] = (net_spread, spread_percent, long_price, short_price, pair_mask, now or time.time())
+        self._by_coin.setdefault(coin, set()).add(key)
+
+    def record(self, coin: str, prices_data: dict, position_size_usd: float, leverage: float, now: Optional[float] = None):
+        """
+        Все пары монеты из одной оценки (prices_data в формате проверки спредов)
+
+        Пары, обе биржи которых есть в prices_data, но которых нет среди пар
+        оценки (лонг больше не дешевле шорта), удаляются из таблицы.
+        """
+        quotes = tuple(sorted((exchange, data.get("price", 0)) for exchange, data in prices_data.items()))
+        if self._last_quotes.get(coin) == quotes:
+            return
+        self._last_quotes[coin] = quotes
+
+        # Чистый спред считается в процентах номинала - от объёма и плеча не зависит
+        pairs = rank_pairs(prices_data, position_size_usd, leverage, len(prices_data) ** 2)
+        seen = set()
+        for pair in pairs:
+            self.update(
+                coin, pair["long"], pair["short"], pair["net_spread"], pair["spread_percent"],
+                pair["long_price"], pair["short_price"], now,
+            )
+            seen.add((coin, pair["long"], pair["short"]))
+
+        evaluated_mask = 0
+        for exchange in prices_data:
+            evaluated_mask |= EXCHANGE_BITS.get(exchange, 0)
+        for key in self._by_coin.get(coin, set()) - seen:
+            pair_mask = self._entries[key][4]
+            if pair_mask & evaluated_mask == pair_mask:
+                self._remove(key)
+
+    def _remove(self, key: tuple[str, str, str]):
+        del self._order[bisect_left(self._order, (-self._entries[key][0], key))]
+        self._forget(key)
+
+    def _forget(self, key: tuple[str, str, str]):
+        del self._entries[key]
+        keys = self._by_coin[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_coin[key[0]]
+
+    def sweep(self, now: Optional[float] = None):
+        """Удаляет записи без обновления дольше entry_ttl (монету перестали проверять)"""
+        deadline = (now or time.time()) - self.entry_ttl
+        stale = [key for key, entry in self._entries.items() if entry[5] < deadline]
+        if not stale:
+            return
+        for key in stale:
+            self._forget(key)
+        # Удалённые пары вернутся даже при тех же котировках
+        self._last_quotes.clear()
+        self._order = [item for item in self._order if item[1] in self._entries]
+
+    def top(self, exchange_mask: int, limit: int, now: Optional[float] = None) -> list[dict]:
+        """До limit лучших свежих пар, обе биржи которых входят в exchange_mask"""
+        deadline = (now or time.time()) - self.entry_ttl
+        result = []
+        for _, key in self._order:
+            net_spread, spread_percent, long_price, short_price, pair_mask, ts = self._entries[key]
+            if ts < deadline or pair_mask & exchange_mask != pair_mask:
+                continue
+            result.append({
+                "coin": key[0],
+                "long": key[1],
+                "short": key[2],
+                "net_spread": net_spread,
+                "spread_percent": spread_percent,
+                "long_price": long_price,
+                "short_price": short_price,
+                "ts": ts,
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+    def dump_state(self) -> list[list]:
+        """Записи для снимка: [монета, лонг, шорт, чистый спред, спред, цена лонга, цена шорта, время]"""
+        return [
+            [*key, net_spread, spread_percent, long_price, short_price, ts]
+            for key, (net_spread, spread_percent, long_price, short_price, _, ts) in self._entries.items()
+        ]
+
+    def load_state(self, rows: list[list], now: Optional[float] = None) -> int:
+        """Восстанавливает записи моложе entry_ttl"""
+        deadline = (now or time.time()) - self.entry_ttl
+        restored = 0
+        for coin, long_exchange, short_exchange, net_spread, spread_percent, long_price, short_price, ts in rows:
+            if ts >= deadline:
+                self.update(coin, long_exchange, short_exchange, net_spread, spread_percent, long_price, short_price, ts)
+                restored += 1
+        return restored
+
+
+# Глобальная таблица лучших спредов; обновляется фоновой проверкой
+leaderboard = Leaderboard()
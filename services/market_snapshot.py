@@ -0,0 +1,213 @@
+"""
+Снимки рыночных данных в разделяемой памяти (коллектор -> процессы бота)
+
+Коллектор (collector.py) опрашивает биржи и публикует снимок всех котировок
+в файл, отображённый в память (по умолчанию в /dev/shm). Процессы бота читают
+последний снимок без сети и без разбора JSON.
+
+Формат файла - кольцо из SNAPSHOT_SLOTS слотов фиксированного размера:
+    заголовок: magic, версия, слотов, ёмкость слота, seq последнего снимка
+    слот:      seq, время публикации, число записей, записи
+    запись:    тикер (16 байт ASCII), индекс биржи, ts, price, bid, ask
+
+Писатель один: обнуляет seq слота, пишет записи, выставляет seq слота и
+затем seq в заголовке. Читатель копирует слот и проверяет, что seq слота
+не изменился за время копирования (иначе повторяет) - без блокировок.
+"""
+import mmap
+import os
+import struct
+import time
+from typing import Iterable, Optional
+
+from config import SNAPSHOT_SLOTS, SNAPSHOT_MAX_QUOTES, SNAPSHOT_MAX_QUOTE_AGE_SECONDS
+from utils.registry import EXCHANGE_NAMES
+
+MAGIC = b"ARBSNAP1"
+VERSION = 1
+
+HEADER = struct.Struct("<8sIIIQ")
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QdI4x")
+RECORD = struct.Struct("<16sBdddd")
+
+_EXCHANGE_INDEX = {name: index for index, name in enumerate(EXCHANGE_NAMES)}
+
+
+def _slot_size(max_quotes: int) -> int:
+    return SLOT_HEADER.size + RECORD.size * max_quotes
+
+
+class SnapshotWriter:
+    def __init__(self, path: str, slots: int = SNAPSHOT_SLOTS, max_quotes: int = SNAPSHOT_MAX_QUOTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.slots = slots
+        self.max_quotes = max_quotes
+        self.slot_size = _slot_size(max_quotes)
+        size = HEADER_SIZE + self.slot_size * slots
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        # Продолжаем нумерацию, если файл остался от прошлого запуска с тем же форматом
+        magic, version, old_slots, old_max, seq = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or old_slots != slots or old_max != max_quotes:
+            seq = 0
+        self.seq = seq
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, slots, max_quotes, seq)
+
+    def publish(self, quotes: Iterable[tuple[str, str, float, float, float, float]], now: Optional[float] = None) -> int:
+        """
+        Публикует снимок
+
+        Args:
+            quotes: (exchange, coin, ts, price, bid, ask); лишние сверх ёмкости отбрасываются
+
+        Returns:
+            seq опубликованного снимка
+        """
+        seq = self.seq + 1
+        offset = HEADER_SIZE + (seq % self.slots) * self.slot_size
+        mm = self._mm
+        SLOT_HEADER.pack_into(mm, offset, 0, 0.0, 0)
+
+        count = 0
+        position = offset + SLOT_HEADER.size
+        for exchange, coin, ts, price, bid, ask in quotes:
+            index = _EXCHANGE_INDEX.get(exchange)
+            encoded = coin.encode("ascii", "ignore")
+            if index is None or len(encoded) > 16:
+                continue
+            if count >= self.max_quotes:
+                break
+            RECORD.pack_into(mm, position, encoded, index, ts, price, bid, ask)
+            position += RECORD.size
+            count += 1
+
+        SLOT_HEADER.pack_into(mm, offset, seq, now or time.time(), count)
+        HEADER.pack_into(mm, 0, MAGIC, VERSION, self.slots, self.max_quotes, seq)
+        self.seq = seq
+        return seq
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+
+class MarketSnapshot:
+    """Декодированный снимок: coin -> exchange -> {"price", "bid", "ask", "ts"}"""
+
+    __slots__ = ("seq", "published_at", "quotes")
+
+    def __init__(self, seq: int, published_at: float, quotes: dict[str, dict[str, dict]]):
+        self.seq = seq
+        self.published_at = published_at
+        self.quotes = quotes
+
+    def __len__(self) -> int:
+        return sum(len(by_exchange) for by_exchange in self.quotes.values())
+
+    def prices(
+        self,
+        coin: str,
+        exchanges: Iterable[str],
+        now: Optional[float] = None,
+        max_age: float = SNAPSHOT_MAX_QUOTE_AGE_SECONDS,
+    ) -> dict[str, dict]:
+        """Свежие котировки монеты на указанных биржах (формат prices_data проверки спредов)"""
+        by_exchange = self.quotes.get(coin)
+        if not by_exchange:
+            return {}
+        now = now or time.time()
+        result = {}
+        for exchange in exchanges:
+            data = by_exchange.get(exchange)
+            if data is not None and now - data["ts"] <= max_age:
+                result[exchange] = data
+        return result
+
+
+class SnapshotReader:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._mm: Optional[mmap.mmap] = None
+        self._slots = 0
+        self._slot_size = 0
+        self._cached: Optional[MarketSnapshot] = None
+        self._next_attempt = 0.0
+        self.retries = 0
+
+    @property
+    def attached(self) -> bool:
+        """Задан ли источник снимков (файл коллектора может ещё не существовать)"""
+        return self.path is not None
+
+    def attach(self, path: str):
+        self.path = path
+        self._mm = None
+        self._cached = None
+
+    def _open(self) -> bool:
+        if self._mm is not None:
+            return True
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        self._next_attempt = now + 1.0
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+        magic, version, slots, max_quotes, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            return False
+        self._mm = mm
+        self._slots = slots
+        self._slot_size = _slot_size(max_quotes)
+        return True
+
+    def latest(self) -> Optional[MarketSnapshot]:
+        """Последний опубликованный снимок (декодируется один раз на seq)"""
+        if self.path is None or not self._open():
+            return None
+        mm = self._mm
+        for _ in range(5):
+            seq = HEADER.unpack_from(mm, 0)[4]
+            if seq == 0:
+                return None
+            if self._cached is not None and self._cached.seq == seq:
+                return self._cached
+            offset = HEADER_SIZE + (seq % self._slots) * self._slot_size
+            slot_seq, published_at, count = SLOT_HEADER.unpack_from(mm, offset)
+            if slot_seq != seq:
+                self.retries += 1
+                continue
+            start = offset + SLOT_HEADER.size
+            raw = mm[start:start + count * RECORD.size]
+            # Писатель успел переписать слот во время копирования - читаем заново
+            if SLOT_HEADER.unpack_from(mm, offset)[0] != seq:
+                self.retries += 1
+                continue
+            self._cached = MarketSnapshot(seq, published_at, _decode(raw))
+            return self._cached
+        return self._cached
+
+
+def _decode(raw: bytes) -> dict[str, dict[str, dict]]:
+    quotes: dict[str, dict[str, dict]] = {}
+    for coin, index, ts, price, bid, ask in RECORD.iter_unpack(raw):
+        coin = coin.rstrip(b"\0").decode("ascii")
+        by_exchange = quotes.get(coin)
+        if by_exchange is None:
+            by_exchange = quotes[coin] = {}
+        by_exchange[EXCHANGE_NAMES[index]] = {"price": price, "bid": bid, "ask": ask, "ts": ts}
+    return quotes
+
+
+# Источник снимков для проверки спредов; подключается в bot.py, если задан MARKET_SNAPSHOT_PATH
+market_feed = SnapshotReader()
@@ -0,0 +1,251 @@
+"""
+Метрики в формате Prometheus (text exposition) по локальному HTTP
+
+Все счётчики и гистограммы создаются при импорте; серии с метками бирж
+выделяются заранее (по реестру бирж), поэтому в горячем пути - только
+сложение и bisect по фиксированным границам, без аллокаций и блокировок.
+
+    GET http://127.0.0.1:{METRICS_PORT}/metrics
+"""
+import asyncio
+import bisect
+import logging
+import time
+from types import SimpleNamespace
+from typing import Callable, Iterable
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from config import ALL_EXCHANGES, METRICS_LATENCY_BUCKETS, METRICS_CYCLE_BUCKETS, METRICS_DELIVERY_BUCKETS, METRICS_LOOP_LAG_BUCKETS
+from services.opportunity_tracker import opportunity_tracker
+from utils.registry import EXCHANGE_NAMES
+
+log = logging.getLogger(__name__)
+
+_REGISTRY: list = []
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    """Метрика с фиксированным набором меток; серии создаются заранее"""
+
+    def __init__(self, kind: str, name: str, help_text: str, labelnames: tuple[str, ...], factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._factory = factory
+        self.series: dict[tuple[str, ...], object] = {}
+        _REGISTRY.append(self)
+
+    def labels(self, *values: str):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = self._factory()
+        return series
+
+    def preallocate(self, label_sets: Iterable[tuple[str, ...]]):
+        for values in label_sets:
+            self.labels(*values)
+        return self
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in self.series.items():
+            labels = dict(zip(self.labelnames, values))
+            if isinstance(series, Histogram):
+                cumulative = 0
+                for bound, count in zip(series.bounds + (float("inf"),), series.counts):
+                    cumulative += count
+                    bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series.sum)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series.count}")
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(series.value)}")
+        return lines
+
+
+class _Callback:
+    """Значение, которое считается в момент сбора (размер очереди, открытые возможности)"""
+
+    def __init__(self, kind: str, name: str, help_text: str, fn: Callable[[], float]):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        _REGISTRY.append(self)
+
+    def render(self) -> list[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {_format_value(value)}"]
+
+
+def counter(name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> _Family:
+    family = _Family("counter", name, help_text, labelnames, Counter)
+    if not labelnames:
+        family.labels()
+    return family
+
+
+def histogram(name: str, help_text: str, bounds: Iterable[float], labelnames: tuple[str, ...] = ()) -> _Family:
+    bounds = tuple(bounds)
+    family = _Family("histogram", name, help_text, labelnames, lambda: Histogram(bounds))
+    if not labelnames:
+        family.labels()
+    return family
+
+
+def gauge_callback(name: str, help_text: str, fn: Callable[[], float]) -> _Callback:
+    return _Callback("gauge", name, help_text, fn)
+
+
+def counter_callback(name: str, help_text: str, fn: Callable[[], float]) -> _Callback:
+    return _Callback("counter", name, help_text, fn)
+
+
+def render() -> str:
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Метрики бота ----------
+
+_EXCHANGES = [(name,) for name in EXCHANGE_NAMES]
+
+exchange_latency = histogram(
+    "arb_exchange_request_seconds", "Время получения котировки с биржи", METRICS_LATENCY_BUCKETS, ("exchange",)
+).preallocate(_EXCHANGES)
+exchange_quotes = counter(
+    "arb_exchange_quotes_total", "Запросы котировок по результату", ("exchange", "result")
+).preallocate((name, result) for (name,) in _EXCHANGES for result in ("ok", "empty", "error"))
+exchange_timeouts = counter("arb_exchange_timeouts_total", "Таймауты запросов к бирже", ("exchange",)).preallocate(_EXCHANGES)
+exchange_http_status = counter(
+    "arb_exchange_http_responses_total", "HTTP-ответы бирж по классу статуса", ("exchange", "status")
+).preallocate((name, status) for (name,) in _EXCHANGES for status in ("2xx", "429", "4xx", "5xx"))
+exchange_http_errors = counter(
+    "arb_exchange_http_errors_total", "Сетевые ошибки запросов к бирже", ("exchange",)
+).preallocate(_EXCHANGES)
+
+# Метрики без меток - сразу единственная серия
+scan_cycle = histogram("arb_scan_cycle_seconds", "Длительность цикла проверки спредов", METRICS_CYCLE_BUCKETS).labels()
+scan_coins = counter("arb_scan_coins_total", "Проверено монет (по всем пользователям)").labels()
+scan_cycle_coins = SimpleNamespace(value=0)
+gauge_callback("arb_scan_coins_last_cycle", "Проверено монет за последний цикл", lambda: scan_cycle_coins.value)
+
+opportunities_opened = counter("arb_opportunities_opened_total", "Открытые возможности (уведомления об открытии)").labels()
+opportunities_closed = counter("arb_opportunities_closed_total", "Закрытые возможности").labels()
+gauge_callback("arb_opportunities_open", "Открытые сейчас возможности", opportunity_tracker.open_count)
+
+tick_to_delivery = histogram(
+    "arb_alert_tick_to_delivery_seconds", "От получения котировки до доставки уведомления", METRICS_DELIVERY_BUCKETS
+).labels()
+loop_lag = histogram("arb_event_loop_lag_seconds", "Задержка event loop", METRICS_LOOP_LAG_BUCKETS).labels()
+
+
+# ---------- HTTP-трассировка запросов к биржам ----------
+
+# Хост API -> биржа (по api_base из конфига, с учётом переопределений окружением)
+_HOST_EXCHANGES = {urlsplit(exchange["api_base"]).hostname: name for name, exchange in ALL_EXCHANGES.items()}
+
+
+def _status_class(status: int) -> str:
+    if status == 429:
+        return "429"
+    if status < 300:
+        return "2xx"
+    return "5xx" if status >= 500 else "4xx"
+
+
+async def _on_request_end(session, context, params):
+    exchange = _HOST_EXCHANGES.get(params.url.host)
+    if exchange is not None:
+        exchange_http_status.labels(exchange, _status_class(params.response.status)).inc()
+
+
+async def _on_request_exception(session, context, params):
+    exchange = _HOST_EXCHANGES.get(params.url.host)
+    if exchange is not None:
+        exchange_http_errors.labels(exchange).inc()
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """TraceConfig для сессии: статусы ответов (в т.ч. 429) и сетевые ошибки по биржам"""
+    trace = aiohttp.TraceConfig()
+    trace.on_request_end.append(_on_request_end)
+    trace.on_request_exception.append(_on_request_exception)
+    return trace
+
+
+def register_host(host: str, exchange: str):
+    """Сопоставляет хост бирже (для переопределённых адресов API)"""
+    _HOST_EXCHANGES[host] = exchange
+
+
+# ---------- Фоновые задачи ----------
+
+
+async def monitor_loop_lag(interval: float = 0.5):
+    """Измеряет, насколько позже запланированного просыпается event loop"""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    asyncio.create_task(monitor_loop_lag())
+    log.info("Метрики: http://%s:%d/metrics", host, port)
+    return runner
@@ -2,9 +2,15 @@
 MEXC API - получение цен
 Документация: https://mexcdevelop.github.io/apidocs/spot_v3_en/
 """
+import logging
+
 import aiohttp
 from typing import Optional
 
+from config import ALL_EXCHANGES
+
+log = logging.getLogger(__name__)
+
 
 async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[float]:
     """
@@ -18,12 +24,34 @@ async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[flo
         Цена в USDT или None при ошибке
     """
     try:
-        url = f"https://api.mexc.com/api/v3/ticker/price?symbol={symbol}USDT"
+        url = f"{ALL_EXCHANGES['MEXC']['api_base']}/api/v3/ticker/price?symbol={symbol}USDT"
         async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
             if response.status == 200:
                 data = await response.json()
                 if "price" in data:
                     return float(data["price"])
-    except Exception as e:
-        print(f"Ошибка получения цены с MEXC для {symbol}: {e}")
+    except Exception:
+        log.warning("Ошибка получения цены %s", symbol, exc_info=True)
+    return None
+
+
+async def get_instruments(session: aiohttp.ClientSession) -> Optional[set[str]]:
+    """
+    Тикеры пар к USDT на MEXC (тот же эндпоинт цен, что и get_price, без symbol)
+
+    Returns:
+        Множество тикеров (например, {"BTC", "ETH"}) или None при ошибке
+    """
+    try:
+        url = f"{ALL_EXCHANGES['MEXC']['api_base']}/api/v3/ticker/price"
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status == 200:
+                data = await response.json()
+                return {
+                    item["symbol"].removesuffix("USDT")
+                    for item in data
+                    if item.get("symbol", "").endswith("USDT") and len(item["symbol"]) > 4
+                }
+    except Exception:
+        log.warning("Ошибка получения списка инструментов", exc_info=True)
     return None
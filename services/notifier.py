@@ -0,0 +1,306 @@
+"""
+Очередь исходящих уведомлений в Telegram
+
+Проверка спредов только кладёт сообщение в очередь (enqueue - синхронно, без await),
+доставкой занимаются фоновые воркеры:
+- приоритетная очередь чатов (алерты об открытии раньше уведомлений о закрытии),
+- token bucket на глобальный лимит (~30 сообщений/с) и интервал на чат (~1 сообщение/с),
+- TelegramRetryAfter: чат откладывается на retry_after, глобальные токены сбрасываются,
+- несколько алертов одному пользователю, накопившихся к моменту отправки,
+  склеиваются в одно сообщение (клавиатуры объединяются по строкам).
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from services import metrics
+from services.profiler import cycle_profiler, STAGE_DELIVER
+from config import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_CHAT_INTERVAL_SECONDS,
+    TELEGRAM_MESSAGE_LIMIT,
+    NOTIFY_MAX_PENDING_PER_CHAT,
+    NOTIFY_WORKERS,
+    NOTIFY_MAX_ATTEMPTS,
+)
+
+log = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_ALERT = 1
+PRIORITY_LOW = 2
+
+MERGE_SEPARATOR = "\n\n➖➖➖➖➖➖➖➖\n\n"
+MAX_KEYBOARD_ROWS = 100
+
+
+@dataclass
+class Notification:
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    priority: int = PRIORITY_ALERT
+    mergeable: bool = True
+    # Время котировки, по которой создано уведомление (для метрики задержки доставки)
+    origin_ts: Optional[float] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self):
+        """Сбрасывает накопленные токены (после 429 от Telegram)"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0.0)
+
+
+class NotificationQueue:
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_interval: float = TELEGRAM_CHAT_INTERVAL_SECONDS,
+        max_pending_per_chat: int = NOTIFY_MAX_PENDING_PER_CHAT,
+        workers: int = NOTIFY_WORKERS,
+    ):
+        self.chat_interval = chat_interval
+        self.max_pending_per_chat = max_pending_per_chat
+        self.workers = workers
+        self.bot = None
+        self.stats = {"enqueued": 0, "sent": 0, "messages": 0, "merged": 0, "dropped": 0, "retry_after": 0}
+        # Небольшой burst: за любое окно в 1 с уходит не больше ~1.1 × global_rate сообщений
+        self._bucket = TokenBucket(global_rate, capacity=max(1.0, global_rate / 10))
+        self._pending: dict[int, list[Notification]] = {}
+        # Готовые к отправке чаты: (приоритет, seq, chat_id)
+        self._ready: list[tuple[int, int, int]] = []
+        # Чаты, ждущие свой интервал: (время готовности, приоритет, seq, chat_id)
+        self._delayed: list[tuple[float, int, int, int]] = []
+        # Чаты, которые стоят в одной из куч или отправляются прямо сейчас
+        self._scheduled: set[int] = set()
+        self._chat_next_at: dict[int, float] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def set_global_rate(self, rate: float):
+        """Глобальный лимит процесса (воркеры шардов делят лимит бота между собой)"""
+        self._bucket = TokenBucket(rate, capacity=max(1.0, rate / 10))
+
+    # ---------- API для производителей (синхронно) ----------
+
+    def enqueue(
+        self,
+        chat_id: int,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        priority: int = PRIORITY_ALERT,
+        mergeable: bool = True,
+        origin_ts: Optional[float] = None,
+    ) -> bool:
+        """Ставит сообщение в очередь. False - очередь чата переполнена, сообщение отброшено."""
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            pending = self._pending[chat_id] = []
+        elif len(pending) >= self.max_pending_per_chat:
+            self.stats["dropped"] += 1
+            return False
+
+        pending.append(Notification(text, reply_markup, priority, mergeable, origin_ts))
+        self.stats["enqueued"] += 1
+        if chat_id not in self._scheduled:
+            self._schedule(chat_id, priority)
+        return True
+
+    async def acquire(self):
+        """Глобальный токен для запроса вне очереди (правка live-сообщения)"""
+        await self._bucket.acquire()
+
+    def pending_count(self) -> int:
+        return sum(len(items) for items in self._pending.values())
+
+    # ---------- Запуск ----------
+
+    def start(self, bot):
+        """Запускает воркеры доставки (вызывать из работающего event loop)"""
+        self.bot = bot
+        self._wakeup = asyncio.Event()
+        # Сообщения, поставленные до старта, уже лежат в кучах - будим воркеры
+        self._wakeup.set()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---------- Планирование ----------
+
+    def _schedule(self, chat_id: int, priority: int):
+        self._scheduled.add(chat_id)
+        ready_at = self._chat_next_at.get(chat_id, 0.0)
+        if ready_at <= time.monotonic():
+            heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._delayed, (ready_at, priority, next(self._seq), chat_id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _take_chat(self) -> int:
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, priority, seq, chat_id = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (priority, seq, chat_id))
+            if self._ready:
+                return heapq.heappop(self._ready)[2]
+
+            timeout = self._delayed[0][0] - now if self._delayed else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _take_batch(self, chat_id: int) -> list[Notification]:
+        """Забирает из очереди чата одно сообщение или несколько склеиваемых алертов"""
+        pending = self._pending.get(chat_id) or []
+        if not pending:
+            return []
+        batch = [pending[0]]
+        if pending[0].mergeable:
+            length = len(pending[0].text)
+            rows = len(pending[0].reply_markup.inline_keyboard) if pending[0].reply_markup else 0
+            for item in pending[1:]:
+                item_rows = len(item.reply_markup.inline_keyboard) if item.reply_markup else 0
+                if not item.mergeable:
+                    break
+                if length + len(MERGE_SEPARATOR) + len(item.text) > TELEGRAM_MESSAGE_LIMIT:
+                    break
+                if rows + item_rows > MAX_KEYBOARD_ROWS:
+                    break
+                batch.append(item)
+                length += len(MERGE_SEPARATOR) + len(item.text)
+                rows += item_rows
+        del pending[:len(batch)]
+        return batch
+
+    def _finish_chat(self, chat_id: int):
+        """После попытки отправки: перепланирует чат, если в очереди ещё что-то есть"""
+        self._scheduled.discard(chat_id)
+        pending = self._pending.get(chat_id)
+        if pending:
+            self._schedule(chat_id, min(item.priority for item in pending))
+        else:
+            self._pending.pop(chat_id, None)
+            # Интервал чата уже прошёл - запись не нужна
+            if self._chat_next_at.get(chat_id, 0.0) <= time.monotonic():
+                self._chat_next_at.pop(chat_id, None)
+
+    # ---------- Доставка ----------
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._take_chat()
+            try:
+                await self._bucket.acquire()
+                batch = self._take_batch(chat_id)
+                if batch:
+                    await self._deliver(chat_id, batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Ошибка воркера уведомлений")
+            finally:
+                self._finish_chat(chat_id)
+
+    async def _deliver(self, chat_id: int, batch: list[Notification]):
+        if len(batch) == 1:
+            text, reply_markup = batch[0].text, batch[0].reply_markup
+        else:
+            text = MERGE_SEPARATOR.join(item.text for item in batch)
+            rows = [row for item in batch if item.reply_markup for row in item.reply_markup.inline_keyboard]
+            reply_markup = InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+
+        self._chat_next_at[chat_id] = time.monotonic() + self.chat_interval
+        send_started = time.perf_counter()
+        try:
+            await self.bot.send_message(
+                chat_id,
+                text,
+                reply_markup=reply_markup,
+                disable_web_page_preview=True,
+            )
+        except TelegramRetryAfter as e:
+            self.stats["retry_after"] += 1
+            self._chat_next_at[chat_id] = time.monotonic() + e.retry_after
+            self._bucket.penalize()
+            self._requeue(chat_id, batch, count_attempt=False)
+            return
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Пользователь заблокировал бота / некорректное сообщение - повторять бессмысленно
+            self.stats["dropped"] += len(batch)
+            log.warning("Уведомление для %s отброшено: %s", chat_id, e)
+            return
+        except Exception:
+            log.exception("Ошибка отправки уведомления %s", chat_id)
+            self._requeue(chat_id, batch, count_attempt=True)
+            return
+
+        cycle_profiler.add(STAGE_DELIVER, time.perf_counter() - send_started)
+        self.stats["sent"] += len(batch)
+        self.stats["messages"] += 1
+        delivered_at = time.time()
+        for item in batch:
+            if item.origin_ts is not None:
+                metrics.tick_to_delivery.observe(delivered_at - item.origin_ts)
+        if len(batch) > 1:
+            self.stats["merged"] += len(batch) - 1
+
+    def _requeue(self, chat_id: int, batch: list[Notification], count_attempt: bool):
+        retry = []
+        for item in batch:
+            if count_attempt:
+                item.attempts += 1
+            if item.attempts < NOTIFY_MAX_ATTEMPTS:
+                retry.append(item)
+            else:
+                self.stats["dropped"] += 1
+        if retry:
+            self._pending.setdefault(chat_id, [])[0:0] = retry
+
+
+# Глобальная очередь уведомлений
+notifier = NotificationQueue()
+
+metrics.counter_callback("arb_alerts_queued_total", "Уведомлений поставлено в очередь", lambda: notifier.stats["enqueued"])
+metrics.counter_callback("arb_alerts_sent_total", "Уведомлений доставлено", lambda: notifier.stats["sent"])
+metrics.counter_callback("arb_alerts_dropped_total", "Уведомлений отброшено", lambda: notifier.stats["dropped"])
+metrics.counter_callback("arb_alerts_retry_after_total", "Ответов TelegramRetryAfter", lambda: notifier.stats["retry_after"])
+metrics.gauge_callback("arb_alerts_pending", "Уведомлений ждут отправки", notifier.pending_count)
@@ -2,9 +2,15 @@
 OKX API - получение цен
 Документация: https://www.okx.com/docs-v5/en/
 """
+import logging
+
 import aiohttp
 from typing import Optional
 
+from config import ALL_EXCHANGES
+
+log = logging.getLogger(__name__)
+
 
 async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[float]:
     """
@@ -18,12 +24,35 @@ async def get_price(session: aiohttp.ClientSession, symbol: str) -> Optional[flo
         Цена в USDT или None при ошибке
     """
     try:
-        url = f"https://www.okx.com/api/v5/market/ticker?instId={symbol}-USDT-SWAP"
+        url = f"{ALL_EXCHANGES['OKX']['api_base']}/api/v5/market/ticker?instId={symbol}-USDT-SWAP"
         async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
             if response.status == 200:
                 data = await response.json()
                 if data.get("code") == "0" and data.get("data"):
                     return float(data["data"][0]["last"])
-    except Exception as e:
-        print(f"Ошибка получения цены с OKX для {symbol}: {e}")
+    except Exception:
+        log.warning("Ошибка получения цены %s", symbol, exc_info=True)
+    return None
+
+
+async def get_instruments(session: aiohttp.ClientSession) -> Optional[set[str]]:
+    """
+    Тикеры активных USDT-свопов OKX
+
+    Returns:
+        Множество тикеров (например, {"BTC", "ETH"}) или None при ошибке
+    """
+    try:
+        url = f"{ALL_EXCHANGES['OKX']['api_base']}/api/v5/public/instruments?instType=SWAP"
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status == 200:
+                data = await response.json()
+                if data.get("code") == "0":
+                    return {
+                        item["instId"].split("-")[0]
+                        for item in data.get("data", [])
+                        if item.get("state") == "live" and item.get("instId", "").endswith("-USDT-SWAP")
+                    }
+    except Exception:
+        log.warning("Ошибка получения списка инструментов", exc_info=True)
     return None
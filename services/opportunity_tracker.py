@@ -0,0 +1,376 @@
+"""
+Трекер жизненного цикла арбитражных возможностей с гистерезисом
+
+Каждая возможность (пользователь, монета, лонг-биржа, шорт-биржа) проходит
+состояния: открыта -> расширяется / сужается -> закрыта.
+Открытие происходит при пересечении порога входа, закрытие - только при
+падении ниже порога выхода, поэтому спред, "мигающий" около порога,
+не порождает повторных уведомлений. Смена лучшей пары монеты прежнюю
+не закрывает: observe_coin продолжает оценивать её по тем же котировкам.
+
+Состояния хранятся в предвыделенных слотах (array), память ограничена
+ёмкостью трекера; закрытые слоты освобождаются по TTL.
+"""
+import time
+from array import array
+from typing import Hashable, Optional
+
+from config import (
+    OPPORTUNITY_ENTRY_RATIO,
+    OPPORTUNITY_EXIT_RATIO,
+    OPPORTUNITY_CLOSED_TTL_SECONDS,
+    OPPORTUNITY_STALE_SECONDS,
+    OPPORTUNITY_TRACKER_CAPACITY,
+    MIN_NOTIFICATION_INTERVAL_MINUTES,
+)
+from services.profit_calculator import evaluate_pair, opportunity_ratio
+
+# ---------- Состояния и события ----------
+
+STATE_FREE = 0
+STATE_OPENED = 1
+STATE_WIDENING = 2
+STATE_NARROWING = 3
+STATE_CLOSED = 4
+
+STATE_NAMES = {
+    STATE_FREE: "free",
+    STATE_OPENED: "opened",
+    STATE_WIDENING: "widening",
+    STATE_NARROWING: "narrowing",
+    STATE_CLOSED: "closed",
+}
+
+EVENT_NONE = 0
+EVENT_OPENED = 1
+EVENT_CLOSED = 2
+
+
+class OpportunityTracker:
+    """Слотовая state-машина возможностей с порогами входа/выхода"""
+
+    __slots__ = (
+        "capacity",
+        "entry_ratio",
+        "exit_ratio",
+        "closed_ttl",
+        "stale_seconds",
+        "reopen_cooldown",
+        "_index",
+        "_keys",
+        "_free",
+        "_state",
+        "_alerted",
+        "_spread",
+        "_peak",
+        "_opened_at",
+        "_updated_at",
+        "_closed_at",
+        "_alerted_at",
+        "_groups",
+    )
+
+    def __init__(
+        self,
+        capacity: int = OPPORTUNITY_TRACKER_CAPACITY,
+        entry_ratio: float = OPPORTUNITY_ENTRY_RATIO,
+        exit_ratio: float = OPPORTUNITY_EXIT_RATIO,
+        closed_ttl: float = OPPORTUNITY_CLOSED_TTL_SECONDS,
+        stale_seconds: float = OPPORTUNITY_STALE_SECONDS,
+        reopen_cooldown: float = MIN_NOTIFICATION_INTERVAL_MINUTES * 60,
+    ):
+        if exit_ratio > entry_ratio:
+            raise ValueError("Порог выхода не может быть выше порога входа")
+        self.capacity = capacity
+        self.entry_ratio = entry_ratio
+        self.exit_ratio = exit_ratio
+        self.closed_ttl = closed_ttl
+        self.stale_seconds = stale_seconds
+        self.reopen_cooldown = reopen_cooldown
+        self._index: dict[Hashable, int] = {}
+        self._keys: list[Optional[Hashable]] = [None] * capacity
+        # Стек свободных слотов: младшие индексы выдаются первыми
+        self._free = list(range(capacity - 1, -1, -1))
+        self._state = array("b", bytes(capacity))
+        self._alerted = array("b", bytes(capacity))
+        self._spread = array("d", bytes(8 * capacity))
+        self._peak = array("d", bytes(8 * capacity))
+        self._opened_at = array("d", bytes(8 * capacity))
+        self._updated_at = array("d", bytes(8 * capacity))
+        self._closed_at = array("d", bytes(8 * capacity))
+        # Время последнего уведомления об открытии; 0 = уведомлений не было
+        self._alerted_at = array("d", bytes(8 * capacity))
+        # Группа (например, (user_id, coin)) -> открытые ключи её пар
+        self._groups: dict[Hashable, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def update(
+        self,
+        key: Hashable,
+        ratio: float,
+        spread: float,
+        now: Optional[float] = None,
+        allow_open: bool = True,
+    ) -> int:
+        """
+        Обновляет состояние возможности новым наблюдением
+
+        Args:
+            key: Ключ возможности, например (user_id, coin, long, short)
+            ratio: Насколько наблюдение превышает пороги пользователя
+                (1.0 = ровно на пороге)
+            spread: Текущий спред в процентах (для расширения/сужения)
+            now: Время наблюдения (unix, сек); по умолчанию time.time()
+            allow_open: Можно ли открывать возможность (доп. фильтры)
+
+        Returns:
+            EVENT_OPENED, если нужно отправить уведомление об открытии,
+            EVENT_CLOSED, если открытая (и объявленная) возможность закрылась,
+            иначе EVENT_NONE
+        """
+        if now is None:
+            now = time.time()
+
+        slot = self._index.get(key)
+        if slot is None:
+            if ratio < self.entry_ratio or not allow_open:
+                return EVENT_NONE
+            slot = self._allocate(key)
+            if slot is None:
+                return EVENT_NONE
+            return self._open(slot, spread, now)
+
+        state = self._state[slot]
+        if state == STATE_CLOSED:
+            if ratio < self.entry_ratio or not allow_open:
+                return EVENT_NONE
+            return self._open(slot, spread, now)
+
+        self._updated_at[slot] = now
+        if ratio < self.exit_ratio:
+            self._state[slot] = STATE_CLOSED
+            self._closed_at[slot] = now
+            self._spread[slot] = spread
+            return EVENT_CLOSED if self._alerted[slot] else EVENT_NONE
+
+        previous = self._spread[slot]
+        if spread > previous:
+            self._state[slot] = STATE_WIDENING
+        elif spread < previous:
+            self._state[slot] = STATE_NARROWING
+        self._spread[slot] = spread
+        if spread > self._peak[slot]:
+            self._peak[slot] = spread
+        return EVENT_NONE
+
+    def track(self, group: Hashable, key: Hashable):
+        """Запоминает открытый key в группе: пока он открыт, его видит group_keys"""
+        if self.is_open(key):
+            keys = self._groups.get(group)
+            if keys is None:
+                keys = self._groups[group] = set()
+            keys.add(key)
+
+    def group_keys(self, group: Hashable, exclude: Optional[Hashable] = None) -> list:
+        """Открытые ключи группы, кроме exclude; закрытые из группы забываются"""
+        keys = self._groups.get(group)
+        if not keys:
+            return []
+        for key in [key for key in keys if not self.is_open(key)]:
+            keys.discard(key)
+        if not keys:
+            del self._groups[group]
+            return []
+        return [key for key in keys if key != exclude]
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Закрывает "зависшие" возможности без наблюдений и освобождает
+        слоты закрытых возможностей старше TTL. Возвращает число освобождённых слотов.
+        """
+        if now is None:
+            now = time.time()
+
+        evicted = 0
+        for key, slot in list(self._index.items()):
+            state = self._state[slot]
+            if state == STATE_CLOSED:
+                if now - self._closed_at[slot] >= self.closed_ttl:
+                    self._release(key, slot)
+                    evicted += 1
+            elif now - self._updated_at[slot] >= self.stale_seconds:
+                # Пара перестала наблюдаться - закрываем молча
+                self._state[slot] = STATE_CLOSED
+                self._closed_at[slot] = now
+        for group in [group for group, keys in self._groups.items() if not any(map(self.is_open, keys))]:
+            del self._groups[group]
+        return evicted
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        """Возвращает снимок состояния возможности или None"""
+        slot = self._index.get(key)
+        if slot is None:
+            return None
+        return {
+            "state": STATE_NAMES[self._state[slot]],
+            "spread": self._spread[slot],
+            "peak": self._peak[slot],
+            "opened_at": self._opened_at[slot],
+            "updated_at": self._updated_at[slot],
+            "closed_at": self._closed_at[slot],
+            "alerted": bool(self._alerted[slot]),
+        }
+
+    def is_open(self, key: Hashable) -> bool:
+        slot = self._index.get(key)
+        return slot is not None and self._state[slot] != STATE_CLOSED
+
+    def open_count(self) -> int:
+        """Количество открытых (не закрытых) возможностей"""
+        return sum(1 for slot in self._index.values() if self._state[slot] != STATE_CLOSED)
+
+    # ---------- Тёплый старт ----------
+
+    def dump_state(self) -> list[list]:
+        """Состояния возможностей для снимка (services/warm_state.py)"""
+        return [
+            [
+                list(key), self._state[slot], self._alerted[slot], self._spread[slot], self._peak[slot],
+                self._opened_at[slot], self._updated_at[slot], self._closed_at[slot], self._alerted_at[slot],
+            ]
+            for key, slot in self._index.items()
+        ]
+
+    def load_state(self, rows: list[list], now: Optional[float] = None) -> int:
+        """
+        Восстанавливает возможности из снимка. Открытые без наблюдений дольше
+        stale_seconds восстанавливаются закрытыми, закрытые старше TTL отбрасываются.
+        Время уведомлений сохраняется - переоткрытие не шлёт повторное уведомление
+        раньше reopen_cooldown. Возвращает число восстановленных возможностей.
+        """
+        if now is None:
+            now = time.time()
+
+        restored = 0
+        for key, state, alerted, spread, peak, opened_at, updated_at, closed_at, alerted_at in rows:
+            if state != STATE_CLOSED and now - updated_at >= self.stale_seconds:
+                state, closed_at = STATE_CLOSED, updated_at
+            if state == STATE_CLOSED and now - closed_at >= self.closed_ttl:
+                continue
+            key = tuple(key)
+            if key in self._index:
+                continue
+            slot = self._allocate(key)
+            if slot is None:
+                break
+            self._state[slot] = state
+            self._alerted[slot] = alerted
+            self._spread[slot] = spread
+            self._peak[slot] = peak
+            self._opened_at[slot] = opened_at
+            self._updated_at[slot] = updated_at
+            self._closed_at[slot] = closed_at
+            self._alerted_at[slot] = alerted_at
+            restored += 1
+        return restored
+
+    # ---------- Внутренние методы ----------
+
+    def _open(self, slot: int, spread: float, now: float) -> int:
+        self._state[slot] = STATE_OPENED
+        self._spread[slot] = spread
+        self._peak[slot] = spread
+        self._opened_at[slot] = now
+        self._updated_at[slot] = now
+        self._closed_at[slot] = 0.0
+
+        last_alert = self._alerted_at[slot]
+        if last_alert and now - last_alert < self.reopen_cooldown:
+            # Переоткрытие сразу после закрытия - не спамим
+            self._alerted[slot] = 0
+            return EVENT_NONE
+
+        self._alerted[slot] = 1
+        self._alerted_at[slot] = now
+        return EVENT_OPENED
+
+    def _allocate(self, key: Hashable) -> Optional[int]:
+        if not self._free and not self._evict_oldest_closed():
+            return None
+        slot = self._free.pop()
+        self._index[key] = slot
+        self._keys[slot] = key
+        self._alerted_at[slot] = 0.0
+        return slot
+
+    def _evict_oldest_closed(self) -> bool:
+        oldest_key = None
+        oldest_slot = -1
+        oldest_time = float("inf")
+        for key, slot in self._index.items():
+            if self._state[slot] == STATE_CLOSED and self._closed_at[slot] < oldest_time:
+                oldest_key, oldest_slot, oldest_time = key, slot, self._closed_at[slot]
+        if oldest_key is None:
+            return False
+        self._release(oldest_key, oldest_slot)
+        return True
+
+    def _release(self, key: Hashable, slot: int):
+        del self._index[key]
+        self._keys[slot] = None
+        self._state[slot] = STATE_FREE
+        self._alerted[slot] = 0
+        self._free.append(slot)
+
+
+def observe_coin(
+    tracker: OpportunityTracker,
+    group: tuple,
+    prices_data: dict,
+    evaluation: dict,
+    min_spread: float,
+    min_profit_usd: float,
+    position_size_usd: float,
+    leverage: float,
+    allow_open: bool = True,
+    now: Optional[float] = None,
+) -> list[tuple[Hashable, int, dict]]:
+    """
+    Шаг сопоставления монеты (общий для фоновой проверки и бэктеста)
+
+    Лучшая пара (evaluation из evaluate_spread) обновляется с ключом group + (лонг, шорт).
+    Остальные открытые пары группы - это прежние лучшие пары: они обновляются
+    своим реальным ratio по тем же котировкам и закрываются, только когда
+    сами опускаются ниже порога выхода. Пара, биржи которой выпали из котировок,
+    не трогается - её закроет sweep по таймауту.
+
+    Returns:
+        [(ключ, событие, оценка пары)], первой идёт лучшая пара
+    """
+    key = group + (evaluation["long"], evaluation["short"])
+    ratio = opportunity_ratio(evaluation["spread_percent"], evaluation["best_profit"], min_spread, min_profit_usd)
+    observations = [(key, tracker.update(key, ratio, evaluation["spread_percent"], now=now, allow_open=allow_open), evaluation)]
+    for other in tracker.group_keys(group, exclude=key):
+        long_exchange, short_exchange = other[-2:]
+        if long_exchange not in prices_data or short_exchange not in prices_data:
+            continue
+        other_evaluation = evaluate_pair(prices_data, long_exchange, short_exchange, position_size_usd, leverage)
+        if other_evaluation is None:
+            continue
+        other_ratio = opportunity_ratio(
+            other_evaluation["spread_percent"], other_evaluation["best_profit"], min_spread, min_profit_usd
+        )
+        # Не лучшая пара не открывается заново - только закрывается или остаётся открытой
+        event = tracker.update(other, other_ratio, other_evaluation["spread_percent"], now=now, allow_open=False)
+        observations.append((other, event, other_evaluation))
+    tracker.track(group, key)
+    return observations
+
+
+# Глобальный трекер для фоновой проверки спредов
+opportunity_tracker = OpportunityTracker()
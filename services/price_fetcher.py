@@ -1,6 +1,9 @@
 """
 Диспетчер для получения цен с разных бирж
 """
+import logging
+import time
+
 import aiohttp
 from typing import Optional, Dict
 
@@ -10,6 +13,10 @@ from services.mexc import get_price as get_price_mexc
 from services.gate import get_price as get_price_gate
 from services.hibachi import get_price_data as get_price_data_hibachi
 from services.hyperliquid import get_price_data as get_price_data_hyperliquid
+from services.tick_recorder import tick_recorder
+from services import metrics
+
+log = logging.getLogger(__name__)
 
 
 async def get_price_for_exchange(session: aiohttp.ClientSession, exchange_name: str, symbol: str) -> Optional[float]:
@@ -23,41 +30,43 @@ async def get_price_data_for_exchange(session: aiohttp.ClientSession, exchange_n
     Получает данные о цене с биржи (цена, bid, ask)
     Возвращает: {"price": float, "bid": float, "ask": float} или None
     """
-    exchange_name_lower = exchange_name.lower()
-    
-    print(f"DEBUG price_fetcher: Запрос к {exchange_name} для {symbol}")
-    
+    started = time.perf_counter()
     try:
-        if exchange_name_lower == "hibachi":
-            print(f"DEBUG price_fetcher: Вызываем get_price_data_hibachi для {symbol}")
-            result = await get_price_data_hibachi(session, symbol)
-            print(f"DEBUG price_fetcher: Hibachi вернул: {result}")
-            return result
-        elif exchange_name_lower == "hyperliquid":
-            print(f"DEBUG price_fetcher: Вызываем get_price_data_hyperliquid для {symbol}")
-            result = await get_price_data_hyperliquid(session, symbol)
-            print(f"DEBUG price_fetcher: Hyperliquid вернул: {result}")
-            return result
-        elif exchange_name_lower == "bybit":
-            price = await get_price_bybit(session, symbol)
-            if price:
-                return {"price": price, "bid": price * 0.9999, "ask": price * 1.0001}
-        elif exchange_name_lower == "okx":
-            price = await get_price_okx(session, symbol)
-            if price:
-                return {"price": price, "bid": price * 0.9999, "ask": price * 1.0001}
-        elif exchange_name_lower == "mexc":
-            price = await get_price_mexc(session, symbol)
-            if price:
-                return {"price": price, "bid": price * 0.9999, "ask": price * 1.0001}
-        elif exchange_name_lower == "gate":
-            price = await get_price_gate(session, symbol)
-            if price:
-                return {"price": price, "bid": price * 0.9999, "ask": price * 1.0001}
-    except Exception as e:
-        print(f"DEBUG price_fetcher: ❌ ИСКЛЮЧЕНИЕ при получении цены с {exchange_name} для {symbol}: {e}")
-        import traceback
-        traceback.print_exc()
+        result = await _fetch_price_data(session, exchange_name, symbol)
+    except Exception:
+        metrics.exchange_quotes.labels(exchange_name, "error").inc()
+        log.warning("Исключение при получении цены с %s для %s", exchange_name, symbol, exc_info=True)
+        return None
+    finally:
+        metrics.exchange_latency.labels(exchange_name).observe(time.perf_counter() - started)
+
+    if not result:
+        metrics.exchange_quotes.labels(exchange_name, "empty").inc()
+        log.debug("Не удалось получить цену с %s для %s", exchange_name, symbol)
+        return None
+    metrics.exchange_quotes.labels(exchange_name, "ok").inc()
+    # Только кладёт тик в очередь фонового потока, на диск здесь не пишем
+    tick_recorder.record_quote(exchange_name, symbol, result)
+    return result
+
+
+async def _fetch_price_data(session: aiohttp.ClientSession, exchange_name: str, symbol: str) -> Optional[Dict[str, float]]:
+    exchange_name_lower = exchange_name.lower()
     
-    print(f"DEBUG price_fetcher: ❌ Не удалось получить цену с {exchange_name} для {symbol}")
+    if exchange_name_lower == "hibachi":
+        return await get_price_data_hibachi(session, symbol)
+    elif exchange_name_lower == "hyperliquid":
+        return await get_price_data_hyperliquid(session, symbol)
+    elif exchange_name_lower == "bybit":
+        price = await get_price_bybit(session, symbol)
+    elif exchange_name_lower == "okx":
+        price = await get_price_okx(session, symbol)
+    elif exchange_name_lower == "mexc":
+        price = await get_price_mexc(session, symbol)
+    elif exchange_name_lower == "gate":
+        price = await get_price_gate(session, symbol)
+    else:
+        return None
+    if price:
+        return {"price": price, "bid": price * 0.9999, "ask": price * 1.0001}
     return None
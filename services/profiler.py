@@ -0,0 +1,193 @@
+"""
+Профилирование циклов проверки спредов и сэмплирующий профайлер
+
+CycleProfiler копит время по стадиям текущего цикла (запросы к биржам,
+разбор котировок, оценка спреда, сопоставление с порогами пользователя,
+рендеринг, доставка) и хранит итоги последних PERF_CYCLES_KEPT циклов.
+Запись стадии - сложение в dict, без аллокаций на каждый вызов.
+
+StackSampler - профайлер без внешних зависимостей: фоновый поток
+периодически снимает стек главного потока (event loop) через
+sys._current_frames() и считает собственное и накопленное время функций.
+Включается только на заданное окно, вне окна ничего не стоит.
+"""
+import heapq
+import io
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from config import PERF_CYCLES_KEPT, PERF_SLOWEST_CALLS, PERF_PROFILE_INTERVAL_SECONDS
+
+# ---------- Стадии цикла ----------
+
+STAGE_FETCH = "fetch"
+STAGE_PARSE = "parse"
+STAGE_EVALUATE = "evaluate"
+STAGE_MATCH = "match"
+STAGE_RENDER = "render"
+STAGE_DELIVER = "deliver"
+
+STAGES = (STAGE_FETCH, STAGE_PARSE, STAGE_EVALUATE, STAGE_MATCH, STAGE_RENDER, STAGE_DELIVER)
+
+STAGE_TITLES = {
+    STAGE_FETCH: "Запросы к биржам",
+    STAGE_PARSE: "Разбор котировок",
+    STAGE_EVALUATE: "Оценка спреда",
+    STAGE_MATCH: "Сопоставление с порогами",
+    STAGE_RENDER: "Рендеринг",
+    STAGE_DELIVER: "Доставка",
+}
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу (values отсортирован)"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+class CycleProfiler:
+    """Время стадий последних циклов и самые медленные запросы (биржа, монета)"""
+
+    def __init__(self, cycles: int = PERF_CYCLES_KEPT, slowest: int = PERF_SLOWEST_CALLS):
+        self.slowest = slowest
+        # (длительность цикла, {стадия: секунды}, {биржа: секунды})
+        self._cycles: deque = deque(maxlen=cycles)
+        # Куча (секунды, биржа, монета, время) - самые медленные запросы за окно циклов
+        self._calls: deque = deque(maxlen=cycles)
+        self._stages: dict[str, float] = {}
+        self._exchanges: dict[str, float] = {}
+        self._cycle_calls: list = []
+
+    def add(self, stage: str, seconds: float):
+        self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+
+    def add_call(self, exchange: str, coin: str, seconds: float):
+        """Запрос котировки: стадия fetch, разбивка по бирже и кандидат в самые медленные"""
+        self._stages[STAGE_FETCH] = self._stages.get(STAGE_FETCH, 0.0) + seconds
+        self._exchanges[exchange] = self._exchanges.get(exchange, 0.0) + seconds
+        item = (seconds, exchange, coin, time.time())
+        if len(self._cycle_calls) < self.slowest:
+            heapq.heappush(self._cycle_calls, item)
+        elif seconds > self._cycle_calls[0][0]:
+            heapq.heapreplace(self._cycle_calls, item)
+
+    def end_cycle(self, total: float):
+        self._cycles.append((total, self._stages, self._exchanges))
+        self._calls.append(self._cycle_calls)
+        self._stages = {}
+        self._exchanges = {}
+        self._cycle_calls = []
+
+    def __len__(self) -> int:
+        return len(self._cycles)
+
+    def report(self) -> dict:
+        """p50/p99 по стадиям и биржам за сохранённые циклы, самые медленные запросы"""
+        totals = sorted(cycle[0] for cycle in self._cycles)
+        stages = {}
+        for stage in STAGES:
+            values = sorted(cycle[1].get(stage, 0.0) for cycle in self._cycles)
+            stages[stage] = {"p50": _percentile(values, 50), "p99": _percentile(values, 99), "sum": sum(values)}
+        exchange_names = sorted({name for cycle in self._cycles for name in cycle[2]})
+        exchanges = {}
+        for name in exchange_names:
+            values = sorted(cycle[2].get(name, 0.0) for cycle in self._cycles)
+            exchanges[name] = {"p50": _percentile(values, 50), "p99": _percentile(values, 99)}
+        slowest = heapq.nlargest(self.slowest, (call for calls in self._calls for call in calls))
+        return {
+            "cycles": len(totals),
+            "cycle": {"p50": _percentile(totals, 50), "p99": _percentile(totals, 99), "sum": sum(totals)},
+            "stages": stages,
+            "exchanges": exchanges,
+            "slowest": [
+                {"seconds": seconds, "exchange": exchange, "coin": coin, "at": at}
+                for seconds, exchange, coin, at in slowest
+            ],
+        }
+
+
+# ---------- Сэмплирующий профайлер ----------
+
+
+class StackSampler:
+    """Периодически снимает стек целевого потока и агрегирует функции"""
+
+    def __init__(self, interval: float = PERF_PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target_id = 0
+        self.samples = 0
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self.own: Counter = Counter()
+        self.cumulative: Counter = Counter()
+        self.stacks: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: Optional[int] = None):
+        if self._thread is not None:
+            raise RuntimeError("Профайлер уже запущен")
+        self._target_id = thread_id or threading.main_thread().ident
+        self.samples = 0
+        self.own.clear()
+        self.cumulative.clear()
+        self.stacks.clear()
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.stopped_at = time.time()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples += 1
+            self.own[stack[0]] += 1
+            for name in set(stack):
+                self.cumulative[name] += 1
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def summary(self, top: int = 40) -> str:
+        """Текстовый отчёт: собственное и накопленное время функций, свёрнутые стеки"""
+        out = io.StringIO()
+        duration = (self.stopped_at or time.time()) - self.started_at
+        out.write(f"Сэмплирующий профайлер: {self.samples} сэмплов за {duration:.1f} с, период {self.interval * 1000:.0f} мс\n")
+        out.write("Время ожидания event loop (select/epoll) - это простой, а не нагрузка.\n\n")
+        if not self.samples:
+            return out.getvalue()
+        for title, counter in (("Собственное время", self.own), ("Накопленное время", self.cumulative)):
+            out.write(f"== {title} ==\n")
+            for name, count in counter.most_common(top):
+                out.write(f"{count / self.samples * 100:6.2f}%  {count:7d}  {name}\n")
+            out.write("\n")
+        out.write("== Свёрнутые стеки (формат flamegraph.pl / speedscope) ==\n")
+        for stack, count in self.stacks.most_common():
+            out.write(f"{stack} {count}\n")
+        return out.getvalue()
+
+
+# Глобальный профайлер циклов проверки
+cycle_profiler = CycleProfiler()
@@ -99,3 +99,84 @@ def calculate_profit_with_spread(
         "long_entry_limit": long_entry_limit,
         "short_entry_limit": short_entry_limit,
     }
+
+
+def evaluate_pair(
+    prices_data: dict,
+    long_exchange: str,
+    short_exchange: str,
+    position_size_usd: float,
+    leverage: float,
+) -> Optional[dict]:
+    """
+    Считает спред и профит конкретной пары (лонг на long_exchange, шорт на short_exchange)
+
+    Returns:
+        Словарь с парой, спредом и профитом или None, если цена лонга = 0
+    """
+    long_data = prices_data[long_exchange]
+    short_data = prices_data[short_exchange]
+    long_price = long_data.get("price", 0)
+    short_price = short_data.get("price", 0)
+    if not long_price:
+        return None
+
+    profit_data = calculate_profit_with_spread(
+        long_exchange, short_exchange, long_data, short_data, position_size_usd, leverage
+    )
+    # Чистый (после комиссий) спред в % от номинала
+    nominal_size = position_size_usd * leverage
+    return {
+        "long": long_exchange,
+        "short": short_exchange,
+        "long_price": long_price,
+        "short_price": short_price,
+        "spread_percent": (short_price - long_price) / long_price * 100,
+        "profit_data": profit_data,
+        "best_profit": max(profit_data["market_profit"], profit_data["limit_profit"]),
+        "net_spread": profit_data["market_profit"] / nominal_size * 100 if nominal_size else 0.0,
+    }
+
+
+def evaluate_spread(prices_data: dict, position_size_usd: float, leverage: float) -> Optional[dict]:
+    """
+    Находит лучшую пару (лонг на самой дешёвой бирже, шорт на самой дорогой)
+    и считает по ней профит. Используется фоновой проверкой и бэктестом.
+    
+    Returns:
+        Словарь с парой, спредом и профитом или None, если минимальная цена = 0
+    """
+    min_exchange = min(prices_data, key=lambda x: prices_data[x].get("price", float('inf')))
+    max_exchange = max(prices_data, key=lambda x: prices_data[x].get("price", 0))
+    return evaluate_pair(prices_data, min_exchange, max_exchange, position_size_usd, leverage)
+
+
+def opportunity_ratio(spread_percent: float, best_profit: float, min_spread: float, min_profit_usd: float) -> float:
+    """
+    Насколько наблюдение превышает пороги пользователя (1.0 = ровно на пороге)
+
+    Порог <= 0 означает "без ограничения" по этой стороне: она не сдерживает ratio.
+    """
+    spread_ratio = spread_percent / min_spread if min_spread > 0 else float("inf")
+    profit_ratio = best_profit / min_profit_usd if min_profit_usd > 0 else float("inf")
+    return min(spread_ratio, profit_ratio)
+
+
+def rank_pairs(prices_data: dict, position_size_usd: float, leverage: float, limit: int) -> list[dict]:
+    """
+    Все пары (лонг дешевле шорта) по убыванию лучшего профита после комиссий
+
+    Returns:
+        До limit словарей в формате evaluate_spread
+    """
+    pairs = []
+    for long_exchange, long_data in prices_data.items():
+        long_price = long_data.get("price", 0)
+        if not long_price:
+            continue
+        for short_exchange, short_data in prices_data.items():
+            if short_exchange == long_exchange or short_data.get("price", 0) <= long_price:
+                continue
+            pairs.append(evaluate_pair(prices_data, long_exchange, short_exchange, position_size_usd, leverage))
+    pairs.sort(key=lambda pair: pair["best_profit"], reverse=True)
+    return pairs[:limit]
@@ -0,0 +1,148 @@
+"""
+Проверка монет по запросу пользователя (/scan)
+
+Котировки берутся из самого свежего источника, по возможности без запросов к биржам:
+1. снимок коллектора (market_feed), если он подключён;
+2. кэш котировок не старше SCAN_MAX_QUOTE_AGE_SECONDS - его пополняют фоновая
+   проверка спредов и прошлые /scan;
+3. недостающие биржи опрашиваются параллельно с общим таймаутом. Одновременные
+   запросы одной и той же (монета, биржа) объединяются в один, ответы после
+   таймаута не отменяются и попадают в кэш для следующих команд.
+
+При тёплом кэше ответ собирается без сети.
+"""
+import asyncio
+import time
+from typing import Optional
+
+import aiohttp
+
+from config import SCAN_MAX_QUOTE_AGE_SECONDS, SCAN_FETCH_TIMEOUT_SECONDS
+from services import metrics
+from services.coin_universe import coin_universe
+from services.market_snapshot import market_feed
+from services.price_fetcher import get_price_data_for_exchange
+from services.quote_index import quote_index
+
+
+class QuoteCache:
+    """Последняя котировка (монета, биржа) с временем получения"""
+
+    def __init__(self, max_age: float = SCAN_MAX_QUOTE_AGE_SECONDS):
+        self.max_age = max_age
+        self._quotes: dict[tuple[str, str], tuple[float, dict]] = {}
+
+    def put(self, coin: str, exchange: str, data: dict, ts: Optional[float] = None):
+        self._quotes[(coin, exchange)] = (ts or time.time(), data)
+
+    def get(self, coin: str, exchange: str, now: Optional[float] = None) -> Optional[tuple[float, dict]]:
+        """(время, котировка), если она не старше max_age"""
+        entry = self._quotes.get((coin, exchange))
+        if entry is None or (now or time.time()) - entry[0] > self.max_age:
+            return None
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._quotes)
+
+    def dump_state(self) -> list[list]:
+        """[монета, биржа, время, котировка] для снимка"""
+        return [[coin, exchange, ts, data] for (coin, exchange), (ts, data) in self._quotes.items()]
+
+    def load_state(self, rows: list[list], now: Optional[float] = None) -> int:
+        """Восстанавливает котировки не старше max_age"""
+        now = now or time.time()
+        restored = 0
+        for coin, exchange, ts, data in rows:
+            if now - ts <= self.max_age and (coin, exchange) not in self._quotes:
+                self._quotes[(coin, exchange)] = (ts, data)
+                restored += 1
+        return restored
+
+
+class QuickScanner:
+    def __init__(self, cache: QuoteCache, timeout: float = SCAN_FETCH_TIMEOUT_SECONDS):
+        self.cache = cache
+        self.timeout = timeout
+        self.stats = {"snapshot": 0, "cache": 0, "fetched": 0, "joined": 0, "missed": 0}
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()])
+        return self._session
+
+    async def _fetch_one(self, coin: str, exchange: str) -> Optional[dict]:
+        data = await get_price_data_for_exchange(self._get_session(), exchange, coin)
+        if data and data.get("price"):
+            self.cache.put(coin, exchange, data)
+            quote_index.mark_quoted(coin, exchange)
+            return data
+        if coin_universe.is_unlisted(coin, exchange):
+            quote_index.mark_unlisted(coin, exchange)
+        return None
+
+    def _fetch(self, coin: str, exchange: str) -> asyncio.Task:
+        key = (coin, exchange)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["joined"] += 1
+            return task
+        self.stats["fetched"] += 1
+        task = asyncio.create_task(self._fetch_one(coin, exchange))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def quotes(self, coin: str, exchanges: tuple[str, ...]) -> tuple[dict[str, dict], Optional[float]]:
+        """
+        Котировки монеты на биржах (формат prices_data проверки спредов)
+
+        Returns:
+            (котировки, время самой старой из них или None, если котировок нет)
+        """
+        now = time.time()
+        prices_data: dict[str, dict] = {}
+        oldest: Optional[float] = None
+
+        snapshot = market_feed.latest() if market_feed.attached else None
+        if snapshot is not None:
+            prices_data = snapshot.prices(coin, exchanges, now)
+            if prices_data:
+                self.stats["snapshot"] += len(prices_data)
+                oldest = min(data["ts"] for data in prices_data.values())
+
+        missing = []
+        for exchange in exchanges:
+            if exchange in prices_data:
+                continue
+            entry = self.cache.get(coin, exchange, now)
+            if entry is None:
+                missing.append(exchange)
+                continue
+            self.stats["cache"] += 1
+            prices_data[exchange] = entry[1]
+            oldest = entry[0] if oldest is None else min(oldest, entry[0])
+
+        if missing:
+            tasks = [self._fetch(coin, exchange) for exchange in missing]
+            # Без отмены: опоздавшие ответы всё равно пополнят кэш
+            done, _ = await asyncio.wait(tasks, timeout=self.timeout)
+            for exchange, task in zip(missing, tasks):
+                data = task.result() if task in done and not task.cancelled() and task.exception() is None else None
+                if data is None:
+                    self.stats["missed"] += 1
+                    continue
+                prices_data[exchange] = data
+                oldest = now if oldest is None else min(oldest, now)
+        return prices_data, oldest
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+# Кэш котировок для /scan; фоновая проверка кладёт сюда всё, что получила с бирж
+quote_cache = QuoteCache()
+quick_scanner = QuickScanner(quote_cache)
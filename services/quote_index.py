@@ -0,0 +1,81 @@
+"""
+Индекс бирж, котирующих монету
+
+Для каждой монеты хранится маска бирж, которые её точно не торгуют
+(монеты нет в списке инструментов биржи или у биржи нет адаптера цен).
+Ошибки запросов (429, 5xx, таймауты) сюда не попадают. Пересечение бирж пользователя
+с биржами, котирующими монету, - одна операция AND:
+
+    user_mask & quote_index.mask(coin)
+
+Отрицательный результат забывается через QUOTE_INDEX_RETRY_SECONDS, чтобы
+новые листинги подхватывались без перезапуска.
+"""
+import time
+from typing import Optional
+
+from config import QUOTE_INDEX_RETRY_SECONDS
+from utils.registry import ALL_EXCHANGES_MASK, EXCHANGE_BITS, coin_id, coin_name, exchanges_from_mask, known_coin_id
+
+
+class QuoteIndex:
+    def __init__(self, retry_seconds: float = QUOTE_INDEX_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        # coin_id -> (маска бирж без котировки, время первой неудачи)
+        self._unlisted: dict[int, tuple[int, float]] = {}
+
+    def mask(self, coin: str, now: Optional[float] = None) -> int:
+        """Маска бирж, которые (предположительно) котируют монету"""
+        # Поиск не регистрирует тикер: у незнакомой монеты отметок нет
+        id_ = known_coin_id(coin)
+        entry = self._unlisted.get(id_) if id_ is not None else None
+        if entry is None:
+            return ALL_EXCHANGES_MASK
+        unlisted, since = entry
+        if (now or time.time()) - since >= self.retry_seconds:
+            del self._unlisted[id_]
+            return ALL_EXCHANGES_MASK
+        return ALL_EXCHANGES_MASK & ~unlisted
+
+    def mark_quoted(self, coin: str, exchange: str):
+        id_ = known_coin_id(coin)
+        entry = self._unlisted.get(id_) if id_ is not None else None
+        if entry is not None and entry[0] & EXCHANGE_BITS.get(exchange, 0):
+            remaining = entry[0] & ~EXCHANGE_BITS[exchange]
+            if remaining:
+                self._unlisted[id_] = (remaining, entry[1])
+            else:
+                del self._unlisted[id_]
+
+    def mark_unlisted(self, coin: str, exchange: str, now: Optional[float] = None):
+        # Единственное место, где тикер регистрируется: монеты приходят из вселенной
+        id_ = coin_id(coin)
+        entry = self._unlisted.get(id_)
+        bit = EXCHANGE_BITS.get(exchange, 0)
+        if entry is None:
+            self._unlisted[id_] = (bit, now or time.time())
+        else:
+            self._unlisted[id_] = (entry[0] | bit, entry[1])
+
+    def dump_state(self) -> dict[str, list]:
+        """{монета: [биржи без котировки, время первой неудачи]} для снимка"""
+        return {
+            coin_name(id_): [exchanges_from_mask(unlisted), since]
+            for id_, (unlisted, since) in self._unlisted.items()
+        }
+
+    def load_state(self, data: dict[str, list], now: Optional[float] = None) -> int:
+        """Восстанавливает отметки, ещё не дошедшие до повторной попытки"""
+        now = now or time.time()
+        restored = 0
+        for coin, (exchanges, since) in data.items():
+            if now - since >= self.retry_seconds:
+                continue
+            for exchange in exchanges:
+                self.mark_unlisted(coin, exchange, since)
+            restored += 1
+        return restored
+
+
+# Глобальный индекс для фоновой проверки спредов
+quote_index = QuoteIndex()
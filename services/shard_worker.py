@@ -0,0 +1,134 @@
+"""
+Воркер сканирования одного шарда пользователей
+
+Обновления Telegram принимает только основной процесс бота (bot.py с SCAN_SHARDS > 0),
+он же сохраняет настройки в SQLite. Воркеры:
+- держат в models.user_settings только своих пользователей с активным сканом,
+- раз в SHARD_SYNC_SECONDS подтягивают изменённые настройки из БД,
+- читают котировки из общего снимка коллектора (MARKET_SNAPSHOT_PATH),
+- следят за картой шардов: при изменении числа воркеров отдают чужих
+  пользователей и загружают новых своих; воркер с номером >= N завершается.
+
+Настройки воркер только читает. Единственное, что он пишет в БД, - id live-сообщений
+(SettingsStore.save_dashboard_ids): сообщения отправляет воркер, а основной процесс
+узнаёт id из БД. Выключение live-режима (переключатель в основном процессе) воркер
+замечает при синхронизации и сам открепляет сообщение - у основного процесса id нет.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import models
+from config import SHARD_SYNC_SECONDS, SHARD_SYNC_OVERLAP_SECONDS
+from services.dashboard import live_dashboard
+from services.sharding import ShardFilter, read_shard_count
+from services.storage import SettingsStore
+
+log = logging.getLogger(__name__)
+
+
+class ShardWorker:
+    def __init__(self, store: SettingsStore, index: int, count: int, shard_map_path: Optional[str] = None, bot=None):
+        self.store = store
+        self.bot = bot
+        self.shard_map_path = shard_map_path
+        self.filter = ShardFilter(index, count)
+        self.synced_until = 0.0
+        self.stats = {"syncs": 0, "applied": 0, "rebalances": 0, "dashboard_saves": 0}
+        # Пользователи, выключившие live-режим: сообщение открепляется после синхронизации
+        self._dashboard_off: list[int] = []
+
+    @property
+    def index(self) -> int:
+        return self.filter.index
+
+    @property
+    def retired(self) -> bool:
+        """Воркер больше не нужен: число шардов уменьшилось"""
+        return self.index >= self.filter.count
+
+    def _apply(self, user_id: int, settings: models.UserSettings):
+        resident = models.user_settings.get(user_id)
+        if not settings.scan_active or not self.filter.owns(user_id):
+            if resident is not None:
+                del models.user_settings[user_id]
+            return
+        if resident is not None and settings.dashboard_message_id is None:
+            # id live-сообщения воркер знает раньше, чем строка с ним вернётся из БД
+            settings.dashboard_message_id = resident.dashboard_message_id
+        models.user_settings[user_id] = settings
+        if settings.dashboard_message_id and not settings.live_dashboard:
+            self._dashboard_off.append(user_id)
+        self.stats["applied"] += 1
+
+    async def load(self) -> int:
+        """Полная загрузка своих пользователей с активным сканом"""
+        started = time.time()
+        scanning = await asyncio.to_thread(self.store.load_scanning)
+        for user_id in [user_id for user_id in models.user_settings if not self.filter.owns(user_id)]:
+            del models.user_settings[user_id]
+        for user_id, (settings, _) in scanning.items():
+            self._apply(user_id, settings)
+        # Изменения во время загрузки подтянет следующая синхронизация
+        self.synced_until = started
+        return len(models.user_settings)
+
+    async def sync_once(self):
+        if self.shard_map_path:
+            count = read_shard_count(self.shard_map_path, self.filter.count)
+            if count != self.filter.count:
+                log.info("Шард %d: число воркеров %d -> %d, перебалансировка", self.index, self.filter.count, count)
+                self.filter.resize(count)
+                self.stats["rebalances"] += 1
+                if self.retired:
+                    return
+                await self.load()
+
+        # С перекрытием: строка с меткой чуть раньше synced_until могла закоммититься позже запроса
+        rows = await asyncio.to_thread(self.store.load_changed, self.synced_until - SHARD_SYNC_OVERLAP_SECONDS)
+        for user_id, settings, updated_at in rows:
+            self._apply(user_id, settings)
+            self.synced_until = max(self.synced_until, updated_at)
+        self.stats["syncs"] += 1
+        await self._disable_dashboards()
+
+    async def _disable_dashboards(self):
+        off, self._dashboard_off = self._dashboard_off, []
+        if self.bot is None:
+            return
+        for user_id in off:
+            await live_dashboard.disable(self.bot, user_id)
+
+    async def flush_dashboard_ids(self) -> int:
+        """
+        Сохраняет id live-сообщений изменившихся пользователей (их помечает
+        models.mark_dirty). Возвращает число записанных строк.
+        """
+        user_ids = set(models.dirty_users)
+        models.dirty_users.clear()
+        rows = [
+            (user_id, models.user_settings[user_id].dashboard_message_id)
+            for user_id in user_ids if user_id in models.user_settings
+        ]
+        if not rows:
+            return 0
+        try:
+            await asyncio.to_thread(self.store.save_dashboard_ids, rows)
+        except Exception:
+            models.dirty_users.update(user_id for user_id, _ in rows)
+            log.exception("Шард %d: ошибка сохранения id live-сообщений", self.index)
+            return 0
+        self.stats["dashboard_saves"] += len(rows)
+        return len(rows)
+
+    async def run(self, interval: float = SHARD_SYNC_SECONDS):
+        """Синхронизация настроек; завершается, когда воркер выведен из карты шардов"""
+        while not self.retired:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync_once()
+            except Exception:
+                log.exception("Шард %d: ошибка синхронизации настроек", self.index)
+            await self.flush_dashboard_ids()
+        log.warning("Шард %d: выведен из карты шардов (%d воркеров), останавливаемся", self.index, self.filter.count)
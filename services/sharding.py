@@ -0,0 +1,78 @@
+"""
+Распределение пользователей по воркерам сканирования
+
+Пользователь закрепляется за воркером консистентным хэшированием user_id
+(кольцо с виртуальными узлами): при изменении числа воркеров N -> N+1
+переезжает только ~1/(N+1) пользователей, остальные остаются на своих воркерах
+(и сохраняют состояние возможностей в памяти).
+
+Число воркеров хранится в файле карты шардов (JSON) - его читают все воркеры,
+так перебалансировка не требует перезапуска уже работающих процессов.
+"""
+import bisect
+import hashlib
+import json
+import os
+from typing import Optional
+
+from config import SHARD_VIRTUAL_NODES
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: int, vnodes: int = SHARD_VIRTUAL_NODES):
+        if nodes < 1:
+            raise ValueError("Число воркеров должно быть положительным")
+        self.nodes = nodes
+        points = sorted((_hash(f"shard-{node}#{replica}"), node) for node in range(nodes) for replica in range(vnodes))
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, user_id: int) -> int:
+        index = bisect.bisect(self._points, _hash(str(user_id)))
+        return self._owners[index % len(self._owners)]
+
+
+class ShardFilter:
+    """Принадлежность пользователей одному воркеру (результат кэшируется на user_id)"""
+
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.ring = HashRing(count)
+        self._owned: dict[int, bool] = {}
+
+    @property
+    def count(self) -> int:
+        return self.ring.nodes
+
+    def owns(self, user_id: int) -> bool:
+        owned = self._owned.get(user_id)
+        if owned is None:
+            owned = self._owned[user_id] = self.ring.node_for(user_id) == self.index
+        return owned
+
+    def resize(self, count: int):
+        self.ring = HashRing(count)
+        self._owned.clear()
+
+
+def read_shard_count(path: str, default: Optional[int] = None) -> Optional[int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f)["count"])
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return default
+
+
+def write_shard_count(path: str, count: int):
+    """Атомарно записывает число воркеров в карту шардов"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"count": count}, f)
+    os.replace(tmp_path, path)
@@ -1,44 +1,76 @@
+"""
+Фоновая проверка спредов и отправка уведомлений
+"""
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from models import user_settings
+from services.price_fetcher import get_price_data_for_exchange
+from services.profit_calculator import evaluate_spread
+from services.opportunity_tracker import opportunity_tracker, observe_coin, EVENT_OPENED, EVENT_CLOSED
+from services.spread_history import spread_history
+from services.tick_recorder import tick_recorder
+from services.notifier import notifier, PRIORITY_ALERT, PRIORITY_LOW
+from services.alert_renderer import render_spread_notification, render_close_notification
+from services.dashboard import live_dashboard
+from services.quote_index import quote_index
+from services.market_snapshot import market_feed
+from services.quick_scan import quick_scanner, quote_cache
+from services.leaderboard import leaderboard
+from services.coin_universe import coin_universe
+from services import metrics
+from services.profiler import cycle_profiler, STAGE_PARSE, STAGE_EVALUATE, STAGE_MATCH, STAGE_RENDER
+from utils.registry import exchanges_from_mask
+
+log = logging.getLogger(__name__)
+
+
 async def check_spreads_task(bot_instance):
-    """Фоновая задача для проверки спредов"""
-    async with aiohttp.ClientSession() as session:
+    """
+    Фоновая задача для проверки спредов
+
+    Уведомления только ставятся в очередь services.notifier - проверка не ждёт Telegram.
+    """
+    async with aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()]) as session:
         while True:
+            cycle_started = time.perf_counter()
+            cycle_coins = 0
             try:
-                for user_id, settings in user_settings.items():
+                # Снимок списка: настройки могут добавляться/удаляться, пока проверка ждёт ответы бирж
+                for user_id, settings in list(user_settings.items()):
                     # ВАЖНО: Проверяем scan_active СРАЗУ, до всех остальных проверок
                     if not settings.scan_active:
                         # Пропускаем этого пользователя полностью
                         continue
                     
                     # ДИАГНОСТИКА: Проверяем настройки пользователя
-                    print(f"\n=== Проверка пользователя {user_id} ===")
-                    print(f"  scan_active: {settings.scan_active}")
-                    print(f"  paused: {settings.paused}")
+                    log.debug("Проверка пользователя %s: scan_active=%s, paused=%s", user_id, settings.scan_active, settings.paused)
                     
                     if settings.paused:
-                        print(f"  ⚠️ Уведомления на паузе для пользователя {user_id}")
+                        log.debug("Уведомления на паузе для пользователя %s", user_id)
                         continue
                     
                     if settings.track_all_coins:
-                        coins_to_check = ALL_COINS
+                        coins_to_check = coin_universe.coins
                     else:
                         coins_to_check = settings.coins
                     
                     if not coins_to_check:
-                        print(f"  ⚠️ Нет монет для отслеживания для пользователя {user_id}")
+                        log.debug("Нет монет для отслеживания для пользователя %s", user_id)
                         continue
                     
-                    print(f"  ✅ Монет для проверки: {len(coins_to_check)}")
+                    log.debug("Монет для проверки: %d", len(coins_to_check))
                     
-                    if settings.track_all_exchanges:
-                        exchanges_to_check = list(ALL_EXCHANGES.keys())
-                    else:
-                        exchanges_to_check = settings.selected_exchanges if settings.selected_exchanges else list(ALL_EXCHANGES.keys())
+                    exchange_mask = settings.effective_exchange_mask()
                     
-                    if not exchanges_to_check or len(exchanges_to_check) < 2:
-                        print(f"  ⚠️ Недостаточно бирж для отслеживания: {len(exchanges_to_check)} (нужно минимум 2)")
+                    if exchange_mask.bit_count() < 2:
+                        log.debug("Недостаточно бирж для отслеживания у %s: %d (нужно минимум 2)", user_id, exchange_mask.bit_count())
                         continue
                     
-                    print(f"  ✅ Бирж для проверки: {len(exchanges_to_check)} ({', '.join(exchanges_to_check)})")
+                    log.debug("Бирж для проверки: %d %s", exchange_mask.bit_count(), exchanges_from_mask(exchange_mask))
                     
                     # Проверяем первые несколько монет для диагностики
                     coins_checked = 0
@@ -47,132 +79,210 @@ async def check_spreads_task(bot_instance):
                     for coin in coins_to_check[:max_coins_to_check]:
                         # ДОПОЛНИТЕЛЬНАЯ ПРОВЕРКА: убеждаемся, что скан всё ещё активен
                         if not settings.scan_active:
-                            print(f"  ⚠️ Скан был выключен во время проверки, останавливаем")
+                            log.debug("Скан пользователя %s выключен во время проверки, останавливаем", user_id)
                             break
                         
                         coins_checked += 1
+                        cycle_coins += 1
                         try:
-                            print(f"\n  🔍 Проверка монеты {coin} ({coins_checked}/{max_coins_to_check})...")
+                            log.debug("Проверка монеты %s (%d/%d)", coin, coins_checked, max_coins_to_check)
+                            
+                            # Биржи пользователя, котирующие монету, - одна операция AND
+                            exchanges_to_check = exchanges_from_mask(exchange_mask & quote_index.mask(coin))
+                            if len(exchanges_to_check) < 2:
+                                log.debug("%s котируется меньше чем на 2 выбранных биржах, пропускаем", coin)
+                                continue
                             
-                            # Получаем данные с bid/ask
-                            prices_data = {}
-                            for exchange_name in exchanges_to_check:
-                                # ЕЩЁ ОДНА ПРОВЕРКА перед каждым запросом
-                                if not settings.scan_active:
-                                    print(f"  ⚠️ Скан выключен, прерываем получение цен")
-                                    break
+                            # Момент получения котировок - начало отсчёта задержки до доставки уведомления
+                            quotes_at = time.time()
+                            snapshot = market_feed.latest() if market_feed.attached else None
+                            # seq снимка, из которого взяты котировки: по нему уведомление рендерится один раз на всех
+                            snapshot_seq = snapshot.seq if snapshot is not None else None
+                            if snapshot is not None:
+                                # Котировки из снимка коллектора - без запросов к биржам
+                                stage_started = time.perf_counter()
+                                prices_data = snapshot.prices(coin, exchanges_to_check)
+                                if prices_data:
+                                    quotes_at = min(data["ts"] for data in prices_data.values())
+                                cycle_profiler.add(STAGE_PARSE, time.perf_counter() - stage_started)
+                                # Монету или биржу коллектор может не опрашивать - недостающее берём из кэша
+                                # котировок или запрашиваем сами (одновременные запросы объединяются)
+                                missing = tuple(exchange for exchange in exchanges_to_check if exchange not in prices_data)
+                                if missing:
+                                    fetched, fetched_at = await quick_scanner.quotes(coin, missing)
+                                    if fetched:
+                                        prices_data.update(fetched)
+                                        quotes_at = min(quotes_at, fetched_at)
+                                        # Часть котировок не из снимка - общего сообщения для всех нет
+                                        snapshot_seq = None
+                            else:
+                                # Получаем данные с bid/ask
+                                prices_data = {}
+                                for exchange_name in exchanges_to_check:
+                                    # ЕЩЁ ОДНА ПРОВЕРКА перед каждым запросом
+                                    if not settings.scan_active:
+                                        log.debug("Скан пользователя %s выключен, прерываем получение цен", user_id)
+                                        break
                                 
-                                print(f"    📡 Запрос цены с {exchange_name}...")
-                                try:
-                                    data = await asyncio.wait_for(
-                                        get_price_data_for_exchange(session, exchange_name, coin),
-                                        timeout=3.0
-                                    )
-                                    if data and data.get("price"):
-                                        prices_data[exchange_name] = data
-                                        print(f"    ✅ {exchange_name}: {data.get('price'):.2f} USDT")
-                                    else:
-                                        print(f"    ❌ {exchange_name}: не удалось получить цену")
-                                except asyncio.TimeoutError:
-                                    print(f"    ⚠️ {exchange_name}: timeout, пропускаем")
-                                except Exception as e:
-                                    print(f"    ⚠️ {exchange_name}: ошибка {type(e).__name__}: {e}, пропускаем")
+                                    request_started = time.perf_counter()
+                                    try:
+                                        data = await asyncio.wait_for(
+                                            get_price_data_for_exchange(session, exchange_name, coin),
+                                            timeout=3.0
+                                        )
+                                        if data and data.get("price"):
+                                            prices_data[exchange_name] = data
+                                            quote_index.mark_quoted(coin, exchange_name)
+                                            quote_cache.put(coin, exchange_name, data)
+                                            log.debug("%s %s: %s USDT", exchange_name, coin, data["price"])
+                                        else:
+                                            if coin_universe.is_unlisted(coin, exchange_name):
+                                                quote_index.mark_unlisted(coin, exchange_name)
+                                            log.debug("%s %s: не удалось получить цену", exchange_name, coin)
+                                    except asyncio.TimeoutError:
+                                        metrics.exchange_timeouts.labels(exchange_name).inc()
+                                        log.info("%s %s: timeout, пропускаем", exchange_name, coin)
+                                    except Exception as e:
+                                        log.info("%s %s: ошибка %s: %s, пропускаем", exchange_name, coin, type(e).__name__, e)
+                                    cycle_profiler.add_call(exchange_name, coin, time.perf_counter() - request_started)
                                 
-                                if exchange_name.lower() == "hibachi":
-                                    await asyncio.sleep(0.5)
-                                else:
-                                    await asyncio.sleep(0.1)
+                                    if exchange_name.lower() == "hibachi":
+                                        await asyncio.sleep(0.5)
+                                    else:
+                                        await asyncio.sleep(0.1)
                             
                             # ФИНАЛЬНАЯ ПРОВЕРКА перед отправкой уведомления
                             if not settings.scan_active:
-                                print(f"  ⚠️ Скан выключен перед отправкой уведомления, пропускаем")
+                                log.debug("Скан пользователя %s выключен перед отправкой уведомления, пропускаем", user_id)
                                 continue
                             
                             if len(prices_data) < 2:
-                                print(f"    ⚠️ Получено цен только с {len(prices_data)} бирж (нужно минимум 2)")
+                                log.debug("%s: получено цен только с %d бирж (нужно минимум 2)", coin, len(prices_data))
                                 continue
                             
-                            # Находим минимальную и максимальную цену
-                            min_exchange = min(prices_data, key=lambda x: prices_data[x].get("price", float('inf')))
-                            max_exchange = max(prices_data, key=lambda x: prices_data[x].get("price", 0))
-                            
-                            min_price = prices_data[min_exchange].get("price", 0)
-                            max_price = prices_data[max_exchange].get("price", 0)
-                            
-                            print(f"    💰 Минимум: {min_exchange} = {min_price:.2f} USDT")
-                            print(f"    💰 Максимум: {max_exchange} = {max_price:.2f} USDT")
-                            
-                            if min_price == 0:
-                                print(f"    ⚠️ Минимальная цена = 0, пропускаем")
+                            stage_started = time.perf_counter()
+                            evaluation = evaluate_spread(prices_data, settings.position_size_usd, settings.leverage)
+                            if evaluation is None:
+                                log.debug("%s: минимальная цена = 0, пропускаем", coin)
                                 continue
                             
-                            spread_percent = ((max_price - min_price) / min_price) * 100
-                            print(f"    📊 Спред: {spread_percent:.2f}% (требуется: {settings.min_spread}%)")
+                            min_exchange = evaluation["long"]
+                            max_exchange = evaluation["short"]
+                            spread_percent = evaluation["spread_percent"]
+                            profit_data = evaluation["profit_data"]
+                            best_profit = evaluation["best_profit"]
+                            net_spread = evaluation["net_spread"]
                             
-                            if spread_percent < settings.min_spread:
-                                print(f"    ⚠️ Спред {spread_percent:.2f}% меньше минимального {settings.min_spread}%")
-                                continue
+                            log.debug(
+                                "%s: лонг %s = %.6g, шорт %s = %.6g, спред %.2f%% (требуется %s%%), "
+                                "профит маркет %.2f$ / лимит %.2f$ (требуется %s$)",
+                                coin, min_exchange, evaluation["long_price"], max_exchange, evaluation["short_price"],
+                                spread_percent, settings.min_spread,
+                                profit_data["market_profit"], profit_data["limit_profit"], settings.min_profit_usd,
+                            )
                             
-                            # Рассчитываем профит
-                            profit_data = calculate_profit_with_spread(
-                                min_exchange,
-                                max_exchange,
-                                prices_data[min_exchange],
-                                prices_data[max_exchange],
+                            # Аномальность относительно собственной истории пары (до записи текущей точки)
+                            zscore = spread_history.zscore(coin, min_exchange, max_exchange, net_spread)
+                            spread_history.record(coin, min_exchange, max_exchange, net_spread)
+                            tick_recorder.record_spread(coin, min_exchange, max_exchange, spread_percent, net_spread)
+                            leaderboard.record(coin, prices_data, settings.position_size_usd, settings.leverage)
+                            stage_finished = time.perf_counter()
+                            cycle_profiler.add(STAGE_EVALUATE, stage_finished - stage_started)
+                            stage_started = stage_finished
+                            allow_open = True
+                            if settings.min_zscore > 0 and zscore is not None:
+                                allow_open = zscore >= settings.min_zscore
+                                log.debug("%s: z-score %.2f (требуется %s)", coin, zscore, settings.min_zscore)
+                            
+                            observations = observe_coin(
+                                opportunity_tracker,
+                                (user_id, coin),
+                                prices_data,
+                                evaluation,
+                                settings.min_spread,
+                                settings.min_profit_usd,
                                 settings.position_size_usd,
                                 settings.leverage,
+                                allow_open=allow_open,
                             )
-                            
-                            best_profit = max(profit_data["market_profit"], profit_data["limit_profit"])
-                            print(f"    💵 Профит (маркет): {profit_data['market_profit']:.2f}$")
-                            print(f"    💵 Профит (лимит): {profit_data['limit_profit']:.2f}$")
-                            print(f"    💵 Лучший профит: {best_profit:.2f}$ (требуется: {settings.min_profit_usd}$)")
-                            
-                            if best_profit < settings.min_profit_usd:
-                                print(f"    ⚠️ Профит {best_profit:.2f}$ меньше минимального {settings.min_profit_usd}$")
-                                continue
-                            
-                            last_notif = last_notifications.get(user_id, {}).get(coin)
-                            if last_notif:
-                                time_since_last = datetime.now() - last_notif
-                                if time_since_last < timedelta(minutes=MIN_NOTIFICATION_INTERVAL_MINUTES):
-                                    print(f"    ⚠️ Последнее уведомление было {time_since_last.total_seconds():.0f} сек назад (минимум: {MIN_NOTIFICATION_INTERVAL_MINUTES} мин)")
-                                    continue
+                            for _, observed_event, _ in observations:
+                                if observed_event == EVENT_OPENED:
+                                    metrics.opportunities_opened.inc()
+                                elif observed_event == EVENT_CLOSED:
+                                    metrics.opportunities_closed.inc()
+                            opportunity_key, event, _ = observations[0]
+                            cycle_profiler.add(STAGE_MATCH, time.perf_counter() - stage_started)
                             
                             # ПОСЛЕДНЯЯ ПРОВЕРКА перед отправкой
                             if not settings.scan_active:
-                                print(f"  ⚠️ Скан выключен в последний момент, НЕ отправляем уведомление")
+                                log.debug("Скан пользователя %s выключен в последний момент, не отправляем уведомление", user_id)
                                 continue
                             
-                            print(f"    🎉 ОТПРАВЛЯЕМ УВЕДОМЛЕНИЕ!")
-                            await send_spread_notification(
-                                user_id,
-                                coin,
-                                prices_data,
-                                spread_percent,
-                                profit_data,
-                                min_exchange,
-                                max_exchange,
-                                settings,
-                                bot_instance,
-                            )
+                            # Прежние лучшие пары монеты: закрываются по собственному ratio
+                            for other_key, other_event, other_evaluation in observations[1:]:
+                                _, _, other_long, other_short = other_key
+                                if settings.live_dashboard:
+                                    if not opportunity_tracker.is_open(other_key):
+                                        live_dashboard.discard(user_id, coin, other_long, other_short)
+                                    else:
+                                        live_dashboard.update(
+                                            user_id, coin, other_long, other_short,
+                                            other_evaluation["spread_percent"], other_evaluation["best_profit"],
+                                        )
+                                elif other_event == EVENT_CLOSED and settings.notify_on_close:
+                                    log.info("Возможность %s %s -> %s закрылась для %s", coin, other_long, other_short, user_id)
+                                    notifier.enqueue(
+                                        user_id,
+                                        render_close_notification(coin, other_evaluation["spread_percent"], other_long, other_short),
+                                        priority=PRIORITY_LOW,
+                                        origin_ts=quotes_at,
+                                    )
                             
-                            if user_id not in last_notifications:
-                                last_notifications[user_id] = {}
-                            last_notifications[user_id][coin] = datetime.now()
+                            if settings.live_dashboard:
+                                # Live-режим: вместо уведомлений обновляем закреплённое сообщение
+                                if opportunity_tracker.is_open(opportunity_key):
+                                    live_dashboard.update(user_id, coin, min_exchange, max_exchange, spread_percent, best_profit)
+                                else:
+                                    live_dashboard.discard(user_id, coin, min_exchange, max_exchange)
+                            elif event == EVENT_OPENED:
+                                log.info("Возможность %s %s -> %s (%.2f%%) для %s, уведомление в очереди", coin, min_exchange, max_exchange, spread_percent, user_id)
+                                stage_started = time.perf_counter()
+                                text, keyboard = render_spread_notification(
+                                    coin,
+                                    prices_data,
+                                    spread_percent,
+                                    profit_data,
+                                    min_exchange,
+                                    max_exchange,
+                                    settings,
+                                    snapshot_seq=snapshot_seq,
+                                )
+                                cycle_profiler.add(STAGE_RENDER, time.perf_counter() - stage_started)
+                                notifier.enqueue(user_id, text, keyboard, priority=PRIORITY_ALERT, origin_ts=quotes_at)
+                            elif event == EVENT_CLOSED and settings.notify_on_close:
+                                log.info("Возможность %s %s -> %s закрылась для %s", coin, min_exchange, max_exchange, user_id)
+                                notifier.enqueue(
+                                    user_id,
+                                    render_close_notification(coin, spread_percent, min_exchange, max_exchange),
+                                    priority=PRIORITY_LOW,
+                                    origin_ts=quotes_at,
+                                )
                             
-                        except Exception as e:
-                            print(f"    ❌ Ошибка при проверке монеты {coin}: {e}")
-                            import traceback
-                            traceback.print_exc()
+                        except Exception:
+                            log.exception("Ошибка при проверке монеты %s для %s", coin, user_id)
                             continue
                     
-                    print(f"\n  ✅ Проверено {coins_checked} монет для пользователя {user_id}")
+                    log.debug("Проверено %d монет для пользователя %s", coins_checked, user_id)
                 
+                opportunity_tracker.sweep(time.time())
+                leaderboard.sweep()
+                cycle_seconds = time.perf_counter() - cycle_started
+                cycle_profiler.end_cycle(cycle_seconds)
+                metrics.scan_cycle.observe(cycle_seconds)
+                metrics.scan_coins.inc(cycle_coins)
+                metrics.scan_cycle_coins.value = cycle_coins
                 await asyncio.sleep(1)
                 
-            except Exception as e:
-                print(f"❌ Ошибка в фоновой задаче проверки спредов: {e}")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                log.exception("Ошибка в фоновой задаче проверки спредов")
                 await asyncio.sleep(5)
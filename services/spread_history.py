@@ -0,0 +1,223 @@
+"""
+История чистых спредов по (монета, лонг-биржа, шорт-биржа)
+
+Для каждой пары хранится кольцевой буфер фиксированного размера на array
+(без Python-объекта на каждую точку) и потоковые статистики, обновляемые
+за O(1): EWMA, скользящие среднее/дисперсия (z-score) и гистограмма окна
+для приближённых перцентилей.
+"""
+import math
+import time
+from array import array
+from typing import Optional
+
+from config import (
+    SPREAD_HISTORY_SIZE,
+    SPREAD_HISTORY_MIN_INTERVAL_SECONDS,
+    SPREAD_HISTORY_MIN_SAMPLES,
+    SPREAD_HISTORY_EWMA_ALPHA,
+    SPREAD_HISTOGRAM_MIN,
+    SPREAD_HISTOGRAM_MAX,
+    SPREAD_HISTOGRAM_BINS,
+)
+
+_BIN_WIDTH = (SPREAD_HISTOGRAM_MAX - SPREAD_HISTOGRAM_MIN) / SPREAD_HISTOGRAM_BINS
+
+
+def _bin_index(value: float) -> int:
+    index = int((value - SPREAD_HISTOGRAM_MIN) / _BIN_WIDTH)
+    if index < 0:
+        return 0
+    if index >= SPREAD_HISTOGRAM_BINS:
+        return SPREAD_HISTOGRAM_BINS - 1
+    return index
+
+
+class SpreadRing:
+    """Кольцевой буфер (время, чистый спред %) со скользящими статистиками"""
+
+    __slots__ = (
+        "capacity",
+        "alpha",
+        "_ts",
+        "_values",
+        "_bins",
+        "_hist",
+        "_pos",
+        "_count",
+        "_sum",
+        "_sum_sq",
+        "_since_resync",
+        "ewma",
+        "ewm_var",
+    )
+
+    def __init__(self, capacity: int = SPREAD_HISTORY_SIZE, alpha: float = SPREAD_HISTORY_EWMA_ALPHA):
+        self.capacity = capacity
+        self.alpha = alpha
+        self._ts = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        # Индекс бина для каждой точки - чтобы вычесть её из гистограммы при вытеснении
+        self._bins = array("H", bytes(2 * capacity))
+        self._hist = array("I", bytes(4 * SPREAD_HISTOGRAM_BINS))
+        self._pos = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._since_resync = 0
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last_ts(self) -> float:
+        if not self._count:
+            return 0.0
+        return self._ts[(self._pos - 1) % self.capacity]
+
+    @property
+    def last(self) -> float:
+        if not self._count:
+            return 0.0
+        return self._values[(self._pos - 1) % self.capacity]
+
+    @property
+    def first_ts(self) -> float:
+        if not self._count:
+            return 0.0
+        if self._count < self.capacity:
+            return self._ts[0]
+        return self._ts[self._pos]
+
+    def push(self, ts: float, value: float):
+        pos = self._pos
+        if self._count == self.capacity:
+            old = self._values[pos]
+            self._sum -= old
+            self._sum_sq -= old * old
+            self._hist[self._bins[pos]] -= 1
+        else:
+            self._count += 1
+
+        bin_index = _bin_index(value)
+        self._ts[pos] = ts
+        self._values[pos] = value
+        self._bins[pos] = bin_index
+        self._hist[bin_index] += 1
+        self._sum += value
+        self._sum_sq += value * value
+        self._pos = (pos + 1) % self.capacity
+
+        if self._count == 1:
+            self.ewma = value
+            self.ewm_var = 0.0
+        else:
+            diff = value - self.ewma
+            incr = self.alpha * diff
+            self.ewma += incr
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * incr)
+
+        # Раз в capacity обновлений пересчитываем суммы, чтобы не копилась ошибка округления
+        self._since_resync += 1
+        if self._since_resync >= self.capacity:
+            self._since_resync = 0
+            window = self._values[:self._count] if self._count < self.capacity else self._values
+            self._sum = math.fsum(window)
+            self._sum_sq = math.fsum(v * v for v in window)
+
+    def mean(self) -> float:
+        return self._sum / self._count if self._count else 0.0
+
+    def std(self) -> float:
+        if self._count < 2:
+            return 0.0
+        mean = self._sum / self._count
+        variance = self._sum_sq / self._count - mean * mean
+        return math.sqrt(variance) if variance > 0 else 0.0
+
+    def zscore(self, value: float) -> Optional[float]:
+        """z-score значения относительно окна; None, если истории недостаточно"""
+        if self._count < SPREAD_HISTORY_MIN_SAMPLES:
+            return None
+        std = self.std()
+        if std == 0:
+            return None
+        return (value - self.mean()) / std
+
+    def percentile(self, q: float) -> float:
+        """Приближённый перцентиль окна (точность - ширина бина гистограммы)"""
+        if not self._count:
+            return 0.0
+        target = q / 100 * self._count
+        seen = 0
+        for index, count in enumerate(self._hist):
+            if count and seen + count >= target:
+                # Линейная интерполяция внутри бина
+                fraction = (target - seen) / count
+                return SPREAD_HISTOGRAM_MIN + (index + fraction) * _BIN_WIDTH
+            seen += count
+        return SPREAD_HISTOGRAM_MAX
+
+
+class SpreadHistory:
+    """Реестр кольцевых буферов по (монета, лонг, шорт)"""
+
+    def __init__(self, capacity: int = SPREAD_HISTORY_SIZE, min_interval: float = SPREAD_HISTORY_MIN_INTERVAL_SECONDS):
+        self.capacity = capacity
+        self.min_interval = min_interval
+        self._rings: dict[tuple[str, str, str], SpreadRing] = {}
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def get(self, coin: str, long_exchange: str, short_exchange: str) -> Optional[SpreadRing]:
+        return self._rings.get((coin, long_exchange, short_exchange))
+
+    def record(self, coin: str, long_exchange: str, short_exchange: str, net_spread: float, now: Optional[float] = None):
+        """
+        Добавляет наблюдение. Одна и та же пара может наблюдаться несколькими
+        пользователями за цикл - точки чаще min_interval отбрасываются.
+        """
+        if now is None:
+            now = time.time()
+        key = (coin, long_exchange, short_exchange)
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = SpreadRing(self.capacity)
+        elif now - ring.last_ts < self.min_interval:
+            return
+        ring.push(now, net_spread)
+
+    def zscore(self, coin: str, long_exchange: str, short_exchange: str, net_spread: float) -> Optional[float]:
+        ring = self._rings.get((coin, long_exchange, short_exchange))
+        return ring.zscore(net_spread) if ring else None
+
+    def stats(self, coin: str) -> list[dict]:
+        """Статистики по всем парам монеты, лучшие (по последнему спреду) первыми"""
+        result = []
+        for (ring_coin, long_exchange, short_exchange), ring in self._rings.items():
+            if ring_coin != coin or not len(ring):
+                continue
+            result.append({
+                "long": long_exchange,
+                "short": short_exchange,
+                "samples": len(ring),
+                "window_seconds": ring.last_ts - ring.first_ts,
+                "last": ring.last,
+                "ewma": ring.ewma,
+                "ewm_std": math.sqrt(ring.ewm_var),
+                "mean": ring.mean(),
+                "std": ring.std(),
+                "zscore": ring.zscore(ring.last),
+                "p50": ring.percentile(50),
+                "p90": ring.percentile(90),
+                "p99": ring.percentile(99),
+            })
+        result.sort(key=lambda item: item["last"], reverse=True)
+        return result
+
+
+# Глобальная история спредов
+spread_history = SpreadHistory()
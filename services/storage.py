@@ -0,0 +1,201 @@
+"""
+Хранение настроек пользователей в SQLite (WAL) с отложенной пакетной записью
+
+Обработчики только помечают пользователя "грязным" (models.mark_dirty),
+фоновая задача раз в SETTINGS_FLUSH_SECONDS сериализует изменения в event loop
+и пишет их одной транзакцией в отдельном потоке - ни один обработчик не ждёт диск.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import models
+from config import SETTINGS_FLUSH_SECONDS, USER_ACTIVE_DAYS, USER_RESIDENT_LIMIT
+from models import UserSettings, settings_to_dict, settings_from_dict
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    scan_active INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_settings_active ON user_settings (scan_active, updated_at);
+CREATE INDEX IF NOT EXISTS idx_user_settings_updated ON user_settings (updated_at);
+"""
+
+
+class SettingsStore:
+    """Синхронный доступ к SQLite; вызывается из фонового потока через asyncio.to_thread"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def save_many(self, rows: list[tuple[int, str, int, float]]):
+        """Сохраняет пачку (user_id, json, scan_active, updated_at) одной транзакцией"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO user_settings (user_id, data, scan_active, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET "
+                    "data = excluded.data, scan_active = excluded.scan_active, updated_at = excluded.updated_at",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def save_dashboard_ids(self, rows: list[tuple[int, Optional[int]]]):
+        """
+        Записывает только id live-сообщений (user_id, message_id) одной транзакцией
+
+        Остальные поля строки не трогаются: их владелец - основной процесс бота,
+        а воркер шарда знает лишь свой id сообщения. updated_at не меняется -
+        воркерам незачем перечитывать строку из-за собственной записи.
+        """
+        with self._lock:
+            # IMMEDIATE: блокировка записи берётся до чтения - правка бота между чтением и записью не потеряется
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id, message_id in rows:
+                    row = self._conn.execute(
+                        "SELECT data FROM user_settings WHERE user_id = ?", (user_id,)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    data = json.loads(row[0])
+                    if data.get("dashboard_message_id") == message_id:
+                        continue
+                    data["dashboard_message_id"] = message_id
+                    self._conn.execute(
+                        "UPDATE user_settings SET data = ? WHERE user_id = ?",
+                        (json.dumps(data, ensure_ascii=False), user_id),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def load_active(self, since: float) -> dict[int, UserSettings]:
+        """Загружает пользователей с активным сканом или менявших настройки после since"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT user_id, data FROM user_settings WHERE scan_active = 1 OR updated_at >= ?",
+                (since,),
+            )
+            result = {}
+            while True:
+                batch = cursor.fetchmany(5000)
+                if not batch:
+                    break
+                for user_id, data in batch:
+                    result[user_id] = settings_from_dict(json.loads(data))
+            return result
+
+    def load_scanning(self) -> dict[int, tuple[UserSettings, float]]:
+        """Пользователи с активным сканом: user_id -> (настройки, updated_at)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, data, updated_at FROM user_settings WHERE scan_active = 1"
+            ).fetchall()
+        return {user_id: (settings_from_dict(json.loads(data)), updated_at) for user_id, data, updated_at in rows}
+
+    def load_changed(self, since: float) -> list[tuple[int, UserSettings, float]]:
+        """Пользователи, сохранённые не раньше since: (user_id, настройки, updated_at)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, data, updated_at FROM user_settings WHERE updated_at >= ? ORDER BY updated_at",
+                (since,),
+            ).fetchall()
+        return [(user_id, settings_from_dict(json.loads(data)), updated_at) for user_id, data, updated_at in rows]
+
+    def load_one(self, user_id: int) -> Optional[UserSettings]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM user_settings WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return settings_from_dict(json.loads(row[0])) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM user_settings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _collect_dirty_rows() -> tuple[set[int], list[tuple[int, str, int, float]]]:
+    """Забирает грязных пользователей и сериализует их (в event loop, без гонок с обработчиками)"""
+    user_ids = set(models.dirty_users)
+    models.dirty_users.clear()
+    now = time.time()
+    rows = []
+    for user_id in user_ids:
+        s = models.user_settings.get(user_id)
+        if s is not None:
+            rows.append((user_id, json.dumps(settings_to_dict(s), ensure_ascii=False), int(s.scan_active), now))
+    return user_ids, rows
+
+
+async def flush_dirty(store: SettingsStore) -> int:
+    """Сбрасывает изменённые настройки в БД. Возвращает число сохранённых пользователей."""
+    user_ids, rows = _collect_dirty_rows()
+    if not rows:
+        return 0
+    try:
+        await asyncio.to_thread(store.save_many, rows)
+    except Exception:
+        # Не теряем изменения: вернём пользователей в очередь на следующий сброс
+        models.dirty_users.update(user_ids)
+        log.exception("Ошибка сохранения настроек")
+        return 0
+    return len(rows)
+
+
+async def flush_settings_task(store: SettingsStore, interval: float = SETTINGS_FLUSH_SECONDS):
+    """Фоновая задача пакетного сохранения настроек и вытеснения неактивных пользователей"""
+    while True:
+        await asyncio.sleep(interval)
+        await flush_dirty(store)
+        # Вытесняем только после сброса: у вытесняемых не должно быть несохранённых изменений
+        evicted = models.evict_idle_users(USER_RESIDENT_LIMIT)
+        if evicted:
+            stats = models.residency_stats()
+            log.info(
+                "Вытеснено пользователей: %d, резидентных: %d, hit rate: %.1f%%",
+                evicted, stats["resident"], stats["hit_rate"] * 100,
+            )
+
+
+def flush_dirty_sync(store: SettingsStore) -> int:
+    """Синхронный сброс при остановке бота"""
+    _, rows = _collect_dirty_rows()
+    if rows:
+        store.save_many(rows)
+    return len(rows)
+
+
+async def load_user_settings(store: SettingsStore) -> int:
+    """Загружает активных пользователей в models.user_settings при старте"""
+    since = time.time() - USER_ACTIVE_DAYS * 86400
+    loaded = await asyncio.to_thread(store.load_active, since)
+    models.user_settings.update(loaded)
+    return len(loaded)
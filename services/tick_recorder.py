@@ -0,0 +1,333 @@
+"""
+Запись тиков (котировок и найденных спредов) на диск
+
+Формат: append-only колоночные файлы фиксированной ширины, разбитые по дням (UTC):
+
+    {root}/coins.txt, {root}/exchanges.txt       - словари id -> тикер/биржа (строка = id)
+    {root}/YYYY-MM-DD/quotes/{колонка}.bin       - ts, coin, exchange, price, bid, ask
+    {root}/YYYY-MM-DD/spreads/{колонка}.bin      - ts, coin, long, short, spread, net_spread
+
+Каждая колонка - плоский массив значений машинного формата (array/struct),
+поэтому день данных можно отобразить в память (mmap) без загрузки в RAM.
+
+Запись идёт через фоновый поток: горячий путь только кладёт кортеж в очередь.
+Пачка дописывается во все колонки дня или ни в одну: при ошибке уже дописанные
+колонки обрезаются до прежней длины, иначе строки колонок разъехались бы.
+"""
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from config import TICK_RECORDER_QUEUE_SIZE, TICK_RECORDER_FLUSH_SECONDS, TICK_RECORDER_MAX_BATCH
+
+log = logging.getLogger(__name__)
+
+# Колонки: имя -> typecode array
+QUOTE_COLUMNS = {
+    "ts": "d",
+    "coin": "H",
+    "exchange": "B",
+    "price": "d",
+    "bid": "d",
+    "ask": "d",
+}
+
+SPREAD_COLUMNS = {
+    "ts": "d",
+    "coin": "H",
+    "long": "B",
+    "short": "B",
+    "spread": "d",
+    "net_spread": "d",
+}
+
+KIND_COLUMNS = {
+    "quotes": QUOTE_COLUMNS,
+    "spreads": SPREAD_COLUMNS,
+}
+
+_NAN = float("nan")
+
+
+def day_partition(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class SymbolTable:
+    """Append-only словарь строка <-> id, хранится в текстовом файле (строка = id)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    name = line.rstrip("\n")
+                    self.ids[name] = len(self.names)
+                    self.names.append(name)
+
+    def get_id(self, name: str) -> int:
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(name + "\n")
+            self.ids[name] = symbol_id
+            self.names.append(name)
+        return symbol_id
+
+
+class TickRecorder:
+    """Неблокирующий рекордер тиков с фоновым потоком записи"""
+
+    def __init__(self, queue_size: int = TICK_RECORDER_QUEUE_SIZE, flush_seconds: float = TICK_RECORDER_FLUSH_SECONDS):
+        self.root: Optional[str] = None
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self.written = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._coins: Optional[SymbolTable] = None
+        self._exchanges: Optional[SymbolTable] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self, root: str):
+        """Запускает фоновый поток записи в каталог root"""
+        if self._running:
+            return
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self._coins = SymbolTable(os.path.join(root, "coins.txt"))
+        self._exchanges = SymbolTable(os.path.join(root, "exchanges.txt"))
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+        self._thread.start()
+        log.info("Tick recorder запущен: %s", root)
+
+    def stop(self, timeout: float = 5.0):
+        """Останавливает поток, дописав всё, что осталось в очереди"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    # ---------- Горячий путь (event loop) ----------
+
+    def record_quote(self, exchange: str, coin: str, data: dict, ts: Optional[float] = None):
+        if not self._running:
+            return
+        item = (
+            "quotes",
+            ts or time.time(),
+            coin,
+            exchange,
+            data.get("price", _NAN),
+            data.get("bid", _NAN),
+            data.get("ask", _NAN),
+        )
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_spread(
+        self,
+        coin: str,
+        long_exchange: str,
+        short_exchange: str,
+        spread: float,
+        net_spread: float,
+        ts: Optional[float] = None,
+    ):
+        if not self._running:
+            return
+        item = ("spreads", ts or time.time(), coin, long_exchange, short_exchange, spread, net_spread)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    # ---------- Фоновый поток ----------
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_seconds
+        stop = False
+        while not stop:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None:
+                    stop = True
+                else:
+                    pending.append(item)
+            except queue.Empty:
+                pass
+            if stop or time.monotonic() >= deadline or len(pending) >= TICK_RECORDER_MAX_BATCH:
+                if pending:
+                    try:
+                        self._flush(pending)
+                    except Exception:
+                        log.exception("Ошибка записи тиков, пачка из %d записей потеряна", len(pending))
+                pending = []
+                deadline = time.monotonic() + self.flush_seconds
+
+    def _flush(self, items: list):
+        # Группируем по (вид, день) и пишем каждую колонку одним вызовом tofile
+        batches: dict[tuple[str, int], dict[str, array]] = {}
+        for item in items:
+            kind, ts = item[0], item[1]
+            key = (kind, int(ts // 86400))
+            columns = batches.get(key)
+            if columns is None:
+                columns = batches[key] = {
+                    name: array(typecode) for name, typecode in KIND_COLUMNS[kind].items()
+                }
+            columns["ts"].append(ts)
+            columns["coin"].append(self._coins.get_id(item[2]))
+            if kind == "quotes":
+                columns["exchange"].append(self._exchanges.get_id(item[3]))
+                columns["price"].append(item[4])
+                columns["bid"].append(item[5])
+                columns["ask"].append(item[6])
+            else:
+                columns["long"].append(self._exchanges.get_id(item[3]))
+                columns["short"].append(self._exchanges.get_id(item[4]))
+                columns["spread"].append(item[5])
+                columns["net_spread"].append(item[6])
+
+        for (kind, day_number), columns in batches.items():
+            directory = os.path.join(self.root, day_partition(day_number * 86400), kind)
+            os.makedirs(directory, exist_ok=True)
+            _append_rows(directory, columns)
+        self.written += len(items)
+
+
+def _append_rows(directory: str, columns: dict[str, array]):
+    """
+    Дописывает строки во все колонки каталога атомарно по строкам: сначала
+    колонки выравниваются по общему числу строк (след прошлого обрыва), при
+    ошибке дописанное обрезается обратно
+    """
+    paths = {name: os.path.join(directory, f"{name}.bin") for name in columns}
+    rows = min(
+        (os.path.getsize(path) if os.path.exists(path) else 0) // values.itemsize
+        for path, values in zip(paths.values(), columns.values())
+    )
+    files = []
+    try:
+        for name, values in columns.items():
+            f = open(paths[name], "ab")
+            files.append((f, rows * values.itemsize))
+            f.truncate(rows * values.itemsize)
+            values.tofile(f)
+        for f, _ in files:
+            f.flush()
+    except BaseException:
+        for f, length in files:
+            try:
+                f.truncate(length)
+            except OSError:
+                pass
+        raise
+    finally:
+        for f, _ in files:
+            f.close()
+
+
+# ---------- Чтение ----------
+
+
+class DayColumns:
+    """Колонки одного дня, отображённые в память (без загрузки в RAM)"""
+
+    def __init__(self, directory: str, columns: dict[str, str]):
+        self.directory = directory
+        self._mmaps = []
+        self.columns: dict[str, memoryview] = {}
+        length = None
+        for name, typecode in columns.items():
+            path = os.path.join(directory, f"{name}.bin")
+            view = self._map(path, typecode)
+            self.columns[name] = view
+            length = len(view) if length is None else min(length, len(view))
+        # Обрыв процесса посреди пачки мог оставить колонки разной длины: берём общую
+        self.length = length or 0
+        for name in self.columns:
+            self.columns[name] = self.columns[name][:self.length]
+
+    def _map(self, path: str, typecode: str) -> memoryview:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return memoryview(array(typecode))
+        itemsize = array(typecode).itemsize
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmaps.append(mm)
+        usable = len(mm) - len(mm) % itemsize
+        return memoryview(mm)[:usable].cast(typecode)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, name: str) -> memoryview:
+        return self.columns[name]
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        for mm in self._mmaps:
+            mm.close()
+        self._mmaps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TickReader:
+    """Потоковое чтение записанных тиков"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.coins = SymbolTable(os.path.join(root, "coins.txt")).names
+        self.exchanges = SymbolTable(os.path.join(root, "exchanges.txt")).names
+
+    def days(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def open_day(self, day: str, kind: str = "quotes") -> DayColumns:
+        return DayColumns(os.path.join(self.root, day, kind), KIND_COLUMNS[kind])
+
+    def iter_quotes(self, day: str) -> Iterator[tuple[float, str, str, float, float, float]]:
+        """Итерирует котировки дня: (ts, coin, exchange, price, bid, ask)"""
+        with self.open_day(day, "quotes") as day_columns:
+            ts, coin, exchange = day_columns["ts"], day_columns["coin"], day_columns["exchange"]
+            price, bid, ask = day_columns["price"], day_columns["bid"], day_columns["ask"]
+            coins, exchanges = self.coins, self.exchanges
+            for i in range(len(day_columns)):
+                yield ts[i], coins[coin[i]], exchanges[exchange[i]], price[i], bid[i], ask[i]
+
+
+# Глобальный рекордер (выключен, пока не вызван start)
+tick_recorder = TickRecorder()
@@ -0,0 +1,111 @@
+"""
+Тёплый старт: снимок состояния фоновой проверки на диске
+
+Без снимка перезапуск начинается с пустых структур: первые циклы заново
+узнают, какие биржи не котируют монету, а каждая уже открытая возможность
+"открывается" снова - пользователи получают пачку повторных уведомлений.
+
+Раз в WARM_STATE_SAVE_SECONDS состояние собирается в event loop (без await -
+согласованный срез) и записывается в отдельном потоке атомарно: временный
+файл с уникальным именем и os.replace. При остановке save_final_state дожидается
+начатой записи и только потом пишет финальный снимок - иначе запоздавшая
+периодическая запись подменила бы его более старым. При старте снимок читается
+до запуска проверки; каждая структура сама отбрасывает записи старше своего TTL.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+from config import WARM_STATE_SAVE_SECONDS
+from services.leaderboard import leaderboard
+from services.opportunity_tracker import opportunity_tracker
+from services.quick_scan import quote_cache
+from services.quote_index import quote_index
+from utils.atomic_file import write_json_atomic
+
+log = logging.getLogger(__name__)
+
+# Версия формата: снимок другой версии игнорируется
+WARM_STATE_VERSION = 1
+
+
+def collect_state() -> dict:
+    return {
+        "version": WARM_STATE_VERSION,
+        "saved_at": time.time(),
+        "quote_index": quote_index.dump_state(),
+        "quotes": quote_cache.dump_state(),
+        "opportunities": opportunity_tracker.dump_state(),
+        "top": leaderboard.dump_state(),
+    }
+
+
+def write_state(path: str, state: dict):
+    write_json_atomic(path, state, separators=(",", ":"))
+
+
+def load_state(path: str, now: Optional[float] = None) -> Optional[dict[str, int]]:
+    """
+    Восстанавливает состояние из снимка
+
+    Returns:
+        Число восстановленных записей по разделам или None, если снимка нет
+        или он непригоден
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        log.warning("Снимок состояния %s повреждён, старт с пустым состоянием", path, exc_info=True)
+        return None
+    if not isinstance(state, dict) or state.get("version") != WARM_STATE_VERSION:
+        log.warning("Снимок состояния %s другой версии, старт с пустым состоянием", path)
+        return None
+
+    now = now or time.time()
+    try:
+        return {
+            "quote_index": quote_index.load_state(state.get("quote_index", {}), now),
+            "quotes": quote_cache.load_state(state.get("quotes", []), now),
+            "opportunities": opportunity_tracker.load_state(state.get("opportunities", []), now),
+            "top": leaderboard.load_state(state.get("top", []), now),
+        }
+    except (ValueError, TypeError):
+        log.warning("Снимок состояния %s повреждён, восстановлен частично", path, exc_info=True)
+        return None
+
+
+async def save_state_task(path: str, interval: float = WARM_STATE_SAVE_SECONDS):
+    """Фоновая задача периодического сохранения снимка"""
+    while True:
+        await asyncio.sleep(interval)
+        write = asyncio.ensure_future(asyncio.to_thread(write_state, path, collect_state()))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            # Поток записи отменой не остановить - дожидаемся его, чтобы он не пережил остановку
+            await asyncio.wait([write])
+            raise
+        except Exception:
+            log.exception("Ошибка сохранения снимка состояния %s", path)
+
+
+async def save_final_state(task: Optional[asyncio.Task], path: str):
+    """
+    Останавливает периодическое сохранение (с ожиданием начатой записи) и пишет
+    финальный снимок. Ошибка записи только логируется - остановка продолжается.
+    """
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    try:
+        write_state(path, collect_state())
+    except Exception:
+        log.exception("Ошибка сохранения снимка состояния %s при остановке", path)
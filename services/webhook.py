@@ -0,0 +1,140 @@
+"""
+Режим webhook: приём обновлений Telegram через aiohttp-сервер
+
+- POST {path}: проверка заголовка X-Telegram-Bot-Api-Secret-Token, обновление
+  кладётся в очередь воркера и сразу подтверждается (200), обработка - в фоне;
+- воркеров WEBHOOK_WORKERS, обновления одного пользователя всегда попадают
+  в одного воркера (user_id % N) - порядок сообщений пользователя сохраняется;
+- GET /health: состояние очередей и счётчики.
+
+Локальная проверка без Telegram (WEBHOOK_URL не задан - setWebhook не вызывается):
+    curl -X POST http://127.0.0.1:8080/webhook \\
+        -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" -H "Content-Type: application/json" \\
+        -d '{"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"},
+             "from": {"id": 1, "is_bot": false, "first_name": "Test"}, "text": "/help"}}'
+"""
+import asyncio
+import hmac
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from config import WEBHOOK_DEFAULT_WORKERS, WEBHOOK_QUEUE_SIZE
+
+log = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def update_user_id(data: dict) -> int:
+    """id пользователя (или чата) из сырого обновления; 0, если его нет"""
+    for value in data.values():
+        if isinstance(value, dict):
+            sender = value.get("from") or value.get("chat") or value.get("user")
+            if isinstance(sender, dict) and "id" in sender:
+                return sender["id"]
+    return 0
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: Optional[str] = None,
+        workers: int = WEBHOOK_DEFAULT_WORKERS,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = max(1, workers)
+        self.stats = {"received": 0, "processed": 0, "errors": 0, "rejected": 0, "unauthorized": 0}
+        self.started_at = time.time()
+        # Очередь на воркера: обновления одного пользователя обрабатываются по порядку
+        per_worker = max(1, queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks: list[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get("/health", self.handle_health)
+
+    # ---------- HTTP ----------
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token is not None:
+            received = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+                self.stats["unauthorized"] += 1
+                return web.Response(status=401)
+
+        try:
+            data = await request.json()
+            update = Update.model_validate(data, context={"bot": self.bot})
+        except Exception as e:
+            log.warning("Некорректное обновление webhook: %s", e)
+            return web.Response(status=400)
+
+        self.stats["received"] += 1
+        queue = self._queues[update_user_id(data) % self.workers]
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram повторит доставку позже
+            self.stats["rejected"] += 1
+            return web.Response(status=503)
+        return web.Response(status=200)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "workers": self.workers,
+            "queued": sum(queue.qsize() for queue in self._queues),
+            **self.stats,
+        })
+
+    # ---------- Воркеры ----------
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self.stats["processed"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+                log.exception("Ошибка обработки обновления %s", update.update_id)
+            finally:
+                queue.task_done()
+
+    # ---------- Запуск ----------
+
+    async def start(self, host: str, port: int):
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        log.info("Webhook-сервер слушает http://%s:%d%s (воркеров: %d)", host, port, self.path, self.workers)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        # Дообрабатываем принятые обновления, затем останавливаем воркеры
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout=10)
+        except asyncio.TimeoutError:
+            log.warning("Webhook: не все принятые обновления обработаны до остановки")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,27 @@
+"""
+Атомарная запись файлов состояния
+
+Файл пишется во временный файл с уникальным именем в том же каталоге и
+подменяется через os.replace: читатель видит либо старую, либо новую версию
+целиком. Уникальное имя важно, когда один и тот же файл одновременно пишут
+несколько процессов (бот, воркеры, коллектор) или две задачи одного процесса.
+"""
+import json
+import os
+import tempfile
+
+
+def write_json_atomic(path: str, data, **dump_kwargs):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
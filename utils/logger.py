@@ -0,0 +1,113 @@
+"""
+Асинхронное уровневое логирование
+
+- Вызов logger.debug(...) в горячем пути только кладёт LogRecord в очередь:
+  форматирование и запись в stdout - в отдельном потоке (QueueListener).
+- При выключенном уровне стоимость вызова - одна проверка уровня:
+  аргументы передаются через %-плейсхолдеры и не форматируются.
+- Повторяющиеся сообщения (один и тот же шаблон) сэмплируются: не больше
+  LOG_SAMPLE_BURST записей на шаблон за LOG_SAMPLE_WINDOW_SECONDS, число
+  пропущенных добавляется к следующей пропущенной записи.
+
+Уровень задаётся переменной окружения LOG_LEVEL (по умолчанию INFO).
+"""
+import atexit
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from config import LOG_SAMPLE_BURST, LOG_SAMPLE_WINDOW_SECONDS
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в вызывающем потоке
+
+    Стандартный prepare() форматирует сообщение до постановки в очередь;
+    здесь запись уходит как есть, а %-подстановка выполняется в потоке слушателя.
+    Аргументы логирования не должны меняться после вызова (в коде бота это так).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Трейсбек нужно снять сейчас: объекты исключения живут недолго
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Ограничивает частоту записей одного шаблона (logger + msg) уровня ниже WARNING"""
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW_SECONDS):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        # (logger, шаблон) -> [начало окна, записей в окне, пропущено]
+        self._buckets: dict[tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else str(type(record.msg)))
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 10000:
+                self._buckets.clear()
+            self._buckets[key] = [now, 1, 0]
+            return True
+        if now - bucket[0] >= self.window:
+            suppressed = bucket[2]
+            bucket[0], bucket[1], bucket[2] = now, 1, 0
+            if suppressed:
+                record.msg = f"{record.msg} (+{suppressed} похожих пропущено)"
+            return True
+        if bucket[1] < self.burst:
+            bucket[1] += 1
+            return True
+        bucket[2] += 1
+        return False
+
+
+def setup_logging(level: Optional[str] = None):
+    """Настраивает корневой логгер: очередь -> поток-слушатель -> stdout. Повторный вызов ничего не делает."""
+    global _listener
+    if _listener is not None:
+        return
+
+    level_name = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level_name)
+    # Библиотеки шумят на DEBUG - оставляем им INFO
+    for name in ("aiogram", "aiohttp", "asyncio", "urllib3"):
+        logging.getLogger(name).setLevel(max(logging.INFO, root.level))
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Дописывает очередь и останавливает поток-слушатель"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
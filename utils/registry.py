@@ -0,0 +1,63 @@
+"""
+Реестры бирж и монет для компактного представления настроек
+
+- Биржи кодируются битами в порядке ALL_EXCHANGES: набор бирж = одно int,
+  пересечение наборов = одна операция AND.
+- Тикеры монет интернируются в целые id: у всех пользователей одна копия строки.
+"""
+import sys
+from functools import lru_cache
+from typing import Iterable
+
+from config import ALL_EXCHANGES, CEX_EXCHANGES, DEX_EXCHANGES
+
+# ---------- Биржи ----------
+
+EXCHANGE_NAMES: tuple[str, ...] = tuple(ALL_EXCHANGES.keys())
+EXCHANGE_BITS: dict[str, int] = {name: 1 << index for index, name in enumerate(EXCHANGE_NAMES)}
+ALL_EXCHANGES_MASK = (1 << len(EXCHANGE_NAMES)) - 1
+
+
+def exchanges_mask(names: Iterable[str]) -> int:
+    """Битовая маска по именам бирж (неизвестные имена игнорируются)"""
+    mask = 0
+    for name in names:
+        mask |= EXCHANGE_BITS.get(name, 0)
+    return mask
+
+
+@lru_cache(maxsize=None)
+def exchanges_from_mask(mask: int) -> tuple[str, ...]:
+    """Имена бирж из маски в порядке реестра (результат кэшируется на маску)"""
+    return tuple(name for name in EXCHANGE_NAMES if mask & EXCHANGE_BITS[name])
+
+
+CEX_MASK = exchanges_mask(CEX_EXCHANGES)
+DEX_MASK = exchanges_mask(DEX_EXCHANGES)
+
+
+# ---------- Монеты ----------
+
+_coin_ids: dict[str, int] = {}
+_coin_names: list[str] = []
+
+
+def coin_id(ticker: str) -> int:
+    """Возвращает id тикера, регистрируя его при первом обращении"""
+    existing = _coin_ids.get(ticker)
+    if existing is not None:
+        return existing
+    ticker = sys.intern(ticker)
+    new_id = len(_coin_names)
+    _coin_ids[ticker] = new_id
+    _coin_names.append(ticker)
+    return new_id
+
+
+def coin_name(id_: int) -> str:
+    return _coin_names[id_]
+
+
+def known_coin_id(ticker: str) -> int | None:
+    """id тикера без регистрации (None, если тикер ещё не встречался)"""
+    return _coin_ids.get(ticker)